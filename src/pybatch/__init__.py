@@ -19,15 +19,22 @@
 __all__ = [
     "GenericJob",
     "GenericProtocol",
+    "CommandResult",
+    "RemoteProcess",
+    "AsyncJob",
+    "AsyncGenericProtocol",
     "LaunchParameters",
     "ConnectionParameters",
     "create_job",
+    "create_async_job",
     "PybatchException",
 ]
 from .genericjob import GenericJob
-from .generic_protocol import GenericProtocol
+from .generic_protocol import GenericProtocol, CommandResult, RemoteProcess
+from .async_job import AsyncJob
+from .async_protocol import AsyncGenericProtocol
 from .parameter import LaunchParameters, ConnectionParameters
-from .job_factory import create_job
+from .job_factory import create_job, create_async_job
 
 # WARNING `python_requires = >= 3.8`
 from importlib.metadata import PackageNotFoundError, version  # pragma: no cover
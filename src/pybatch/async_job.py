@@ -0,0 +1,60 @@
+# Copyright (C) 2025-2026  CEA, EDF
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307 USA
+#
+# See http://www.salome-platform.org/ or email : webmaster.salome@opencascade.com
+#
+from __future__ import annotations
+import typing
+
+
+class AsyncJob(typing.Protocol):
+    """Job protocol for asyncio applications.
+
+    The services are those of GenericJob, as coroutines which do not block the
+    event loop. Many jobs can be monitored concurrently in one event loop.
+    """
+
+    async def submit(self) -> None:
+        """Submit the job to the batch manager and return.
+
+        If the submission fails, raise an exception.
+        """
+        ...
+
+    async def wait(self, timeout: float | None = None) -> None:
+        """Wait until the end of the job.
+
+        :param timeout: maximum waiting time in seconds. PybatchException is
+         raised if the job is not finished at the end of this time.
+        """
+        ...
+
+    async def state(self) -> str:
+        """Possible states : 'CREATED', 'IN_PROCESS', 'QUEUED', 'RUNNING',
+        'PAUSED', 'FINISHED', 'FAILED'
+        """
+        ...
+
+    async def exit_code(self) -> int | None:
+        """Get the exit code of the command if any.
+        If the code is not found, for instance when the job is neither FINISHED
+        nor FAILED, return None.
+        """
+        ...
+
+    async def cancel(self) -> None:
+        "Stop the job."
+        ...
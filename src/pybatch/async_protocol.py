@@ -0,0 +1,54 @@
+# Copyright (C) 2025-2026  CEA, EDF
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307 USA
+#
+# See http://www.salome-platform.org/ or email : webmaster.salome@opencascade.com
+#
+from __future__ import annotations
+import typing
+from collections.abc import Iterable
+from pathlib import Path
+
+
+class AsyncGenericProtocol(typing.Protocol):
+    """Connection protocol for asyncio applications.
+
+    The services are those of GenericProtocol, as coroutines which do not
+    block the event loop.
+    """
+
+    async def upload(
+        self, local_entries: Iterable[str | Path], remote_path: str
+    ) -> None:
+        "Upload files and directories to the server."
+        ...
+
+    async def download(
+        self, remote_entries: Iterable[str], local_path: str | Path
+    ) -> None:
+        "Download files and directories from the server."
+        ...
+
+    async def create(self, remote_path: str, content: str) -> None:
+        "Create a file on the server."
+        ...
+
+    async def read(self, remote_path: str) -> str:
+        "Get the content of a file."
+        ...
+
+    async def run(self, command: list[str]) -> str:
+        "Run a command on the server."
+        ...
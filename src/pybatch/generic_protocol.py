@@ -18,10 +18,40 @@
 #
 from __future__ import annotations
 import typing
-from collections.abc import Iterable
+from collections.abc import Iterable, Iterator
 from pathlib import Path
 
 
+class CommandResult(typing.NamedTuple):
+    "Result of a command run by GenericProtocol.run_many."
+
+    returncode: int
+    stdout: str
+    stderr: str
+
+
+class RemoteProcess(typing.Protocol):
+    "Command running on the server, started by GenericProtocol.start."
+
+    def write(self, data: bytes) -> None:
+        "Write to the standard input of the command."
+        ...
+
+    def readline(self) -> bytes:
+        "Read a line of the standard output, empty at the end of the output."
+        ...
+
+    def close_input(self) -> None:
+        "Close the standard input. The command sees the end of its input."
+        ...
+
+    def close(self) -> str:
+        """Close the standard input, wait for the end of the command and get
+        its standard error.
+        """
+        ...
+
+
 class GenericProtocol(typing.Protocol):
     """Connection protocol (ssh, local, ...).
 
@@ -40,6 +70,39 @@ class GenericProtocol(typing.Protocol):
         "Download files and directories from the server."
         ...
 
+    def upload_archive(
+        self,
+        local_entries: Iterable[str | Path],
+        remote_path: str,
+        compression: str = "",
+    ) -> None:
+        """Upload files and directories to the server in a single tar stream.
+
+        This is faster than upload for many small files. The remote directory
+        has to exist.
+        :param compression: "" (no compression), "gz" or "xz".
+        """
+        ...
+
+    def download_archive(
+        self,
+        remote_entries: Iterable[str],
+        local_path: str | Path,
+        compression: str = "",
+        base: str = "",
+    ) -> None:
+        """Download files and directories from the server in a single tar
+        stream.
+
+        This is faster than download for many small files. The local directory
+        has to exist.
+        :param compression: "" (no compression), "gz" or "xz".
+        :param base: when given, the entries are relative to this remote
+         directory and they keep their relative path in local_path. Otherwise
+         every entry is copied under its base name.
+        """
+        ...
+
     def create(self, remote_path: str, content: str) -> None:
         "Create a file on the server."
         ...
@@ -48,6 +111,64 @@ class GenericProtocol(typing.Protocol):
         "Get the content of a file."
         ...
 
+    def read_range(
+        self, remote_path: str, offset: int, length: int | None = None
+    ) -> bytes:
+        """Get a part of a file, without transferring the rest of it.
+
+        :param remote_path: path of the file on the server.
+        :param offset: position of the first byte to read.
+        :param length: maximum number of bytes to read. Read up to the end of
+         the file if None.
+        """
+        ...
+
+    def tail(
+        self,
+        remote_path: str,
+        n_bytes: int | None = None,
+        n_lines: int | None = None,
+    ) -> str:
+        """Get the end of a file.
+
+        :param remote_path: path of the file on the server.
+        :param n_bytes: maximum number of bytes to read.
+        :param n_lines: maximum number of lines to read.
+        """
+        ...
+
     def run(self, command: list[str]) -> str:
         "Run a command on the server."
         ...
+
+    def run_many(self, commands: list[list[str]]) -> list[CommandResult]:
+        """Run several independent commands on the server in a single remote
+        call.
+
+        The commands run one after the other, whatever their return codes.
+        PybatchException is raised only if the remote call itself fails.
+        :param commands: commands to run.
+        :return: the results of the commands, in the same order.
+        """
+        ...
+
+    def start(self, command: list[str]) -> RemoteProcess:
+        """Start a command on the server and return without waiting for its
+        end.
+
+        The command can be kept running for a long time and it communicates
+        through its standard input and output.
+        """
+        ...
+
+    def run_stream(
+        self, command: list[str], max_bytes: int | None = None
+    ) -> Iterator[str]:
+        """Run a command on the server and iterate over the lines of its output.
+
+        The output is not kept in memory and the standard error is read at the
+        same time, which allows commands with large outputs.
+        PybatchException is raised at the end of the iteration if the command
+        fails, or as soon as the output exceeds max_bytes.
+        """
+        ...
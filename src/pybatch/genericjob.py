@@ -18,6 +18,7 @@
 #
 from __future__ import annotations
 import typing
+from collections.abc import Iterator
 
 
 class GenericJob(typing.Protocol):
@@ -51,11 +52,22 @@ class GenericJob(typing.Protocol):
         "Stop the job."
         ...
 
-    def get(self, remote_path: list[str], local_path: str) -> None:
+    def get(
+        self,
+        remote_path: list[str],
+        local_path: str,
+        incremental: bool = False,
+        checksum: bool = False,
+    ) -> None:
         """Copy files from the remote work directory.
 
         :param remote_paths: paths relative to work directory on remote host.
         :param local_path: destination of the copy on local file system.
+        :param incremental: download only the files which are missing or
+         different in local_path, according to a manifest of the remote files
+         fetched in one remote command.
+        :param checksum: with incremental, compare the files by their sha256
+         instead of their size and modification time.
         """
         ...
 
@@ -67,12 +79,37 @@ class GenericJob(typing.Protocol):
         """
         ...
 
-    def stdout(self) -> str:
-        "Standard output of the job."
+    def stdout(self, tail: int | None = None) -> str:
+        """Standard output of the job.
+
+        :param tail: number of lines to get from the end of the output. The
+         whole output is returned if None.
+        """
+        ...
+
+    def stderr(self, tail: int | None = None) -> str:
+        """Standard error of the job.
+
+        :param tail: number of lines to get from the end of the error. The
+         whole error is returned if None.
+        """
+        ...
+
+    def follow_stdout(
+        self, interval: float = 1.0, max_interval: float = 30.0
+    ) -> Iterator[str]:
+        """Iterate over the lines of the standard output while the job runs.
+
+        Only the new part of the output is fetched at every tick. The delay
+        between two ticks grows from interval to max_interval while the output
+        does not change. The iteration stops when the job is over.
+        """
         ...
 
-    def stderr(self) -> str:
-        "Standard error of the job."
+    def follow_stderr(
+        self, interval: float = 1.0, max_interval: float = 30.0
+    ) -> Iterator[str]:
+        "Iterate over the lines of the standard error while the job runs."
         ...
 
     def dump(self) -> str:
@@ -0,0 +1,203 @@
+# Copyright (C) 2025-2026  CEA, EDF
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307 USA
+#
+# See http://www.salome-platform.org/ or email : webmaster.salome@opencascade.com
+#
+"""Content addressed cache of input files on a remote server.
+
+The input files are stored in a cache directory of the server, under the
+sha256 of their content. Files already present in the cache are not uploaded
+again, they are only linked into the work directory of the job.
+"""
+
+from __future__ import annotations
+from collections.abc import Iterable
+import json
+import os
+import pathlib
+import tempfile
+import uuid
+
+from .generic_protocol import GenericProtocol
+from .tools import path_join, file_sha256
+
+# Remote script which creates the cache directory and lists its content.
+LIST_SCRIPT = """
+import os, sys
+os.makedirs(sys.argv[1], exist_ok=True)
+for name in os.listdir(sys.argv[1]):
+    print(name)
+"""
+
+# Remote script which moves the uploaded files into the cache and links the
+# files of the manifest into the work directory.
+LINK_SCRIPT = """
+import json, os, shutil, sys
+incoming, work_dir = sys.argv[1], sys.argv[2]
+cache_dir = os.path.dirname(incoming)
+with open(os.path.join(incoming, "manifest.json")) as manifest_file:
+    manifest = json.load(manifest_file)
+for digest, relative_path in manifest:
+    cached = os.path.join(cache_dir, digest)
+    new = os.path.join(incoming, digest)
+    if os.path.exists(new):
+        os.replace(new, cached)
+    destination = os.path.join(work_dir, relative_path)
+    os.makedirs(os.path.dirname(destination), exist_ok=True)
+    if os.path.lexists(destination):
+        os.remove(destination)
+    try:
+        os.link(cached, destination)
+    except OSError:
+        os.symlink(cached, destination)
+shutil.rmtree(incoming)
+"""
+
+
+def cache_file() -> pathlib.Path:
+    "Local file where the hashes of the input files are kept."
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join("~", ".cache")
+    return pathlib.Path(base, "pybatch", "input_hashes.json").expanduser()
+
+
+class HashCache:
+    """Hashes of local files, kept as long as their size and their
+    modification time do not change.
+
+    :param path: file where the hashes are saved.
+    """
+
+    def __init__(self, path: str | pathlib.Path | None = None):
+        self.path = pathlib.Path(path) if path else cache_file()
+        self.modified = False
+        try:
+            self.hashes = json.loads(self.path.read_text())
+        except (OSError, ValueError):
+            self.hashes = {}
+
+    def hash(self, file_path: str | pathlib.Path) -> str:
+        "sha256 of the content of a file."
+        key = os.path.abspath(file_path)
+        stat = os.stat(key)
+        known = self.hashes.get(key)
+        if known and known[0] == stat.st_size and known[1] == stat.st_mtime_ns:
+            return str(known[2])
+        result = file_sha256(key)
+        self.hashes[key] = [stat.st_size, stat.st_mtime_ns, result]
+        self.modified = True
+        return result
+
+    def save(self) -> None:
+        "Save the hashes, if they changed."
+        if not self.modified:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(f"{self.path.name}.{uuid.uuid4().hex}")
+        tmp_path.write_text(json.dumps(self.hashes))
+        os.replace(tmp_path, self.path)
+        self.modified = False
+
+
+def input_manifest(
+    entries: Iterable[str | pathlib.Path], hashes: HashCache
+) -> list[tuple[str, str, str]]:
+    """List the files to be copied to the work directory.
+
+    The directories are walked through. Every entry is copied under its base
+    name, as it would be by 'scp -r'.
+    :return: list of (local path, path relative to the work directory, hash).
+    """
+    result = []
+    for entry in entries:
+        entry = os.path.normpath(entry)
+        name = os.path.basename(entry)
+        if os.path.isdir(entry):
+            for root, dirs, files in os.walk(entry):
+                dirs.sort()
+                for file_name in sorted(files):
+                    local_path = os.path.join(root, file_name)
+                    relative = os.path.relpath(local_path, entry)
+                    remote = "/".join([name] + relative.split(os.sep))
+                    result.append((local_path, remote, hashes.hash(local_path)))
+        else:
+            result.append((entry, name, hashes.hash(entry)))
+    return result
+
+
+def upload_cached(
+    protocol: GenericProtocol,
+    entries: Iterable[str | pathlib.Path],
+    cache_dir: str,
+    python_exe: str,
+    is_posix: bool = True,
+    hashes: HashCache | None = None,
+) -> list[str]:
+    """Upload the files missing from the remote cache.
+
+    The missing files and the manifest of the entries are uploaded in a new
+    directory of the cache. The command returned by this function moves them
+    into the cache and links the files into a work directory. The work
+    directory has to be added at the end of the command.
+    :param protocol: connection to the remote server.
+    :param entries: local files and directories.
+    :param cache_dir: remote cache directory.
+    :param python_exe: python executable on the remote server.
+    :param is_posix: Unix like server (True) or Windows server (False).
+    :param hashes: hashes of local files. Default to the user's cache.
+    :return: remote command without the work directory.
+    """
+    if hashes is None:
+        hashes = HashCache()
+    manifest = input_manifest(entries, hashes)
+    hashes.save()
+    listing = protocol.run([python_exe, "-c", LIST_SCRIPT, cache_dir])
+    cached = set(listing.split())
+    incoming_name = f"incoming-{uuid.uuid4().hex}"
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        incoming = os.path.join(tmp_dir, incoming_name)
+        os.mkdir(incoming)
+        for local_path, remote, digest in manifest:
+            link = os.path.join(incoming, digest)
+            if digest not in cached and not os.path.lexists(link):
+                # scp, sftp and copies follow the links
+                os.symlink(os.path.abspath(local_path), link)
+        content = [[digest, remote] for local_path, remote, digest in manifest]
+        pathlib.Path(incoming, "manifest.json").write_text(json.dumps(content))
+        protocol.upload([incoming], cache_dir)
+    remote_incoming = path_join(cache_dir, incoming_name, is_posix=is_posix)
+    return [python_exe, "-c", LINK_SCRIPT, remote_incoming]
+
+
+def copy_cached(
+    protocol: GenericProtocol,
+    entries: Iterable[str | pathlib.Path],
+    work_dir: str,
+    cache_dir: str,
+    python_exe: str,
+    is_posix: bool = True,
+) -> None:
+    """Copy files and directories to a remote work directory through the
+    remote cache.
+
+    :param protocol: connection to the remote server.
+    :param entries: local files and directories.
+    :param work_dir: remote work directory.
+    :param cache_dir: remote cache directory.
+    :param python_exe: python executable on the remote server.
+    :param is_posix: Unix like server (True) or Windows server (False).
+    """
+    command = upload_cached(protocol, entries, cache_dir, python_exe, is_posix)
+    protocol.run(command + [work_dir])
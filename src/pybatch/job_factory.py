@@ -18,24 +18,59 @@
 #
 from __future__ import annotations
 from importlib.metadata import entry_points
+import typing
 from .genericjob import GenericJob
 from .generic_protocol import GenericProtocol
-from .parameter import LaunchParameters
+from .async_job import AsyncJob
+from .async_protocol import AsyncGenericProtocol
+from .parameter import LaunchParameters, ConnectionParameters
 
 
 def create_job(
     plugin_name: str,
     params: LaunchParameters,
-    connection_protocol: GenericProtocol | None = None,
+    connection_protocol: GenericProtocol | ConnectionParameters | None = None,
 ) -> GenericJob:
     """Create the job with the chosen plugin.
 
     :param plugin_name: name of the plugin to use for the job creation.
     :param params: job parameters.
     :param connection_protocol: protocol for remote connection. None for local
-     use.
+     use. When connection parameters are given, the job uses a connection of
+     the default ProtocolPool, shared with the other jobs on the same server.
     """
+    if isinstance(connection_protocol, ConnectionParameters):
+        from .protocols.pool import default_pool
 
+        connection_protocol = default_pool().get(connection_protocol)
+
+    plugin = load_plugin(plugin_name)
+    job: GenericJob = plugin.create_job(params, connection_protocol)
+    return job
+
+
+def create_async_job(
+    plugin_name: str,
+    params: LaunchParameters,
+    connection_protocol: AsyncGenericProtocol | None = None,
+) -> AsyncJob:
+    """Create a job for asyncio applications with the chosen plugin.
+
+    :param plugin_name: name of the plugin to use for the job creation. The
+     plugin has to support asyncio.
+    :param params: job parameters.
+    :param connection_protocol: asyncio protocol for remote connection. None
+     for local use.
+    """
+    plugin = load_plugin(plugin_name)
+    if not hasattr(plugin, "create_async_job"):
+        raise Exception(f"Plugin {plugin_name} does not support asyncio.")
+    job: AsyncJob = plugin.create_async_job(params, connection_protocol)
+    return job
+
+
+def load_plugin(plugin_name: str) -> typing.Any:
+    "Load the plugin registered with this name."
     # for entry_point in entry_points().get("pybatch.plugins"):
     ep = entry_points()
     if isinstance(ep, dict):
@@ -45,9 +80,7 @@ def create_job(
         ep_it = ep.select(group="pybatch.plugins")
     for entry_point in ep_it:
         if entry_point.name == plugin_name:
-            plugin = entry_point.load()()
-            job: GenericJob = plugin.create_job(params, connection_protocol)
-            return job
+            return entry_point.load()()
     raise Exception(f"Plugin {plugin_name} not found.")
 
 
@@ -44,7 +44,10 @@ class LaunchParameters:
         "days-hours:minutes:seconds".
       * mem_per_node - memory required per node (ex. "32G").
       * mem_per_cpu - minimum memory required per usable allocated CPU.
-      * queue - required queue.
+      * queue - required queue. Without batch manager, name of the queue of
+        the server which starts the jobs when the cpus (ntasks) and the memory
+        (mem_per_node or mem_per_cpu) they need are available. A path to the
+        database of the queue can also be given, to share it between users.
       * partition - required partition.
       * wckey
       * extra_as_string - extra parameters as a string
@@ -56,6 +59,14 @@ class LaunchParameters:
       * python_exe - path to the python executable. Default to "python3".
       * create_nodefile - create LIBBATCH_NODEFILE which contains the list of
         allocated nodes.
+      * archive_transfer - transfer the input files and the results in a single
+        tar stream instead of file by file. Faster for many small files.
+      * archive_compression - compression of the tar stream: "" (none), "gz"
+        or "xz".
+      * input_cache - remote directory where the input files are kept under
+        the hash of their content. When it is defined, only the files missing
+        from this cache are uploaded and the input files are linked into the
+        work directory. The job must not modify its input files in place.
     """
 
     command: list[str]
@@ -78,6 +89,9 @@ class LaunchParameters:
     is_posix: bool = True
     python_exe: str = "python3"
     create_nodefile: bool = False
+    archive_transfer: bool = False
+    archive_compression: str = ""
+    input_cache: str = ""
 
 
 @dataclass
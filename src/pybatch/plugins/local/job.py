@@ -20,9 +20,12 @@ from __future__ import annotations
 import typing
 from typing import Optional
 from types import FrameType
+from collections.abc import Iterator
 
 from ... import GenericJob, LaunchParameters, PybatchException
-from ...tools import slurm_time_to_seconds
+from ...tools import slurm_time_to_seconds, tail_file, follow_file
+from ...protocols.local import LocalProtocol
+from ...sync import download_incremental
 from pathlib import Path
 import shutil
 import subprocess
@@ -134,28 +137,78 @@ class Job(GenericJob):
                 pass
         pu.terminate()
 
-    def get(self, remote_paths: list[str], local_path: str | Path) -> None:
+    def get(
+        self,
+        remote_paths: list[str],
+        local_path: str | Path,
+        incremental: bool = False,
+        checksum: bool = False,
+    ) -> None:
         """Copy a file or directory from the remote work directory.
 
         :param remote_path: path relative to work directory on the remote host.
         :param local_path: destination of the copy on local file system.
+        :param incremental: copy only the files which are missing or different
+         in local_path.
+        :param checksum: with incremental, compare the files by their hash
+         instead of their size and modification time.
         """
+        abs_remote_paths = []
         for path in remote_paths:
             if os.path.isabs(path):
                 abs_remote_path = path
             else:
                 tmp_path = Path(self.work_directory) / path
                 abs_remote_path = os.path.realpath(tmp_path)
-            copy(abs_remote_path, local_path)
+            abs_remote_paths.append(abs_remote_path)
+        if incremental:
+            download_incremental(
+                LocalProtocol(),
+                abs_remote_paths,
+                local_path,
+                sys.executable,
+                checksum=checksum,
+            )
+        else:
+            for abs_remote_path in abs_remote_paths:
+                copy(abs_remote_path, local_path)
 
-    def stdout(self) -> str:
+    def stdout(self, tail: int | None = None) -> str:
         output_file = Path(self.work_directory, "logs", "output.log")
+        if tail is not None:
+            with output_file.open("rb") as f:
+                return tail_file(f, n_lines=tail).decode(errors="replace")
         return output_file.read_text()
 
-    def stderr(self) -> str:
+    def stderr(self, tail: int | None = None) -> str:
         output_file = Path(self.work_directory, "logs", "error.log")
+        if tail is not None:
+            with output_file.open("rb") as f:
+                return tail_file(f, n_lines=tail).decode(errors="replace")
         return output_file.read_text()
 
+    def follow_stdout(
+        self, interval: float = 1.0, max_interval: float = 30.0
+    ) -> Iterator[str]:
+        return self._follow_log("output.log", interval, max_interval)
+
+    def follow_stderr(
+        self, interval: float = 1.0, max_interval: float = 30.0
+    ) -> Iterator[str]:
+        return self._follow_log("error.log", interval, max_interval)
+
+    def _follow_log(
+        self, name: str, interval: float, max_interval: float
+    ) -> Iterator[str]:
+        log_file = Path(self.work_directory, "logs", name)
+
+        def read_range(offset: int) -> bytes:
+            with log_file.open("rb") as f:
+                f.seek(offset)
+                return f.read()
+
+        return follow_file(read_range, self.state, interval, max_interval)
+
     def config(self) -> dict[str, typing.Any]:
         cfg: dict[str, typing.Any] = {
             "command": self.command,
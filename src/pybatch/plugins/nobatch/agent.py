@@ -0,0 +1,228 @@
+# Copyright (C) 2025-2026  CEA, EDF
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307 USA
+#
+# See http://www.salome-platform.org/ or email : webmaster.salome@opencascade.com
+#
+"""Client of pybatch_manager.py running in serve mode on the server."""
+
+from __future__ import annotations
+import atexit
+import itertools
+import json
+import queue
+import threading
+import typing
+import weakref
+
+from ... import GenericProtocol, PybatchException
+from ...generic_protocol import RemoteProcess
+
+Answer = typing.Optional[dict[str, typing.Any]]
+
+
+class ManagerStopped(PybatchException):
+    "The manager stopped before answering a request."
+
+
+class Session:
+    """Manager process and the requests waiting for an answer.
+
+    The answers are read by a thread and given to the waiting callers.
+    """
+
+    def __init__(self, process: RemoteProcess):
+        self.process = process
+        self.errors = ""
+        self._alive = True
+        self._pending: dict[int, queue.Queue[Answer]] = {}
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self._reader = threading.Thread(target=self._read_answers, daemon=True)
+        self._reader.start()
+
+    @property
+    def alive(self) -> bool:
+        return self._alive
+
+    def send(
+        self, method: str, params: dict[str, typing.Any]
+    ) -> queue.Queue[Answer]:
+        "Send a request and return the queue which receives the answer."
+        answers: queue.Queue[Answer] = queue.Queue(1)
+        with self._lock:
+            if not self._alive:
+                raise ManagerStopped("The manager is stopped.")
+            request_id = next(self._ids)
+            self._pending[request_id] = answers
+            line = json.dumps(
+                {"id": request_id, "method": method, "params": params}
+            )
+            try:
+                self.process.write(line.encode() + b"\n")
+            except Exception as e:
+                del self._pending[request_id]
+                raise ManagerStopped("The manager is stopped.") from e
+        return answers
+
+    def _read_answers(self) -> None:
+        while True:
+            try:
+                line = self.process.readline()
+            except Exception:
+                line = b""
+            if not line:
+                break
+            try:
+                answer = json.loads(line)
+                request_id = answer["id"]
+            except (ValueError, TypeError, KeyError):
+                continue  # not an answer
+            with self._lock:
+                answers = self._pending.pop(request_id, None)
+            if answers is not None:
+                answers.put(answer)
+        with self._lock:
+            self._alive = False
+            pending = list(self._pending.values())
+            self._pending.clear()
+        try:
+            self.errors = self.process.close()
+        finally:
+            for answers in pending:
+                answers.put(None)
+
+    def close(self, timeout: float = 10.0) -> None:
+        """Stop the manager. The requests waiting for an answer fail.
+
+        The manager stops at the end of its input. The process is closed by
+        the thread which reads the answers, which is the only reader of the
+        output.
+        :param timeout: maximum delay to wait for the end of the manager.
+        """
+        self.process.close_input()
+        if threading.current_thread() is not self._reader:
+            self._reader.join(timeout)
+
+
+class ManagerAgent:
+    """Client of a pybatch_manager.py which stays resident on the server.
+
+    The manager is started in serve mode by the first request and all the
+    requests go through its standard input and output, which saves the start
+    of a remote command and of a python interpreter for every request. The
+    manager is started again if it stops. The agent is safe for concurrent use
+    from threads.
+
+    :param protocol: connection protocol to the server.
+    :param command: command which starts the manager in serve mode.
+    """
+
+    def __init__(self, protocol: GenericProtocol, command: list[str]):
+        # no strong reference, the agents of a protocol are kept with it.
+        self._protocol = weakref.ref(protocol)
+        self.command = command
+        self._session: Session | None = None
+        self._lock = threading.Lock()
+
+    def close(self) -> None:
+        "Stop the manager."
+        with self._lock:
+            session = self._session
+            self._session = None
+        if session is not None:
+            session.close()
+
+    def call(self, method: str, **params: typing.Any) -> typing.Any:
+        """Send a request to the manager and wait for its answer.
+
+        When the manager stops before answering, the request is sent again to
+        a new manager, except a submission, which could be done twice.
+        :param method: function of the manager (submit, state, wait, cancel).
+        :param params: parameters of the function.
+        """
+        try:
+            return self._call(method, params)
+        except ManagerStopped:
+            if method == "submit":
+                raise
+            return self._call(method, params)
+
+    def _call(self, method: str, params: dict[str, typing.Any]) -> typing.Any:
+        session = self._get_session()
+        answer = session.send(method, params).get()
+        if answer is None:
+            raise ManagerStopped(
+                f"""The manager stopped.
+  command: {self.command}.
+  stderr: {session.errors}
+"""
+            )
+        if "error" in answer:
+            raise PybatchException(f"{method} failed: {answer['error']}")
+        return answer.get("result")
+
+    def _get_session(self) -> Session:
+        with self._lock:
+            if self._session is None or not self._session.alive:
+                protocol = self._protocol()
+                if protocol is None:
+                    raise PybatchException("The protocol no longer exists.")
+                self._session = Session(protocol.start(self.command))
+            return self._session
+
+
+_agents: weakref.WeakKeyDictionary[typing.Any, dict[str, ManagerAgent]] = (
+    weakref.WeakKeyDictionary()
+)
+_agents_lock = threading.Lock()
+
+
+def manager_agent(
+    protocol: GenericProtocol, python_exe: str, manager_path: str
+) -> ManagerAgent:
+    """Agent shared by the jobs which use the same protocol and python.
+
+    :param protocol: connection protocol to the server.
+    :param python_exe: python executable on the server.
+    :param manager_path: path of pybatch_manager.py on the server, used if
+     the agent does not exist yet.
+    """
+    with _agents_lock:
+        agents = _agents.get(protocol)
+        if agents is None:
+            agents = _agents[protocol] = {}
+            # the managers stop with the protocol.
+            finalizer = weakref.finalize(protocol, _close_agents, agents)
+            finalizer.atexit = False
+        agent = agents.get(python_exe)
+        if agent is None:
+            agent = ManagerAgent(protocol, [python_exe, manager_path, "serve"])
+            agents[python_exe] = agent
+        return agent
+
+
+def _close_agents(agents: dict[str, ManagerAgent]) -> None:
+    for agent in list(agents.values()):
+        agent.close()
+
+
+@atexit.register
+def _close_all_agents() -> None:
+    "Stop the managers before the shutdown of the interpreter."
+    with _agents_lock:
+        all_agents = [dict(agents) for agents in _agents.values()]
+    for agents in all_agents:
+        _close_agents(agents)
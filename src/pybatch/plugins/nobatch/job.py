@@ -17,15 +17,125 @@
 # See http://www.salome-platform.org/ or email : webmaster.salome@opencascade.com
 #
 from __future__ import annotations
+from collections.abc import Iterator
 from pathlib import Path
+import base64
+import functools
+import hashlib
 import os
+import typing
+import weakref
+import zlib
 
 from ... import GenericJob, GenericProtocol, LaunchParameters, PybatchException
 from ...protocols.local import LocalProtocol
-from ...tools import path_join, is_absolute, slurm_time_to_seconds, remote_mkdir
+from ...input_cache import copy_cached
+from ...sync import download_incremental
+from ...tools import path_join, is_absolute, slurm_time_to_seconds
+from ...tools import slurm_memory_to_megabytes
+from ...tools import follow_job_log
+from .agent import ManagerAgent, manager_agent
+from .pybatch_manager import EXIT_CODE_WIDTH
+
+if typing.TYPE_CHECKING:
+    from .monitor import JobMonitor
+
+MANAGER_SCRIPT = Path(os.path.dirname(__file__)) / "pybatch_manager.py"
+
+# Remote script which creates the log directory of a job and installs the
+# manager in the cache of the user, if it is not there yet. The path of the
+# manager is printed, or nothing if the manager is missing and its content is
+# not given. The script has to run with python 3.5.
+PREPARE_SCRIPT = """
+import base64, os, sys, zlib
+from pathlib import Path
+log_dir, digest = sys.argv[1:3]
+data = sys.argv[3] if len(sys.argv) > 3 else ""
+Path(log_dir).mkdir(parents=True, exist_ok=True)
+manager_dir = Path.home() / ".cache" / "pybatch" / ("manager-" + digest)
+manager = manager_dir / "pybatch_manager.py"
+if not manager.is_file():
+    if not data:
+        sys.exit(0)
+    manager_dir.mkdir(parents=True, exist_ok=True)
+    new = manager_dir / ("pybatch_manager.py." + str(os.getpid()))
+    new.write_bytes(zlib.decompress(base64.b64decode(data)))
+    os.replace(str(new), str(manager))
+print(manager)
+"""
+
+
+@functools.lru_cache(maxsize=None)
+def manager_payload() -> tuple[str, str]:
+    """Version and compressed content of pybatch_manager.py.
+
+    The version is a hash of the content. The content is encoded in base64.
+    """
+    content = MANAGER_SCRIPT.read_bytes()
+    digest = hashlib.sha256(content).hexdigest()[:16]
+    return digest, base64.b64encode(zlib.compress(content, 9)).decode()
+
+
+def prepare_command(
+    python_exe: str, log_dir: str, with_manager: bool = True
+) -> list[str]:
+    """Command which creates the log directory of a job and installs the
+    manager on the server, once for all the jobs. It prints the path of the
+    manager.
+
+    :param with_manager: send the content of the manager. Otherwise, nothing
+     is printed when the manager is not installed yet.
+    """
+    digest, data = manager_payload()
+    command = [python_exe, "-c", PREPARE_SCRIPT, log_dir, digest]
+    if with_manager:
+        command.append(data)
+    return command
+
+
+# python executables of the servers where the manager is known to be
+# installed, by protocol.
+_installed: weakref.WeakKeyDictionary[typing.Any, set[str]] = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def prepare_job(
+    protocol: GenericProtocol, python_exe: str, log_dir: str
+) -> str:
+    """Create the log directory of a job and install the manager on the server
+    if it is missing. Return the path of the manager.
+
+    The content of the manager is sent by the first job of a protocol and a
+    python executable only, or when the manager is no longer installed.
+    :param protocol: connection protocol to the server.
+    :param python_exe: python executable on the server.
+    :param log_dir: log directory of the job.
+    """
+    if python_exe in _installed.get(protocol, ()):
+        command = prepare_command(python_exe, log_dir, with_manager=False)
+        manager_path = protocol.run(command).strip()
+        if manager_path:
+            return manager_path
+    manager_path = protocol.run(prepare_command(python_exe, log_dir)).strip()
+    _installed.setdefault(protocol, set()).add(python_exe)
+    return manager_path
 
 
 class Job(GenericJob):
+    # The requests to the manager go through a manager which stays resident on
+    # the server, shared by the jobs of the same protocol. When False, every
+    # request starts a new manager, which is always the case for the jobs
+    # submitted by older versions. Defined at class level for jobs pickled by
+    # older versions.
+    use_agent: bool = True
+    # Optional JobMonitor used to share the queries of the states with other
+    # jobs.
+    monitor: JobMonitor | None = None
+    # State and exit code kept when the job is over.
+    _final_state: str = ""
+    _final_exit_code: int | None = None
+
     def __init__(self, param: LaunchParameters, protocol: GenericProtocol):
         self.job_params = param
         self.protocol: GenericProtocol
@@ -34,9 +144,8 @@ class Job(GenericJob):
         else:
             self.protocol = protocol
         self.jobid = ""
-        self.remote_manager_path = path_join(
-            param.work_directory, "pybatch_manager.py", is_posix=param.is_posix
-        )
+        # path of the manager installed on the server, known after submit.
+        self.remote_manager_path = ""
 
     def submit(self) -> None:
         try:
@@ -45,73 +154,157 @@ class Job(GenericJob):
                 "logs",
                 is_posix=self.job_params.is_posix,
             )
-            remote_mkdir(self.protocol, logdir, self.job_params.python_exe)
+            # The manager is shared by the jobs. It is installed by the
+            # command which creates the log directory, only if it is missing.
+            self.remote_manager_path = prepare_job(
+                self.protocol, self.job_params.python_exe, logdir
+            )
+            self._final_state = ""
+            self._final_exit_code = None
 
-            file_dir = Path(os.path.dirname(__file__))
-            manager_script = file_dir / "pybatch_manager.py"
-            input_files = self.job_params.input_files + [manager_script]
-            self.protocol.upload(input_files, self.job_params.work_directory)
-            command = [
-                self.job_params.python_exe,
-                self.remote_manager_path,
-                "submit",
-                self.job_params.work_directory,
-            ]
+            input_files = self.job_params.input_files
+            if self.job_params.input_cache and self.job_params.input_files:
+                copy_cached(
+                    self.protocol,
+                    self.job_params.input_files,
+                    self.job_params.work_directory,
+                    self.job_params.input_cache,
+                    self.job_params.python_exe,
+                    self.job_params.is_posix,
+                )
+                input_files = []
+            if input_files and self.job_params.archive_transfer:
+                self.protocol.upload_archive(
+                    input_files,
+                    self.job_params.work_directory,
+                    self.job_params.archive_compression,
+                )
+            elif input_files:
+                self.protocol.upload(
+                    input_files, self.job_params.work_directory
+                )
+            wall_time = None
             if self.job_params.wall_time:
                 seconds = slurm_time_to_seconds(self.job_params.wall_time)
-                command += ["--wall_time", seconds]
+                wall_time = int(seconds)
+            ntasks = 0
             if self.job_params.create_nodefile:
-                if self.job_params.ntasks > 0:
-                    command += ["--ntasks", str(self.job_params.ntasks)]
-            if self.job_params.total_jobs > 1:
-                command += ["--total_jobs", str(self.job_params.total_jobs)]
-                if self.job_params.max_simul_jobs > 1:
-                    command += [
-                        "--max_simul_jobs",
-                        str(self.job_params.max_simul_jobs),
-                    ]
-            command += self.job_params.command
-            self.jobid = self.protocol.run(command).strip()
+                ntasks = self.job_params.ntasks
+            self.jobid = str(
+                self._manager(
+                    "submit",
+                    work_dir=self.job_params.work_directory,
+                    command=self.job_params.command,
+                    wall_time=wall_time,
+                    ntasks=ntasks,
+                    total_jobs=self.job_params.total_jobs,
+                    max_simul_jobs=self.job_params.max_simul_jobs,
+                    **self._queue_params(),
+                )
+            ).strip()
             int(self.jobid)  # check
         except Exception as e:
             message = "Failed to submit job."
             raise PybatchException(message) from e
 
-    def wait(self) -> None:
-        "Wait until the end of the job."
+    def _queue_params(self) -> dict[str, typing.Any]:
+        """Parameters of the admission of the job by the queue of the server.
+
+        Every task running at the same time uses ntasks cpus and
+        mem_per_node, or mem_per_cpu for each of its cpus, like the tasks of
+        a Slurm array.
+        """
+        if not self.job_params.queue:
+            return {}
+        parallel_tasks = 1
+        if self.job_params.total_jobs > 1:
+            parallel_tasks = min(
+                max(self.job_params.max_simul_jobs, 1),
+                self.job_params.total_jobs,
+            )
+        cpus = max(self.job_params.ntasks, 1) * parallel_tasks
+        mem = (
+            slurm_memory_to_megabytes(self.job_params.mem_per_node)
+            * parallel_tasks
+        )
+        if not mem:
+            mem_per_cpu = self.job_params.mem_per_cpu
+            mem = slurm_memory_to_megabytes(mem_per_cpu) * cpus
+        return {"queue": self.job_params.queue, "cpus": cpus, "mem": mem}
+
+    def wait(self, timeout: float | None = None) -> None:
+        """Wait until the end of the job.
+
+        The manager on the server is notified of the end of the job, without
+        polling where it is possible (pidfd on linux).
+        :param timeout: maximum waiting time in seconds. PybatchException is
+         raised if the job is not finished at the end of this time.
+        """
         if not self.jobid:
             return
+        params: dict[str, typing.Any] = {"proc": int(self.jobid)}
+        if timeout is not None:
+            params["timeout"] = timeout
         try:
-            command = [
-                self.job_params.python_exe,
-                self.remote_manager_path,
-                "wait",
-                self.jobid,
-            ]
-            self.protocol.run(command)
+            result = self._manager("wait", **params)
         except Exception as e:
             message = "Failed to wait job."
             raise PybatchException(message) from e
+        # False from the agent, TIMEOUT from the command line interface.
+        if result is False or str(result).strip() == "TIMEOUT":
+            raise PybatchException(
+                f"Timeout while waiting for job {self.jobid}."
+            )
 
     def state(self) -> str:
+        """Possible states : 'CREATED', 'QUEUED', 'RUNNING', 'FINISHED',
+        'FAILED'. A job is QUEUED while it waits for the queue of the server.
+
+        When the job is registered in a JobMonitor, the state is resolved by
+        the monitor, together with the states of the other registered jobs.
+        Once the job is FINISHED or FAILED, the state is kept and it is
+        returned without any remote call.
+        """
         if not self.jobid:
             return "CREATED"
-        try:
-            command = [
-                self.job_params.python_exe,
-                self.remote_manager_path,
-                "state",
-                self.jobid,
-                self.job_params.work_directory,
-            ]
-            result: str = self.protocol.run(command).strip()
+        if self._final_state:
+            return self._final_state
+        if self.monitor is not None:
+            return self.monitor.state(self)
+        return self._query_state()
 
+    def _query_state(self) -> str:
+        "Query the state of this job alone."
+        try:
+            result = str(
+                self._manager(
+                    "state",
+                    proc=int(self.jobid),
+                    work_dir=self.job_params.work_directory,
+                )
+            ).strip()
         except Exception as e:
-            message = "Failed to wait job."
+            message = "Failed to get the state of the job."
             raise PybatchException(message) from e
+        self._keep_final_state(result)
         return result
 
+    def _keep_final_state(
+        self, state: str, exit_code: int | None = None
+    ) -> None:
+        """Keep the state and the exit code of a job which is over.
+
+        They are returned by state() and exit_code() without any remote call.
+        :param state: state of the job.
+        :param exit_code: exit code of the job, read later if None.
+        """
+        if state == "FINISHED" or state == "FAILED":
+            self._final_state = state
+            self._final_exit_code = exit_code
+
     def exit_code(self) -> int | None:
+        if self._final_exit_code is not None:
+            return self._final_exit_code
         exit_code_path = path_join(
             self.job_params.work_directory,
             "logs",
@@ -122,28 +315,97 @@ class Job(GenericJob):
             result = int(self.protocol.read(exit_code_path).strip())
         except Exception:
             result = None
+        if self._final_state:
+            self._final_exit_code = result
         return result
 
     def cancel(self) -> None:
         if not self.jobid:
             return
         try:
-            command = [
-                self.job_params.python_exe,
-                self.remote_manager_path,
-                "cancel",
-                self.jobid,
-            ]
-            self.protocol.run(command)
+            self._manager("cancel", proc=int(self.jobid))
         except Exception as e:
             message = "Failed to cancel job."
             raise PybatchException(message) from e
 
-    def get(self, remote_paths: list[str], local_path: str | Path) -> None:
+    def _manager(self, method: str, **params: typing.Any) -> typing.Any:
+        """Call a function of the manager on the server.
+
+        :param method: function of the manager (submit, state, wait, cancel).
+        :param params: parameters of the function.
+        :return: result of the function.
+        """
+        if self.use_agent and not self._old_manager():
+            return self._agent().call(method, **params)
+        # one manager per request, with the command line interface.
+        command = [self.job_params.python_exe, self.remote_manager_path]
+        if not self._old_manager():
+            # the managers of older versions log in their work directory.
+            log_file = path_join(
+                self.job_params.work_directory,
+                "pybatch.log",
+                is_posix=self.job_params.is_posix,
+            )
+            command += ["--log", log_file]
+        command.append(method)
+        if method == "submit":
+            command.append(params["work_dir"])
+            if params["wall_time"] is not None:
+                command += ["--wall_time", str(params["wall_time"])]
+            if params["ntasks"] > 0:
+                command += ["--ntasks", str(params["ntasks"])]
+            if params["total_jobs"] > 1:
+                command += ["--total_jobs", str(params["total_jobs"])]
+                if params["max_simul_jobs"] > 1:
+                    command += [
+                        "--max_simul_jobs",
+                        str(params["max_simul_jobs"]),
+                    ]
+            if "queue" in params:
+                command += ["--queue", params["queue"]]
+                command += ["--cpus", str(params["cpus"])]
+                command += ["--mem", str(params["mem"])]
+            # the options of the command are not options of the manager
+            command += ["--"] + params["command"]
+        else:
+            command.append(str(params["proc"]))
+            if "work_dir" in params:
+                command.append(params["work_dir"])
+            if "timeout" in params:
+                command += ["--timeout", str(params["timeout"])]
+        return self.protocol.run(command)
+
+    def _old_manager(self) -> bool:
+        """True for a job submitted by an older version, whose manager was
+        copied in its work directory. This manager has no serve mode.
+        """
+        old_path = path_join(
+            self.job_params.work_directory,
+            "pybatch_manager.py",
+            is_posix=self.job_params.is_posix,
+        )
+        return self.remote_manager_path == old_path
+
+    def _agent(self) -> ManagerAgent:
+        return manager_agent(
+            self.protocol, self.job_params.python_exe, self.remote_manager_path
+        )
+
+    def get(
+        self,
+        remote_paths: list[str],
+        local_path: str | Path,
+        incremental: bool = False,
+        checksum: bool = False,
+    ) -> None:
         """Copy a file or directory from the remote work directory.
 
-        :param remote_path: path relative to work directory on the remote host.
+        :param remote_paths: paths relative to work directory on remote host.
         :param local_path: destination of the copy on local file system.
+        :param incremental: download only the files which are missing or
+         different in local_path.
+        :param checksum: with incremental, compare the files by their hash
+         instead of their size and modification time.
         """
         checked_paths = []
         for path in remote_paths:
@@ -156,25 +418,183 @@ class Job(GenericJob):
                     is_posix=self.job_params.is_posix,
                 )
                 checked_paths.append(p)
-        self.protocol.download(checked_paths, local_path)
+        if incremental:
+            download_incremental(
+                self.protocol,
+                checked_paths,
+                local_path,
+                self.job_params.python_exe,
+                self.job_params.is_posix,
+                checksum,
+                self._download,
+                self.job_params.archive_compression,
+            )
+        else:
+            self._download(checked_paths, local_path)
 
-    def stdout(self) -> str:
-        output_file = path_join(
-            self.job_params.work_directory,
-            "logs",
-            "output.log",
-            is_posix=self.job_params.is_posix,
-        )
-        return self.protocol.read(str(output_file))
+    def _download(
+        self, remote_paths: list[str], local_path: str | Path
+    ) -> None:
+        if self.job_params.archive_transfer:
+            self.protocol.download_archive(
+                remote_paths, local_path, self.job_params.archive_compression
+            )
+        else:
+            self.protocol.download(remote_paths, local_path)
+
+    def stdout(self, tail: int | None = None) -> str:
+        """Standard output of the job.
+
+        For a job array, the outputs of the tasks are concatenated in the
+        order of the tasks.
+        """
+        return self._read_job_log("output", tail)
+
+    def stderr(self, tail: int | None = None) -> str:
+        """Standard error of the job.
+
+        For a job array, the errors of the tasks are concatenated in the order
+        of the tasks.
+        """
+        return self._read_job_log("error", tail)
+
+    def _task_logs(self) -> bool:
+        """True when each task of the job has its own logs.
+
+        The tasks of the arrays of the older managers share the logs of the
+        job.
+        """
+        return self.job_params.total_jobs > 1 and not self._old_manager()
+
+    def _read_job_log(self, kind: str, tail: int | None) -> str:
+        if not self._task_logs():
+            return self._read_log(f"{kind}.log", tail)
+        names = [
+            f"{kind}_{task}.log" for task in range(self.job_params.total_jobs)
+        ]
+        if tail is None:
+            return "".join(self._read_task_log(name, None) for name in names)
+        # from the last task, until there are enough lines.
+        lines: list[str] = []
+        for name in reversed(names):
+            if len(lines) >= tail:
+                break
+            text = self._read_task_log(name, tail - len(lines))
+            lines = text.splitlines(keepends=True) + lines
+        return "".join(lines[max(len(lines) - tail, 0) :])
 
-    def stderr(self) -> str:
-        output_file = path_join(
+    def _read_task_log(self, name: str, tail: int | None) -> str:
+        "Log of a task of an array, empty if the task has not started."
+        try:
+            return self._read_log(name, tail)
+        except Exception:
+            return ""
+
+    def task_stdout(self, task: int, tail: int | None = None) -> str:
+        """Standard output of a task of a job array.
+
+        Only the log of this task is transferred.
+        :param task: index of the task, from 0.
+        :param tail: number of lines to get from the end of the output. The
+         whole output is returned if None.
+        """
+        return self._read_log(f"output_{task}.log", tail)
+
+    def task_stderr(self, task: int, tail: int | None = None) -> str:
+        """Standard error of a task of a job array.
+
+        Only the log of this task is transferred.
+        :param task: index of the task, from 0.
+        :param tail: number of lines to get from the end of the error. The
+         whole error is returned if None.
+        """
+        return self._read_log(f"error_{task}.log", tail)
+
+    def task_exit_code(self, task: int) -> int | None:
+        """Exit code of a task of a job array.
+
+        Only the exit code of this task is transferred. Return None if the task
+        is not finished.
+        :param task: index of the task, from 0.
+        """
+        try:
+            record = self.protocol.read_range(
+                self._log_path("exit_codes.log"),
+                task * EXIT_CODE_WIDTH,
+                EXIT_CODE_WIDTH,
+            )
+            return int(record)
+        except Exception:
+            return None
+
+    def _log_path(self, name: str) -> str:
+        return path_join(
             self.job_params.work_directory,
             "logs",
-            "error.log",
+            name,
             is_posix=self.job_params.is_posix,
         )
-        return self.protocol.read(str(output_file))
+
+    def _read_log(self, name: str, tail: int | None) -> str:
+        log_file = self._log_path(name)
+        if tail is not None:
+            return self.protocol.tail(log_file, n_lines=tail)
+        return self.protocol.read(log_file)
+
+    def follow_stdout(
+        self, interval: float = 1.0, max_interval: float = 30.0
+    ) -> Iterator[str]:
+        """Follow the standard output of the job.
+
+        For a job array, the outputs of the tasks are followed one after the
+        other, in the order of the tasks.
+        """
+        return self._follow_job_log("output", interval, max_interval)
+
+    def follow_stderr(
+        self, interval: float = 1.0, max_interval: float = 30.0
+    ) -> Iterator[str]:
+        """Follow the standard error of the job.
+
+        For a job array, the errors of the tasks are followed one after the
+        other, in the order of the tasks.
+        """
+        return self._follow_job_log("error", interval, max_interval)
+
+    def _follow_job_log(
+        self, kind: str, interval: float, max_interval: float
+    ) -> Iterator[str]:
+        if not self._task_logs():
+            yield from follow_job_log(
+                self.protocol,
+                self.job_params,
+                f"{kind}.log",
+                self.state,
+                interval,
+                max_interval,
+            )
+            return
+        for task in range(self.job_params.total_jobs):
+            yield from follow_job_log(
+                self.protocol,
+                self.job_params,
+                f"{kind}_{task}.log",
+                functools.partial(self._task_state, task),
+                interval,
+                max_interval,
+            )
+
+    def _task_state(self, task: int) -> str:
+        "State of a task of an array, as far as its log is concerned."
+        if self.task_exit_code(task) is not None:
+            return "FINISHED"
+        return self.state()
 
     def batch_file(self) -> str:
         return ""
+
+    def __getstate__(self) -> dict[str, typing.Any]:
+        # The monitor is shared with other jobs and it is not serialized.
+        state = self.__dict__.copy()
+        state.pop("monitor", None)
+        return state
@@ -0,0 +1,127 @@
+# Copyright (C) 2025-2026  CEA, EDF
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307 USA
+#
+# See http://www.salome-platform.org/ or email : webmaster.salome@opencascade.com
+#
+from __future__ import annotations
+from collections.abc import Iterable
+import json
+import time
+import typing
+
+from pybatch import PybatchException
+from .job import Job
+
+
+class JobMonitor:
+    """Resolve the states of many jobs without batch manager with bulk queries.
+
+    The states of the registered jobs which share the same server are obtained
+    with a single request "state-many" to the manager. The states are kept for
+    max_age seconds and they are returned by the function state() of the
+    registered jobs. The jobs which are over are no longer queried.
+
+    :param jobs: jobs to register.
+    :param max_age: delay in seconds before querying the states again.
+    """
+
+    def __init__(self, jobs: Iterable[Job] = (), max_age: float = 1.0):
+        self.max_age = max_age
+        self._jobs: dict[int, Job] = {}
+        self._states: dict[int, str] = {}
+        self._timestamp = -float("inf")
+        for job in jobs:
+            self.add(job)
+
+    def add(self, job: Job) -> None:
+        "Register a job. Its state is then resolved by this monitor."
+        self._jobs[id(job)] = job
+        job.monitor = self
+
+    def remove(self, job: Job) -> None:
+        "Unregister a job."
+        if self._jobs.pop(id(job), None) is not None:
+            job.monitor = None
+        self._states.pop(id(job), None)
+
+    def refresh(self) -> None:
+        "Query the states of all the registered jobs."
+        groups: dict[tuple[typing.Any, ...], list[Job]] = {}
+        for job in self._jobs.values():
+            # the managers of older versions have no bulk query, these jobs
+            # are queried alone.
+            if job.jobid and not job._final_state and not job._old_manager():
+                # one request per manager
+                key = (
+                    id(job.protocol),
+                    job.job_params.python_exe,
+                    job.remote_manager_path,
+                    job.use_agent,
+                )
+                groups.setdefault(key, []).append(job)
+        states: dict[int, str] = {}
+        try:
+            for jobs in groups.values():
+                states.update(self._query(jobs))
+        except Exception as e:
+            raise PybatchException(
+                "Failed to get the state of the jobs."
+            ) from e
+        self._states = states
+        self._timestamp = time.monotonic()
+
+    def state(self, job: Job) -> str:
+        """State of a registered job.
+
+        The states are queried again if they are older than max_age. When the
+        state of a job cannot be resolved by the bulk query, the job is
+        queried alone.
+        """
+        if not job.jobid:
+            return "CREATED"
+        if job._final_state:
+            return job._final_state
+        if time.monotonic() - self._timestamp > self.max_age:
+            self.refresh()
+        st = self._states.get(id(job), "")
+        if not st:
+            st = job._query_state()
+        return st
+
+    def _query(self, jobs: list[Job]) -> dict[int, str]:
+        first = jobs[0]
+        if first.use_agent:
+            pairs = [
+                [int(job.jobid), job.job_params.work_directory] for job in jobs
+            ]
+            answer = first._agent().call("state-many", jobs=pairs)
+        else:
+            command = [
+                first.job_params.python_exe,
+                first.remote_manager_path,
+                "state-many",
+            ]
+            for job in jobs:
+                command += [job.jobid, job.job_params.work_directory]
+            answer = json.loads(first.protocol.run(command))
+        result: dict[int, str] = {}
+        for job in jobs:
+            job_state = answer.get(job.jobid)
+            if job_state:
+                st = job_state["state"]
+                job._keep_final_state(st, job_state["exit_code"])
+                result[id(job)] = st
+        return result
@@ -31,11 +31,16 @@ import argparse
 import subprocess
 import signal
 import functools
+import json
 import os
 from pathlib import Path
 import sys
 import logging
+import select
 import socket
+import threading
+import time
+import traceback
 
 global interrupted
 interrupted = False
@@ -44,7 +49,11 @@ try:
     import psutil
 
     def process_exists(pid):
-        return psutil.pid_exists(pid)
+        # A finished process stays a zombie until its parent reaps it.
+        try:
+            return psutil.Process(pid).status() != psutil.STATUS_ZOMBIE
+        except psutil.NoSuchProcess:
+            return False
 
     def process_kill(pid):
         parent = psutil.Process(pid)
@@ -64,6 +73,16 @@ except ModuleNotFoundError:
             os.kill(pid, 0)
         except ProcessLookupError:
             proc_exists = False
+        except PermissionError:
+            pass  # process of another user, in a shared queue
+        if proc_exists:
+            # A finished process stays a zombie until its parent reaps it.
+            try:
+                with open("/proc/{}/stat".format(pid)) as stat_file:
+                    stat = stat_file.read()
+                proc_exists = stat.rsplit(")", 1)[1].split()[0] != "Z"
+            except (OSError, IndexError):
+                pass  # no /proc
         return proc_exists
 
     def process_kill(pid):
@@ -102,55 +121,259 @@ def run_one_job(workdir, command, wall_time, log_path, stdout_log, stderr_log):
         exit_file.write(str(exit_code))
 
 
+def handler_many(running, signum, frame):
+    "Stop all the running tasks of a job array."
+    global interrupted
+    interrupted = True
+    for proc, deadline in list(running.values()):
+        try:
+            proc.terminate()
+        except OSError:
+            pass  # already finished
+
+
+# Width of a record of the file of the exit codes of the tasks of an array.
+EXIT_CODE_WIDTH = 12
+
+
+def task_log_names(idx):
+    "Names of the output, error logs of a task of an array, in logs/."
+    return "output_{}.log".format(idx), "error_{}.log".format(idx)
+
+
+def write_task_exit_code(exit_codes_file, idx, exit_code):
+    """Write the exit code of a task of an array.
+
+    The exit code of task idx is at offset idx * EXIT_CODE_WIDTH of the file,
+    which can be read without reading the codes of the other tasks. A record
+    filled with spaces means that the task is not finished.
+    """
+    record = "{:>{}}\n".format(exit_code, EXIT_CODE_WIDTH - 1)
+    exit_codes_file.seek(idx * EXIT_CODE_WIDTH)
+    exit_codes_file.write(record.encode())
+    exit_codes_file.flush()
+
+
 def run_many_jobs(
     workdir,
     command,
     wall_time,
     log_path,
-    stdout_log,
-    stderr_log,
     total_jobs,
     max_simul_jobs,
 ):
-    # TODO deal with max_simul_jobs
+    """Run the tasks of a job array, up to max_simul_jobs at the same time.
+
+    The wall time applies to every task. On SIGTERM, the running tasks are
+    terminated and no other task is launched.
+    Every task has its own output and error logs (see task_log_names) and its
+    exit code in logs/exit_codes.log (see write_task_exit_code).
+    """
+    global interrupted
+    max_simul_jobs = max(1, max_simul_jobs)
+    exit_codes_file = open(str(log_path / "exit_codes.log"), "w+b")
+    blank = b" " * (EXIT_CODE_WIDTH - 1) + b"\n"
+    exit_codes_file.write(blank * total_jobs)
+    exit_codes_file.flush()
+    # index of the task -> (process, deadline)
+    running = {}
+    signal.signal(signal.SIGTERM, functools.partial(handler_many, running))
     global_exit_code = 0
-    for idx in range(total_jobs):
-        # file descriptors are automaticaly closed by default
-        # (see close_fds argument of Popen).
-        stdout_file = open(stdout_log, "a")  # python 3.5
-        stderr_file = open(stderr_log, "a")  # python 3.5
-        current_command = command + [str(idx)]
-        message = "Launch command[{}]: {}"
-        message = message.format(idx, current_command)
-        logging.info(message)
-        proc = subprocess.Popen(
-            current_command, stdout=stdout_file, stderr=stderr_file, cwd=workdir
-        )
-        signal.signal(signal.SIGTERM, functools.partial(handler, proc))
-        try:
-            exit_code = proc.wait(wall_time)
-        except subprocess.TimeoutExpired:
-            proc.terminate()
-            message = "Timeout expired! Terminate child[{}].".format(idx)
+    next_idx = 0
+    while running or (next_idx < total_jobs and not interrupted):
+        while (
+            len(running) < max_simul_jobs
+            and next_idx < total_jobs
+            and not interrupted
+        ):
+            current_command = command + [str(next_idx)]
+            message = "Launch command[{}]: {}"
+            message = message.format(next_idx, current_command)
+            logging.info(message)
+            stdout_name, stderr_name = task_log_names(next_idx)
+            # the files are closed here once they are given to the task.
+            with open(str(log_path / stdout_name), "w") as stdout_file:
+                with open(str(log_path / stderr_name), "w") as stderr_file:
+                    proc = subprocess.Popen(
+                        current_command,
+                        stdout=stdout_file,
+                        stderr=stderr_file,
+                        cwd=workdir,
+                    )
+            deadline = None
+            if wall_time:
+                deadline = time.monotonic() + wall_time
+            running[next_idx] = (proc, deadline)
+            next_idx += 1
+        time.sleep(0.05)
+        now = time.monotonic()
+        for idx, (proc, deadline) in list(running.items()):
+            exit_code = proc.poll()
+            if exit_code is None:
+                if deadline is not None and now > deadline:
+                    proc.terminate()
+                    message = "Timeout expired! Terminate child[{}]."
+                    logging.info(message.format(idx))
+                    # terminated once
+                    running[idx] = (proc, None)
+                continue
+            del running[idx]
+            message = "End of command[{}]: {}".format(idx, exit_code)
             logging.info(message)
-            exit_code = proc.wait()
-        if exit_code != 0:
-            global_exit_code = exit_code
-        global interrupted
-        if interrupted:
-            break
+            write_task_exit_code(exit_codes_file, idx, exit_code)
+            if exit_code != 0:
+                global_exit_code = exit_code
+    exit_codes_file.close()
+    if interrupted and global_exit_code == 0:
+        # tasks were not launched
+        global_exit_code = -signal.SIGTERM
     exit_log = str(log_path / "exit_code.log")  # python 3.5
     with open(exit_log, "w") as exit_file:
         exit_file.write(str(global_exit_code))
 
 
+# File of the logs of a job, which exists while the job waits in a queue.
+QUEUED_MARKER = "queued"
+# Delay between two attempts to admit a job of a queue, in seconds.
+QUEUE_POLL = 1.0
+
+
+def queue_path(queue):
+    """Path of the database of a queue.
+
+    A name designates a queue of the user, in ~/.cache/pybatch/queues. A path
+    designates a database which may be shared by many users.
+    """
+    if os.sep in queue or (os.altsep and os.altsep in queue):
+        return Path(queue)
+    return Path.home() / ".cache" / "pybatch" / "queues" / (queue + ".sqlite")
+
+
+def host_resources():
+    "Number of cpus and memory in megabytes of the host, 0 if unknown."
+    if hasattr(os, "sched_getaffinity"):
+        cpus = len(os.sched_getaffinity(0))
+    else:
+        cpus = os.cpu_count() or 1
+    try:
+        mem = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+        mem = mem // (1024 * 1024)
+    except (AttributeError, ValueError, OSError):
+        mem = 0
+    return cpus, mem
+
+
+def queue_open(queue):
+    "Open the database of a queue."
+    # sqlite3 is only needed by the queues.
+    import sqlite3
+
+    path = queue_path(queue)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # autocommit mode, the transactions are explicit.
+    connection = sqlite3.connect(str(path), timeout=60, isolation_level=None)
+    connection.execute(
+        "CREATE TABLE IF NOT EXISTS jobs (pid INTEGER PRIMARY KEY,"
+        " cpus INTEGER, mem INTEGER, running INTEGER, submitted REAL)"
+    )
+    return connection
+
+
+def queue_admit(connection, pid, cpus, mem, host_cpus, host_mem):
+    """Try to start a job of a queue. Return True if the job is admitted.
+
+    The resources of the running jobs and of the jobs which wait since
+    before this one are not available. A job which needs more than the host
+    is admitted when it is alone. The jobs whose process is over are removed.
+    """
+    connection.execute("BEGIN IMMEDIATE")
+    try:
+        rows = connection.execute(
+            "SELECT pid, cpus, mem, running, submitted FROM jobs"
+            " ORDER BY submitted, pid"
+        ).fetchall()
+        own = [row for row in rows if row[0] == pid]
+        if not own:
+            raise RuntimeError("Job {} not found in the queue.".format(pid))
+        free_cpus = host_cpus
+        free_mem = host_mem
+        alone = True
+        for row_pid, row_cpus, row_mem, running, submitted in rows:
+            if row_pid == pid:
+                continue
+            if not process_exists(row_pid):
+                connection.execute("DELETE FROM jobs WHERE pid = ?", (row_pid,))
+                continue
+            if running or (submitted, row_pid) < (own[0][4], pid):
+                free_cpus -= row_cpus
+                free_mem -= row_mem
+                alone = False
+        fits = cpus <= free_cpus and (host_mem <= 0 or mem <= free_mem)
+        admitted = alone or fits
+        if admitted:
+            connection.execute(
+                "UPDATE jobs SET running = 1 WHERE pid = ?", (pid,)
+            )
+        connection.execute("COMMIT")
+    except BaseException:
+        connection.execute("ROLLBACK")
+        raise
+    return admitted
+
+
+def queue_wait(queue, workdir, cpus, mem):
+    """Wait until the current process is admitted by a queue.
+
+    Return the connection to the database of the queue.
+    """
+    pid = os.getpid()
+    logging.info(
+        "queue {}: job {} needs {} cpus and {} MB".format(queue, pid, cpus, mem)
+    )
+    queued_marker = Path(workdir) / "logs" / QUEUED_MARKER
+    try:
+        submitted = float(queued_marker.read_text())
+    except (OSError, ValueError):
+        submitted = time.time()
+    connection = queue_open(queue)
+    connection.execute(
+        "INSERT OR REPLACE INTO jobs VALUES (?, ?, ?, 0, ?)",
+        (pid, cpus, mem, submitted),
+    )
+    host_cpus, host_mem = host_resources()
+    while not queue_admit(connection, pid, cpus, mem, host_cpus, host_mem):
+        time.sleep(QUEUE_POLL)
+    logging.info("queue {}: job {} admitted".format(queue, pid))
+    try:
+        queued_marker.unlink()
+    except OSError:
+        pass
+    return connection
+
+
+def queue_release(connection):
+    "Free the resources of the current process in a queue."
+    connection.execute("DELETE FROM jobs WHERE pid = ?", (os.getpid(),))
+    connection.close()
+
+
 def run(
     workdir,
     wall_time,
     total_jobs,
     max_simul_jobs,
     command,
+    queue=None,
+    cpus=1,
+    mem=0,
 ):
+    # the job is logged in its work directory, even when it is submitted by
+    # a manager in serve mode.
+    log_config(job_log_file(workdir))
+    if hasattr(signal, "SIGCHLD"):
+        # SIGCHLD is ignored by the serve mode, which is inherited by the
+        # processes it starts.
+        signal.signal(signal.SIGCHLD, signal.SIG_DFL)
     log_path = Path(workdir) / "logs"
     stdout_log = str(log_path / "output.log")
     stderr_log = str(log_path / "error.log")
@@ -164,21 +387,26 @@ def run(
     os.dup2(log.fileno(), sys.stderr.fileno())
     os.dup2(os.open(os.devnull, os.O_RDWR), sys.stdin.fileno())
 
-    if total_jobs > 1:
-        run_many_jobs(
-            workdir,
-            command,
-            wall_time,
-            log_path,
-            stdout_log,
-            stderr_log,
-            total_jobs,
-            max_simul_jobs,
-        )
-    else:
-        run_one_job(
-            workdir, command, wall_time, log_path, stdout_log, stderr_log
-        )
+    connection = None
+    if queue:
+        connection = queue_wait(queue, workdir, cpus, mem)
+    try:
+        if total_jobs > 1:
+            run_many_jobs(
+                workdir,
+                command,
+                wall_time,
+                log_path,
+                total_jobs,
+                max_simul_jobs,
+            )
+        else:
+            run_one_job(
+                workdir, command, wall_time, log_path, stdout_log, stderr_log
+            )
+    finally:
+        if connection is not None:
+            queue_release(connection)
 
 
 def posix_submit(
@@ -187,27 +415,56 @@ def posix_submit(
     total_jobs,
     max_simul_jobs,
     command,
+    queue,
+    cpus,
+    mem,
 ):
     pid = os.fork()
     if pid > 0:
         # father side
         logging.info("Jobid " + str(pid))
-        print(pid)
-        return
+        return pid
     # child side
-    os.setsid()
-    signal.signal(signal.SIGHUP, signal.SIG_IGN)
-    run(workdir, wall_time, total_jobs, max_simul_jobs, command)
+    exit_code = 0
+    try:
+        os.setsid()
+        signal.signal(signal.SIGHUP, signal.SIG_IGN)
+        # SIGCHLD is ignored by the serve mode.
+        signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+        run(
+            workdir,
+            wall_time,
+            total_jobs,
+            max_simul_jobs,
+            command,
+            queue,
+            cpus,
+            mem,
+        )
+    except BaseException:
+        traceback.print_exc()
+        exit_code = 1
+    # never go back to the caller, which may be the serve loop.
+    sys.stdout.flush()
+    sys.stderr.flush()
+    os._exit(exit_code)
 
 
-def windows_submit(
+def spawn_submit(
     workdir,
     wall_time,
     total_jobs,
     max_simul_jobs,
     command,
+    queue,
+    cpus,
+    mem,
 ):
-    "Used for windows, when fork is not available."
+    """Start the job by a new process which runs this script in run mode.
+
+    Used for windows, when fork is not available, and by the serve mode,
+    whose threads make fork unsafe.
+    """
     current_script = __file__
     py_exe = sys.executable
     if wall_time is None:
@@ -221,6 +478,16 @@ def windows_submit(
         str(total_jobs),
         str(max_simul_jobs),
     ]
+    if queue:
+        run_command += [
+            "--queue",
+            queue,
+            "--cpus",
+            str(cpus),
+            "--mem",
+            str(mem),
+        ]
+    run_command.append("--")
     run_command.extend(command)
     logging.info(str(run_command))
     stdout_file = open(
@@ -229,23 +496,47 @@ def windows_submit(
     stderr_file = open(
         str(Path(workdir) / "logs" / "submit_err.log"), "w"
     )  # python 3.5
+    creationflags = 0
+    if not hasattr(os, "setsid"):
+        # Windows specific flags.
+        creationflags = (
+            subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP
+        )
     proc = subprocess.Popen(
         run_command,
         cwd=workdir,
+        stdin=subprocess.DEVNULL,
         stdout=stdout_file,
         stderr=stderr_file,
-        # Windows specific flags.
-        creationflags=subprocess.DETACHED_PROCESS
-        | subprocess.CREATE_NEW_PROCESS_GROUP,
+        start_new_session=True,  # ignored on windows
+        creationflags=creationflags,
     )
-    print(proc.pid)
+    stdout_file.close()
+    stderr_file.close()
+    logging.info("Jobid " + str(proc.pid))
+    return proc.pid
 
 
-def submit(workdir, command, wall_time, ntasks, total_jobs, max_simul_jobs):
+def submit(
+    workdir,
+    command,
+    wall_time,
+    ntasks,
+    total_jobs,
+    max_simul_jobs,
+    queue=None,
+    cpus=1,
+    mem=0,
+    use_fork=True,
+):
     """Launch a command and return immediatly.
 
     The command is launched in workdir.
-    The pid of the created process is printed on stdout.
+    When a queue is given, the command starts when the queue has cpus and mem
+    megabytes available for it.
+    The job is started by a fork of this process when use_fork is True and
+    fork is available, by a new process otherwise.
+    Return the pid of the created process.
     """
     message = (
         "submit workdir={}, command={}, walltime={}, ntasks={}, total_jobs={}"
@@ -261,6 +552,13 @@ def submit(workdir, command, wall_time, ntasks, total_jobs, max_simul_jobs):
     stdout_log.touch()
     stderr_log.touch()
     manager_log.touch()
+    # the job is QUEUED until it is admitted. The marker keeps the time of
+    # the submission, which gives the order of the jobs in the queue.
+    queued_marker = log_path / QUEUED_MARKER
+    if queue:
+        queued_marker.write_text(repr(time.time()))
+    elif queued_marker.exists():
+        queued_marker.unlink()
     # generate batch_nodefile.txt
     if ntasks > 0:
         nodelist = (socket.gethostname() + "\n") * ntasks
@@ -268,46 +566,127 @@ def submit(workdir, command, wall_time, ntasks, total_jobs, max_simul_jobs):
         nodefile.write_text(nodelist)
 
     # execute in detached mode
-    if hasattr(os, "fork"):
-        posix_submit(workdir, wall_time, total_jobs, max_simul_jobs, command)
+    if use_fork and hasattr(os, "fork"):
+        return posix_submit(
+            workdir,
+            wall_time,
+            total_jobs,
+            max_simul_jobs,
+            command,
+            queue,
+            cpus,
+            mem,
+        )
     else:
-        windows_submit(workdir, wall_time, total_jobs, max_simul_jobs, command)
+        return spawn_submit(
+            workdir,
+            wall_time,
+            total_jobs,
+            max_simul_jobs,
+            command,
+            queue,
+            cpus,
+            mem,
+        )
 
 
-def wait(proc_id):
-    "Wait for the process to finish."
-    logging.info("Wait jobid " + str(proc_id))
-    import time
+def wait_pidfd(proc_id, timeout):
+    """Wait for the end of a process with a pidfd, without polling.
+
+    Return True if the process is finished, False at the end of the timeout,
+    None if pidfd is not supported (python < 3.9 or linux < 5.3).
+    """
+    if not hasattr(os, "pidfd_open"):
+        return None
+    try:
+        fd = os.pidfd_open(proc_id)
+    except ProcessLookupError:
+        return True
+    except OSError:
+        return None
+    try:
+        readable, _, _ = select.select([fd], [], [], timeout)
+    finally:
+        os.close(fd)
+    return bool(readable)
+
+
+def wait(proc_id, timeout=None):
+    """Wait for the process to finish.
 
-    while process_exists(proc_id):
-        time.sleep(0.1)
-    logging.info("Wait finished.")
+    Return False if the process is still running at the end of the timeout
+    in seconds, True otherwise.
+    """
+    logging.info("Wait jobid " + str(proc_id))
+    finished = wait_pidfd(proc_id, timeout)
+    if finished is None:
+        deadline = None
+        if timeout is not None:
+            deadline = time.monotonic() + timeout
+        finished = True
+        while process_exists(proc_id):
+            if deadline is not None and time.monotonic() >= deadline:
+                finished = False
+                break
+            time.sleep(0.1)
+    logging.info("Wait finished: " + str(finished))
+    return finished
+
+
+def job_state(proc_id, workdir):
+    """Return the state and the exit code of a job.
+
+    The exit code is None while the job is running or if it is unknown.
+    """
+    if process_exists(proc_id):
+        if (Path(workdir) / "logs" / QUEUED_MARKER).exists():
+            return "QUEUED", None
+        return "RUNNING", None
+    result = "FAILED"
+    exit_code = None
+    exit_log = Path(workdir) / "logs" / "exit_code.log"
+    try:
+        exit_code = int(exit_log.read_text().strip())
+    except (OSError, ValueError):
+        pass
+    if exit_code == 0:
+        result = "FINISHED"
+    return result, exit_code
 
 
 def state(proc_id, workdir):
-    """Print the state of the process.
+    "Return the state of the process."
+    logging.info("state jobid " + str(proc_id))
+    result, _ = job_state(proc_id, workdir)
+    logging.info("state " + result)
+    return result
+
+
+def state_many(jobs):
+    """Return the states and the exit codes of many jobs.
 
-    The work directory of the job is supposed to be the same as the directory
-    of this script.
+    :param jobs: list of (process id, work directory) pairs.
+    :return: {"<process id>": {"state": <state>, "exit_code": <exit code>}}
     """
-    logging.info("state jobid " + str(proc_id))
-    proc_exists = process_exists(proc_id)
-    if proc_exists:
-        logging.info("state RUNNING")
-        print("RUNNING")
-    else:
-        exit_log = Path(workdir) / "logs" / "exit_code.log"
-        if exit_log.is_file():
-            exit_value = exit_log.read_text().strip()
-            if exit_value == "0":
-                logging.info("state FINISHED")
-                print("FINISHED")
-            else:
-                logging.info("state FAILED")
-                print("FAILED")
-        else:
-            logging.info("state FAILED")
-            print("FAILED")
+    logging.info("state of {} jobs".format(len(jobs)))
+    result = {}
+    for proc_id, workdir in jobs:
+        st, exit_code = job_state(int(proc_id), workdir)
+        result[str(proc_id)] = {"state": st, "exit_code": exit_code}
+    return result
+
+
+def read_job_pairs(lines):
+    """Read (process id, work directory) pairs, one per line.
+
+    The work directory is the rest of the line after the process id.
+    """
+    jobs = []
+    for line in lines:
+        fields = line.strip().split(None, 1)
+        if len(fields) == 2:
+            jobs.append((int(fields[0]), fields[1]))
+    return jobs
 
 
 def cancel(proc_id):
@@ -320,8 +699,111 @@ def cancel(proc_id):
         logging.info("cancel kill failed!")
 
 
+def call(method, params):
+    "Call a function of this manager with the parameters of a request."
+    if method == "submit":
+        return submit(
+            params["work_dir"],
+            params["command"],
+            params.get("wall_time"),
+            params.get("ntasks", 0),
+            params.get("total_jobs", 1),
+            params.get("max_simul_jobs", 1),
+            params.get("queue"),
+            params.get("cpus", 1),
+            params.get("mem", 0),
+            # the threads of the serve mode make fork unsafe.
+            use_fork=False,
+        )
+    if method == "wait":
+        return wait(params["proc"], params.get("timeout"))
+    if method == "state":
+        return state(params["proc"], params["work_dir"])
+    if method == "state-many":
+        return state_many(params["jobs"])
+    if method == "cancel":
+        cancel(params["proc"])
+        return None
+    raise ValueError("Unknown method " + str(method))
+
+
+def serve():
+    """Answer the requests read on stdin until it is closed.
+
+    Every request is a json object on a single line:
+    {"id": <id>, "method": <name>, "params": {<name>: <value>}}.
+    Every answer is a json line {"id": <id>, "result": <value>} or
+    {"id": <id>, "error": <message>}. The wait requests are answered by
+    threads, which does not delay the other requests.
+    """
+    logging.info("serve")
+    if hasattr(signal, "SIGCHLD"):
+        # The jobs are reaped as soon as they end. Otherwise, they would stay
+        # zombies and they would be seen as running.
+        signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+    lock = threading.Lock()
+
+    def answer(request):
+        response = {"id": request.get("id")}
+        try:
+            response["result"] = call(
+                request.get("method"), request.get("params", {})
+            )
+        except Exception as e:
+            logging.exception("request failed")
+            response["error"] = "{}: {}".format(type(e).__name__, e)
+        with lock:
+            sys.stdout.write(json.dumps(response) + "\n")
+            sys.stdout.flush()
+
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        try:
+            request = json.loads(line)
+        except ValueError as e:
+            request = {"method": "", "params": {}}
+            logging.info("invalid request: " + str(e))
+        if request.get("method") == "wait":
+            thread = threading.Thread(target=answer, args=(request,))
+            thread.daemon = True
+            thread.start()
+        else:
+            answer(request)
+    logging.info("serve finished")
+
+
+def add_queue_arguments(parser):
+    "Options of the admission of a job by a queue."
+    parser.add_argument(
+        "--queue",
+        default=None,
+        help="Name or path of the queue which admits the job according to"
+        " the cpus and the memory of the host. No queue by default.",
+    )
+    parser.add_argument(
+        "--cpus",
+        type=int,
+        default=1,
+        help="Number of cpus used by the job in the queue, 1 by default.",
+    )
+    parser.add_argument(
+        "--mem",
+        type=int,
+        default=0,
+        help="Memory in megabytes used by the job in the queue, 0 by default.",
+    )
+
+
 def main(args_list=None):
     parser = argparse.ArgumentParser(description="Job manager for pybatch.")
+    parser.add_argument(
+        "--log",
+        default=None,
+        help="Log file of the details of the request, usually pybatch.log in"
+        " the work directory of the job. Only the warnings are printed on"
+        " stderr by default.",
+    )
     subparsers = parser.add_subparsers(
         dest="mode",  # required=True,#python>=3.7
         help="Use mode.",
@@ -354,8 +836,9 @@ def main(args_list=None):
         "--max_simul_jobs",
         type=int,
         default=1,
-        help="For future use. Parameter ignored.",
+        help="Maximum number of tasks running at the same time, 1 by default.",
     )
+    add_queue_arguments(parser_submit)
     parser_submit.add_argument("command", nargs="+", help="Command to submit.")
 
     # RUN
@@ -374,8 +857,9 @@ def main(args_list=None):
     parser_run.add_argument(
         "max_simul_jobs",
         type=int,
-        help="For future use. Parameter ignored.",
+        help="Maximum number of tasks running at the same time.",
     )
+    add_queue_arguments(parser_run)
     parser_run.add_argument("command", nargs="+", help="Command to submit.")
 
     # WAIT
@@ -383,6 +867,13 @@ def main(args_list=None):
         "wait", help="Wait for the end of a job."
     )
     parser_wait.add_argument("proc", type=int, help="Process id.")
+    parser_wait.add_argument(
+        "--timeout",
+        type=float,
+        default=None,
+        help="Maximum waiting time in seconds. TIMEOUT is printed if the job"
+        " is not finished at the end of this time.",
+    )
 
     # STATE
     parser_state = subparsers.add_parser(
@@ -391,24 +882,59 @@ def main(args_list=None):
     parser_state.add_argument("proc", type=int, help="Process id.")
     parser_state.add_argument("work_dir", help="Work directory.")
 
+    # STATE-MANY
+    parser_state_many = subparsers.add_parser(
+        "state-many",
+        help="Print the states and the exit codes of many jobs as json.",
+    )
+    parser_state_many.add_argument(
+        "jobs",
+        nargs="*",
+        help="Process id and work directory of every job. When no job is"
+        " given, the pairs are read on stdin, one per line.",
+    )
+
     # CANCEL
     parser_cancel = subparsers.add_parser("cancel", help="Cancel a job.")
     parser_cancel.add_argument("proc", type=int, help="Process id.")
 
+    # SERVE
+    subparsers.add_parser(
+        "serve", help="Answer json requests read on stdin, one per line."
+    )
+
     args = parser.parse_args(args_list)
+    log_config(args.log)
     if args.mode == "submit":
-        submit(
+        pid = submit(
             args.work_dir,
             args.command,
             args.wall_time,
             args.ntasks,
             args.total_jobs,
             args.max_simul_jobs,
+            args.queue,
+            args.cpus,
+            args.mem,
         )
+        print(pid)
     elif args.mode == "wait":
-        wait(args.proc)
+        if not wait(args.proc, args.timeout):
+            print("TIMEOUT")
     elif args.mode == "state":
-        state(args.proc, args.work_dir)
+        print(state(args.proc, args.work_dir))
+    elif args.mode == "state-many":
+        if args.jobs:
+            if len(args.jobs) % 2:
+                parser.error(
+                    "state-many needs pairs of process id and work directory."
+                )
+            jobs = list(zip(args.jobs[::2], args.jobs[1::2]))
+        else:
+            jobs = read_job_pairs(sys.stdin)
+        print(json.dumps(state_many(jobs)))
+    elif args.mode == "serve":
+        serve()
     elif args.mode == "cancel":
         cancel(args.proc)
     elif args.mode == "run":
@@ -418,21 +944,39 @@ def main(args_list=None):
             args.total_jobs,
             args.max_simul_jobs,
             args.command,
+            args.queue,
+            args.cpus,
+            args.mem,
         )
     else:
         print("No command defined!")
 
 
-def log_config():
-    workdir = os.path.dirname(sys.argv[0])
-    log_file = os.path.join(workdir, "pybatch.log")
-    logging.basicConfig(
-        filename=log_file,
-        level=logging.DEBUG,
-        format="%(asctime)s - %(message)s",
-    )
+def log_config(log_file=None):
+    """Log the details of the requests in log_file.
+
+    Without log file, only the warnings and the errors are printed on stderr.
+    The manager is shared by the jobs of the user: the details are only kept
+    in the work directories of the jobs.
+    """
+    root = logging.getLogger()
+    for old_handler in list(root.handlers):
+        root.removeHandler(old_handler)
+        old_handler.close()
+    if log_file:
+        handler = logging.FileHandler(log_file)
+        root.setLevel(logging.DEBUG)
+    else:
+        handler = logging.StreamHandler()
+        root.setLevel(logging.WARNING)
+    handler.setFormatter(logging.Formatter("%(asctime)s - %(message)s"))
+    root.addHandler(handler)
+
+
+def job_log_file(workdir):
+    "Log file of the manager in the work directory of a job."
+    return str(Path(workdir) / "pybatch.log")
 
 
 if __name__ == "__main__":
-    log_config()
     main()
@@ -0,0 +1,195 @@
+# Copyright (C) 2025-2026  CEA, EDF
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307 USA
+#
+# See http://www.salome-platform.org/ or email : webmaster.salome@opencascade.com
+#
+"""Slurm job for asyncio applications."""
+
+from __future__ import annotations
+import asyncio
+import time
+
+from pybatch import AsyncJob, AsyncGenericProtocol, LaunchParameters
+from pybatch import PybatchException
+from pybatch.protocols.async_local import AsyncLocalProtocol
+from pybatch.tools import shell_command, embedded_archive, script_command
+from . import job
+from .job import JobState, sacct_command, init_script, sbatch_command
+
+
+class Job(JobState, AsyncJob):
+    """Slurm job whose remote operations are coroutines.
+
+    The commands and the interpretation of their results are those of
+    pybatch.plugins.slurm.job.Job.
+    """
+
+    def __init__(
+        self, param: LaunchParameters, protocol: AsyncGenericProtocol | None
+    ):
+        self.job_params = param
+        self.protocol: AsyncGenericProtocol
+        if protocol is None:
+            self.protocol = AsyncLocalProtocol()
+        else:
+            self.protocol = protocol
+        self.jobid = ""
+        self.number_of_jobs = self.job_params.total_jobs
+
+    async def submit(self) -> None:
+        """Submit the job to the batch manager and return.
+
+        The work directory, the batch file and the input files are created and
+        the job is submitted by a single remote command. The input files which
+        are too big to be embedded in this command are uploaded separately.
+        If the submission fails, raise an exception.
+        """
+        try:
+            if self.job_params.input_cache:
+                raise PybatchException(
+                    "input_cache is not supported by asynchronous jobs."
+                )
+            if self.job_params.archive_transfer:
+                raise PybatchException(
+                    "archive_transfer is not supported by asynchronous jobs."
+                )
+            work_dir = self.job_params.work_directory
+            script = init_script(self.job_params)
+            input_files = self.job_params.input_files
+            if input_files:
+                # the compression of the files would block the event loop.
+                extract = await asyncio.to_thread(
+                    embedded_archive,
+                    input_files,
+                    work_dir,
+                    job.MAX_EMBEDDED_SIZE,
+                )
+                if extract is None:
+                    await self.protocol.run(script_command(script))
+                    await self.protocol.upload(input_files, work_dir)
+                    script = "set -e\n"
+                else:
+                    script += extract
+            script += shell_command(sbatch_command(self.job_params)) + "\n"
+            output = await self.protocol.run(script_command(script))
+            self.jobid = output.split(";")[0].strip()
+            int(self.jobid)  # check
+            self._final_state = ""
+            self._final_exit_code = None
+            self.number_of_jobs = self.job_params.total_jobs
+        except Exception as e:
+            message = "Failed to submit job."
+            raise PybatchException(message) from e
+
+    async def wait(
+        self,
+        timeout: float | None = None,
+        interval: float = 1.0,
+        max_interval: float = 60.0,
+    ) -> None:
+        """Wait until the end of the job.
+
+        The delay between two queries of the state grows while the state does
+        not change.
+        :param timeout: maximum waiting time in seconds. PybatchException is
+         raised if the job is not finished at the end of this time.
+        :param interval: delay after the first query, in seconds.
+        :param max_interval: maximum delay, in seconds.
+        """
+        if not self.jobid:
+            return
+        deadline = None
+        if timeout is not None:
+            deadline = time.monotonic() + timeout
+        state = await self.state()
+        delay = interval
+        while state != "FINISHED" and state != "FAILED":
+            sleep = delay
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PybatchException(
+                        f"Timeout while waiting for job {self.jobid}."
+                    )
+                sleep = min(sleep, remaining)
+            await asyncio.sleep(sleep)
+            new_state = await self.state()
+            if new_state == state:
+                delay = min(delay * 1.5, max_interval)
+            else:
+                delay = interval
+            state = new_state
+
+    async def state(self) -> str:
+        """Possible states : 'CREATED', 'QUEUED', 'RUNNING',
+        'PAUSED', 'FINISHED', 'FAILED'
+
+        Once the job is FINISHED or FAILED, the state is kept and it is
+        returned without any remote call.
+        """
+        if not self.jobid:
+            return "CREATED"
+        if self._final_state:
+            return self._final_state
+        resolution = self._state_resolution()
+        try:
+            request = next(resolution)
+            while True:
+                if isinstance(request, float):
+                    await asyncio.sleep(request)
+                    request = resolution.send("")
+                    continue
+                try:
+                    output = await self.protocol.run(request)
+                except PybatchException as e:
+                    request = resolution.throw(e)
+                else:
+                    request = resolution.send(output)
+        except StopIteration as stop:
+            return str(stop.value)
+        except Exception as e:
+            raise PybatchException("Failed to get the state of the job.") from e
+
+    async def exit_code(self) -> int | None:
+        if not self.jobid:
+            return None
+        state = await self.state()
+        if state == "FINISHED":
+            return 0
+        if state != "FAILED":
+            return None
+        if self._final_exit_code is None:
+            try:
+                self._keep_exit_code(
+                    await self.protocol.run(sacct_command([self.jobid]))
+                )
+            except Exception:
+                return None
+        return self._final_exit_code
+
+    async def cancel(self) -> None:
+        "Stop the job."
+        if not self.jobid:
+            return
+        command = ["scancel", self.jobid]
+        try:
+            await self.protocol.run(command)
+        except Exception as e:
+            raise PybatchException("Failed to cancel the job.") from e
+
+    def batch_file(self) -> str:
+        "Get the content of the batch file submited to the batch manager."
+        return job.batch_file(self.job_params)
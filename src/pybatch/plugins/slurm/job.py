@@ -17,14 +17,29 @@
 # See http://www.salome-platform.org/ or email : webmaster.salome@opencascade.com
 #
 from __future__ import annotations
+from collections.abc import Generator, Iterator
 from pathlib import Path
 import time
+import typing
 
 from pybatch import GenericJob, GenericProtocol, LaunchParameters
 from pybatch import PybatchException
 from pybatch.protocols.local import LocalProtocol
 
 from pybatch.tools import path_join, is_absolute, escape_str
+from pybatch.tools import shell_command, heredoc, embedded_archive, run_script
+from pybatch.tools import follow_job_log
+from pybatch.input_cache import upload_cached
+from pybatch.sync import download_incremental
+from .wait import WaitStrategy, ExponentialBackoff
+
+if typing.TYPE_CHECKING:
+    from .monitor import JobMonitor
+
+
+# Maximum size of the input files embedded in the submission command, once
+# compressed and encoded. The command has to fit in one argument on the server.
+MAX_EMBEDDED_SIZE = 48 * 1024
 
 
 def simplified_state(name: str) -> str:
@@ -82,7 +97,317 @@ def reduce_states(states_list: list[str], max_number_of_states: int) -> str:
     return ""
 
 
-class Job(GenericJob):
+def squeue_state(squeue_output: str, number_of_jobs: int) -> str:
+    """State of a job from the states listed by squeue.
+
+    Return an empty string if the state cannot be deduced from squeue.
+    :param squeue_output: states of the job, one per line.
+    :param number_of_jobs: number of jobs in the job array, 1 if not an array.
+    """
+    if not squeue_output:
+        return ""
+    if number_of_jobs > 1:
+        return reduce_states(squeue_output.splitlines(), number_of_jobs)
+    return simplified_state(squeue_output)
+
+
+def sacct_state(sacct_output: str, number_of_jobs: int) -> str:
+    """State of a job from the states listed by sacct.
+
+    Return an empty string if the state cannot be deduced from sacct.
+    :param sacct_output: states of the job, one per line, steps excluded.
+    :param number_of_jobs: number of jobs in the job array, 1 if not an array.
+    """
+    if number_of_jobs <= 1:
+        return simplified_state(sacct_output)
+    list_states = sacct_output.splitlines()
+    st = reduce_states(list_states, number_of_jobs)
+    if not st:
+        # No RUNNING, no PENDING and
+        # len(list_states) < number_of_jobs
+        # The main job in the array is the job which is launched the
+        # last but its state is PENDING from the start of the array
+        # until the job is actually launched. The other jobs are not
+        # listed from the start. They are listed only when they can
+        # be launched, when the jobs that are before in the array
+        # are finished.
+        # When a job is scheduled to be launched, it takes a little
+        # while before seeing it with the acct command. This is why
+        # it is possible to have all listed jobs FINISHED or FAILED,
+        # but some jobs of the array not listed yet.
+        if "CANCELLED" in sacct_output:
+            # The main job is not "PENDING" and there are less
+            # states listed than the total number of jobs in the
+            # array. At least one job has cancelled state.
+            # This happens when the job array is cancelled, but also
+            # when a particular job in the array is cancelled after
+            # the end of the main job, if the main job is shorter
+            # than other jobs.
+            # WARNING If the main job has started and an individual
+            # job in the array was cancelled, the arrays is set as
+            # FAILED despite some jobs may be still running but not
+            # yet scheduled. To be investigated.
+            st = "FAILED"
+        else:
+            # The main job finished very fast and the scheduler have
+            # not added to queue all the jobs of the last slice in
+            # the array yet.
+            st = "RUNNING"
+    return st
+
+
+def sacct_command(jobids: list[str]) -> list[str]:
+    "sacct command which lists the states and the exit codes of jobs."
+    return [
+        "sacct",
+        "-P",  # "|" separator, no truncation
+        "-n",  # no header
+        "-o",  # output fields
+        "JobID,State,ExitCode",
+        "-j",  # jobids
+        ",".join(jobids),
+    ]
+
+
+def parse_sacct(output: str) -> dict[str, tuple[list[str], list[str]]]:
+    """Parse the output of sacct_command.
+
+    Return a dictionary {jobid: (states, exit_codes)}. The states are those of
+    the job or of the tasks of a job array, job steps excluded. The exit codes
+    include the job steps.
+    """
+    result: dict[str, tuple[list[str], list[str]]] = {}
+    for line in output.splitlines():
+        fields = line.strip().split("|")
+        if len(fields) < 3:
+            continue
+        states, exit_codes = result.setdefault(base_jobid(fields[0]), ([], []))
+        if "." not in fields[0]:
+            states.append(fields[1])
+        exit_codes.append(fields[2])
+    return result
+
+
+def sacct_exit_code(exit_codes: list[str]) -> int | None:
+    """Exit code of a job from the ExitCode fields listed by sacct.
+
+    The format of a field is <exit_code>:<signal_received>.
+    If ok, the field is "0:0".
+    If cancel, the field is "0:15".
+    If exit 1, the field is "1:0".
+    The result is the first non 0 value found, job steps included.
+    """
+    if not exit_codes:
+        return None
+    result = 0
+    for val in exit_codes:
+        signal_received = int(val.split(":")[1])
+        if signal_received != 0:
+            cur_val = signal_received
+        else:
+            cur_val = int(val.split(":")[0])
+        if cur_val != 0:
+            result = cur_val
+            break
+    return result
+
+
+def final_exit_code(state: str, exit_codes: list[str] | None) -> int | None:
+    """Exit code of a job which is over.
+
+    :param state: simplified state of the job, FINISHED or FAILED.
+    :param exit_codes: ExitCode fields listed by sacct for the job.
+    """
+    if state == "FINISHED":
+        return 0
+    if exit_codes:
+        try:
+            return sacct_exit_code(exit_codes)
+        except ValueError:
+            pass
+    return None
+
+
+def base_jobid(slurm_jobid: str) -> str:
+    """Id of the job without array index or step suffix.
+
+    1234 -> 1234, 1234_5 -> 1234, 1234_[6-9%2] -> 1234, 1234.batch -> 1234
+    """
+    return slurm_jobid.split("_")[0].split(".")[0].strip()
+
+
+def batch_file(params: LaunchParameters) -> str:
+    "Content of the batch file submitted to slurm."
+    batch = """#!/bin/bash -l
+#SBATCH --output=logs/output.log
+#SBATCH --error=logs/error.log
+"""
+    if params.name:
+        batch += f"#SBATCH --job-name={params.name}\n"
+    if params.total_jobs > 1:
+        simul = ""
+        if params.max_simul_jobs > 1:
+            simul = f"%{params.max_simul_jobs}"
+        array = f"0-{params.total_jobs - 1}{simul}"
+        batch += f"#SBATCH --array={array}\n"
+    if params.ntasks > 0:
+        batch += f"#SBATCH --ntasks={params.ntasks}\n"
+    if params.nodes > 0:
+        batch += f"#SBATCH --nodes={params.nodes}\n"
+    if params.exclusive:
+        batch += "#SBATCH --exclusive\n"
+    if params.wall_time:
+        batch += f"#SBATCH --time={params.wall_time}\n"
+    if params.mem_per_node:
+        batch += f"#SBATCH --mem={params.mem_per_node}\n"
+    if params.mem_per_cpu:
+        batch += f"#SBATCH --mem-per-cpu={params.mem_per_cpu}\n"
+    if params.queue:
+        batch += f"#SBATCH --qos={params.queue}\n"
+    if params.partition:
+        batch += f"#SBATCH --partition={params.partition}\n"
+    if params.wckey:
+        batch += f"#SBATCH --wckey={params.wckey}\n"
+    for extra in params.extra_as_list:
+        batch += f"#SBATCH {extra}\n"
+    if params.extra_as_string:
+        batch += params.extra_as_string
+    if params.create_nodefile:
+        batch += """
+LIBBATCH_NODEFILE=`pwd`/batch_nodefile.txt
+srun hostname > $LIBBATCH_NODEFILE
+export LIBBATCH_NODEFILE
+"""
+    # batch += "echo Jobid: $SLURM_JOB_ID\n"
+    # if params.total_jobs > 1:
+    #     batch += "echo master Jobid: $SLURM_ARRAY_JOB_ID\n"
+    str_command = shell_command(params.command)
+    if params.total_jobs > 1:
+        str_command += " $SLURM_ARRAY_TASK_ID"
+    batch += "\n"
+    batch += str_command
+    return batch
+
+
+def init_script(params: LaunchParameters) -> str:
+    """Beginning of the submission script, which creates the work directory,
+    the log directory and the batch file.
+    """
+    # workdir is always a linux path
+    logdir = path_join(params.work_directory, "logs", is_posix=True)
+    batch_path = path_join(params.work_directory, "batch.cmd", is_posix=True)
+    script = "set -e\n"
+    script += shell_command(["mkdir", "-p", logdir]) + "\n"
+    script += heredoc("cat > " + escape_str(batch_path), batch_file(params))
+    return script
+
+
+def sbatch_command(params: LaunchParameters) -> list[str]:
+    "Command which submits the batch file of the job."
+    batch_path = path_join(params.work_directory, "batch.cmd", is_posix=True)
+    return [
+        "sbatch",
+        "--parsable",
+        "--chdir",
+        params.work_directory,
+        batch_path,
+    ]
+
+
+# Remote operations of the resolution of a state: a command to run or a delay
+# to wait in seconds.
+StateRequest = typing.Union[list[str], float]
+
+
+class JobState:
+    """Resolution of the state of a slurm job, without the remote calls.
+
+    It is shared by the blocking job and by the asynchronous job, which run
+    the commands requested by _state_resolution.
+    """
+
+    jobid: str
+    number_of_jobs: int
+    # State and exit code kept when the job is over.
+    _final_state: str = ""
+    _final_exit_code: int | None = None
+
+    def _state_resolution(self) -> Generator[StateRequest, str, str]:
+        """Resolve the state of the job by squeue and, when needed, by sacct.
+
+        The generator yields the commands to run and the delays to wait. It
+        receives the output of every command, and the exception raised by a
+        failed command. The final state is kept and the state is returned.
+        """
+        squeue_output = ""
+        sacct_output = ""
+        # squeue fails when the job was finished a long time ago and it is
+        # no longer available.
+        try:
+            squeue_output = yield ["squeue", "-h", "-o", "%T", "-j", self.jobid]
+        except PybatchException:
+            squeue_output = ""
+        st = squeue_state(squeue_output, self.number_of_jobs)
+        # sacct is queried only for the jobs which are over, in order to get
+        # their exit code, or which are unknown to squeue.
+        if st and st not in ("FINISHED", "FAILED"):
+            return st
+        command = sacct_command([self.jobid])
+        if st:
+            exit_codes = None
+            try:
+                sacct_output = yield command
+                exit_codes = parse_sacct(sacct_output).get(
+                    self.jobid, ([], [])
+                )[1]
+            except PybatchException:
+                pass  # the exit code is read later
+            self._keep_final_state(st, exit_codes)
+            return st
+
+        # If "squeue" failed, the job may be finished.
+        sacct_output = yield command
+        max_tries = 5
+        while not sacct_output and max_tries:
+            # Give some time to slurm scheduler to update
+            max_tries -= 1
+            yield 1.0
+            sacct_output = yield command
+        states, exit_codes = parse_sacct(sacct_output).get(self.jobid, ([], []))
+        st = sacct_state("\n".join(states), self.number_of_jobs)
+        if not st:
+            raise PybatchException(
+                f"Unknown state. squeue_state: {squeue_output}, sacct_state:{sacct_output}"
+            )
+        self._keep_final_state(st, exit_codes)
+        return st
+
+    def _keep_final_state(
+        self, state: str, exit_codes: list[str] | None = None
+    ) -> None:
+        """Keep the state and the exit code of a job which is over.
+
+        They are returned by state() and exit_code() without any remote call.
+        :param state: simplified state of the job.
+        :param exit_codes: ExitCode fields listed by sacct for the job.
+        """
+        if state == "FINISHED" or state == "FAILED":
+            self._final_state = state
+            self._final_exit_code = final_exit_code(state, exit_codes)
+
+    def _keep_exit_code(self, sacct_output: str) -> None:
+        "Keep the exit code of a failed job from the output of sacct_command."
+        _, exit_codes = parse_sacct(sacct_output).get(self.jobid, ([], []))
+        self._final_exit_code = sacct_exit_code(exit_codes)
+
+
+class Job(JobState, GenericJob):
+    # Optional JobMonitor used to share squeue & sacct calls with other jobs.
+    # Defined at class level for jobs pickled by older versions.
+    monitor: JobMonitor | None = None
+    # Delays between the queries of the state in wait().
+    wait_strategy: WaitStrategy = ExponentialBackoff()
+
     def __init__(
         self, param: LaunchParameters, protocol: GenericProtocol | None
     ):
@@ -98,140 +423,127 @@ class Job(GenericJob):
     def submit(self) -> None:
         """Submit the job to the batch manager and return.
 
+        The work directory, the batch file and the input files are created and
+        the job is submitted by a single remote command. The input files which
+        are too big to be embedded in this command are uploaded separately.
         If the submission fails, raise an exception.
         """
-        # with self.protocol as protocol:
         try:
-            # create remote workdir
-            # workdir is always a linux path
-            logdir = path_join(
-                self.job_params.work_directory, "logs", is_posix=True
-            )
-            command = ["mkdir", "-p", logdir]
-            self.protocol.run(command)
-
-            batch_path = path_join(
-                self.job_params.work_directory, "batch.cmd", is_posix=True
-            )
-            self.protocol.create(batch_path, self.batch_file())
-            self.protocol.upload(
-                self.job_params.input_files, self.job_params.work_directory
-            )
-            output = self.protocol.run(
-                [
-                    "sbatch",
-                    "--parsable",
-                    "--chdir",
-                    self.job_params.work_directory,
-                    batch_path,
-                ]
-            )
+            work_dir = self.job_params.work_directory
+            script = init_script(self.job_params)
+            input_files = self.job_params.input_files
+            if input_files and self.job_params.input_cache:
+                command = upload_cached(
+                    self.protocol,
+                    input_files,
+                    self.job_params.input_cache,
+                    self.job_params.python_exe,
+                )
+                script += shell_command(command + [work_dir]) + "\n"
+            elif input_files:
+                extract = embedded_archive(
+                    input_files, work_dir, MAX_EMBEDDED_SIZE
+                )
+                if extract is None:
+                    run_script(self.protocol, script)
+                    self._upload(input_files, work_dir)
+                    script = "set -e\n"
+                else:
+                    script += extract
+            script += shell_command(sbatch_command(self.job_params)) + "\n"
+            output = run_script(self.protocol, script)
             self.jobid = output.split(";")[0].strip()
             int(self.jobid)  # check
+            self._final_state = ""
+            self._final_exit_code = None
             self.number_of_jobs = self.job_params.total_jobs
         except Exception as e:
             message = "Failed to submit job."
             raise PybatchException(message) from e
 
-    def wait(self) -> None:
-        "Wait until the end of the job."
+    def _upload(self, input_files: list[str | Path], remote_path: str) -> None:
+        if self.job_params.archive_transfer:
+            self.protocol.upload_archive(
+                input_files, remote_path, self.job_params.archive_compression
+            )
+        else:
+            self.protocol.upload(input_files, remote_path)
+
+    def wait(
+        self,
+        timeout: float | None = None,
+        strategy: WaitStrategy | None = None,
+    ) -> None:
+        """Wait until the end of the job.
+
+        :param timeout: maximum waiting time in seconds. PybatchException is
+         raised if the job is not finished at the end of this time.
+        :param strategy: delays between the queries of the state. The default
+         is the attribute wait_strategy of the job.
+        """
         if not self.jobid:
             return
+        if strategy is None:
+            strategy = self.wait_strategy
+        deadline = None
+        if timeout is not None:
+            deadline = time.monotonic() + timeout
         state = self.state()
+        attempt = 1
         while state != "FINISHED" and state != "FAILED":
-            time.sleep(1)
-            state = self.state()
+            delay = strategy.delay(self, state, attempt)
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PybatchException(
+                        f"Timeout while waiting for job {self.jobid}."
+                    )
+                delay = min(delay, remaining)
+            time.sleep(delay)
+            new_state = self.state()
+            if new_state == state:
+                attempt += 1
+            else:
+                attempt = 1
+            state = new_state
 
     def state(self) -> str:
         """Possible states : 'CREATED', 'QUEUED', 'RUNNING',
         'PAUSED', 'FINISHED', 'FAILED'
+
+        When the job is registered in a JobMonitor, the state is resolved by
+        the monitor, together with the states of the other registered jobs.
+        Once the job is FINISHED or FAILED, the state is kept and it is
+        returned without any remote call.
         """
         if not self.jobid:
             return "CREATED"
+        if self._final_state:
+            return self._final_state
+        if self.monitor is not None:
+            return self.monitor.state(self)
+        return self._query_state()
+
+    def _query_state(self) -> str:
+        "Query the state of this job alone."
+        resolution = self._state_resolution()
         try:
-            # with self.protocol as protocol:
-            # First try to query the job with "squeue" command
-            try:
-                command = ["squeue", "-h", "-o", "%T", "-j", self.jobid]
-                squeue_state = self.protocol.run(command)
-                if squeue_state:
-                    st = ""
-                    if self.number_of_jobs > 1:
-                        list_states = squeue_state.splitlines()
-                        st = reduce_states(list_states, self.number_of_jobs)
-                    else:
-                        st = simplified_state(squeue_state)
-                    if st:
-                        return st
-            except PybatchException:
-                # job was finished a long time ago and it is no longer
-                # available for squeue
-                pass
-
-            # If "squeue" failed, the job may be finished.
-            # In this case, try to query the job with "sacct".
-            command = [
-                "sacct",
-                "-X",  # ignore steps
-                "-o",  # output fields
-                "State%-10",  # state field on less than 10 chars
-                "-n",  # no header
-                "-j",  # jobid
-                self.jobid,
-            ]
-            sacct_state = self.protocol.run(command)
-            max_tries = 5
-            while not sacct_state and max_tries:
-                # if not sacct_state:
-                # Give some time to slurm scheduler to update
-                max_tries -= 1
-                time.sleep(1)
-                sacct_state = self.protocol.run(command)
-            st = ""
-            if self.number_of_jobs > 1:
-                list_states = sacct_state.splitlines()
-                st = reduce_states(list_states, self.number_of_jobs)
-                if not st:
-                    # No RUNNING, no PENDING and
-                    # len(list_states) < number_of_jobs
-                    # The main job in the array is the job which is launched the
-                    # last but its state is PENDING from the start of the array
-                    # until the job is actually launched. The other jobs are not
-                    # listed from the start. They are listed only when they can
-                    # be launched, when the jobs that are before in the array
-                    # are finished.
-                    # When a job is scheduled to be launched, it takes a little
-                    # while before seeing it with the acct command. This is why
-                    # it is possible to have all listed jobs FINISHED or FAILED,
-                    # but some jobs of the array not listed yet.
-                    if "CANCELLED" in sacct_state:
-                        # The main job is not "PENDING" and there are less
-                        # states listed than the total number of jobs in the
-                        # array. At least one job has cancelled state.
-                        # This happens when the job array is cancelled, but also
-                        # when a particular job in the array is cancelled after
-                        # the end of the main job, if the main job is shorter
-                        # than other jobs.
-                        # WARNING If the main job has started and an individual
-                        # job in the array was cancelled, the arrays is set as
-                        # FAILED despite some jobs may be still running but not
-                        # yet scheduled. To be investigated.
-                        st = "FAILED"
-                    else:
-                        # The main job finished very fast and the scheduler have
-                        # not added to queue all the jobs of the last slice in
-                        # the array yet.
-                        st = "RUNNING"
-            else:
-                st = simplified_state(sacct_state)
+            request = next(resolution)
+            while True:
+                if isinstance(request, float):
+                    time.sleep(request)
+                    request = resolution.send("")
+                    continue
+                try:
+                    output = self.protocol.run(request)
+                except PybatchException as e:
+                    request = resolution.throw(e)
+                else:
+                    request = resolution.send(output)
+        except StopIteration as stop:
+            return str(stop.value)
         except Exception as e:
             raise PybatchException("Failed to get the state of the job.") from e
-        if st:
-            return st
-        else:
-            raise PybatchException(
-                f"Unknown state. squeue_state: {squeue_state}, sacct_state:{sacct_state}"
-            )
 
     def exit_code(self) -> int | None:
         if not self.jobid:
@@ -241,38 +553,14 @@ class Job(GenericJob):
             return 0
         if state != "FAILED":
             return None
-        try:
-            command = [
-                "sacct",
-                # "-X",  # ignore steps
-                "-o",  # output fields
-                "ExitCode%-10",
-                "-n",  # no header
-                "-j",  # jobid
-                self.jobid,
-            ]
-            # code_str format: <exit_code>:<signal_received>
-            # If ok, code_str is "0:0"
-            # If cancel, code_str is "0:15"
-            # If exit 1, code_str is "1:0"
-
-            code_str = self.protocol.run(command)
-            result = None
-            if code_str:
-                # The result is the first non 0 value found, job steps included.
-                result = 0
-                for val in code_str.splitlines():
-                    signal_received = int(val.split(":")[1])
-                    if signal_received != 0:
-                        cur_val = signal_received
-                    else:
-                        cur_val = int(val.split(":")[0])
-                    if cur_val != 0:
-                        result = cur_val
-                        break
-        except Exception:
-            result = None
-        return result
+        if self._final_exit_code is None:
+            try:
+                self._keep_exit_code(
+                    self.protocol.run(sacct_command([self.jobid]))
+                )
+            except Exception:
+                return None
+        return self._final_exit_code
 
     def cancel(self) -> None:
         "Stop the job."
@@ -284,11 +572,21 @@ class Job(GenericJob):
         except Exception as e:
             raise PybatchException("Failed to cancel the job.") from e
 
-    def get(self, remote_paths: list[str], local_path: str | Path) -> None:
+    def get(
+        self,
+        remote_paths: list[str],
+        local_path: str | Path,
+        incremental: bool = False,
+        checksum: bool = False,
+    ) -> None:
         """Copy a file or directory from the remote work directory.
 
         :param remote_paths: paths relative to work directory on remote host.
         :param local_path: destination of the copy on local file system.
+        :param incremental: download only the files which are missing or
+         different in local_path.
+        :param checksum: with incremental, compare the files by their hash
+         instead of their size and modification time.
         """
         checked_paths = []
         for path in remote_paths:
@@ -301,80 +599,85 @@ class Job(GenericJob):
                     is_posix=self.job_params.is_posix,
                 )
                 checked_paths.append(p)
-        self.protocol.download(checked_paths, local_path)
+        if incremental:
+            download_incremental(
+                self.protocol,
+                checked_paths,
+                local_path,
+                self.job_params.python_exe,
+                self.job_params.is_posix,
+                checksum,
+                self._download,
+                self.job_params.archive_compression,
+            )
+        else:
+            self._download(checked_paths, local_path)
 
-    def stdout(self) -> str:
+    def _download(
+        self, remote_paths: list[str], local_path: str | Path
+    ) -> None:
+        if self.job_params.archive_transfer:
+            self.protocol.download_archive(
+                remote_paths, local_path, self.job_params.archive_compression
+            )
+        else:
+            self.protocol.download(remote_paths, local_path)
+
+    def stdout(self, tail: int | None = None) -> str:
         output_file = path_join(
             self.job_params.work_directory,
             "logs",
             "output.log",
             is_posix=self.job_params.is_posix,
         )
+        if tail is not None:
+            return self.protocol.tail(str(output_file), n_lines=tail)
         return self.protocol.read(str(output_file))
 
-    def stderr(self) -> str:
+    def stderr(self, tail: int | None = None) -> str:
         output_file = path_join(
             self.job_params.work_directory,
             "logs",
             "error.log",
             is_posix=self.job_params.is_posix,
         )
+        if tail is not None:
+            return self.protocol.tail(str(output_file), n_lines=tail)
         return self.protocol.read(str(output_file))
 
+    def follow_stdout(
+        self, interval: float = 1.0, max_interval: float = 30.0
+    ) -> Iterator[str]:
+        return follow_job_log(
+            self.protocol,
+            self.job_params,
+            "output.log",
+            self.state,
+            interval,
+            max_interval,
+        )
+
+    def follow_stderr(
+        self, interval: float = 1.0, max_interval: float = 30.0
+    ) -> Iterator[str]:
+        return follow_job_log(
+            self.protocol,
+            self.job_params,
+            "error.log",
+            self.state,
+            interval,
+            max_interval,
+        )
+
     def batch_file(self) -> str:
         "Get the content of the batch file submited to the batch manager."
-        batch = """#!/bin/bash -l
-#SBATCH --output=logs/output.log
-#SBATCH --error=logs/error.log
-"""
-        if self.job_params.name:
-            batch += f"#SBATCH --job-name={self.job_params.name}\n"
-        if self.job_params.total_jobs > 1:
-            simul = ""
-            if self.job_params.max_simul_jobs > 1:
-                simul = f"%{self.job_params.max_simul_jobs}"
-            array = f"0-{self.job_params.total_jobs - 1}{simul}"
-            batch += f"#SBATCH --array={array}\n"
-        if self.job_params.ntasks > 0:
-            batch += f"#SBATCH --ntasks={self.job_params.ntasks}\n"
-        if self.job_params.nodes > 0:
-            batch += f"#SBATCH --nodes={self.job_params.nodes}\n"
-        if self.job_params.exclusive:
-            batch += "#SBATCH --exclusive\n"
-        if self.job_params.wall_time:
-            batch += f"#SBATCH --time={self.job_params.wall_time}\n"
-        if self.job_params.mem_per_node:
-            batch += f"#SBATCH --mem={self.job_params.mem_per_node}\n"
-        if self.job_params.mem_per_cpu:
-            batch += f"#SBATCH --mem-per-cpu={self.job_params.mem_per_cpu}\n"
-        if self.job_params.queue:
-            batch += f"#SBATCH --qos={self.job_params.queue}\n"
-        if self.job_params.partition:
-            batch += f"#SBATCH --partition={self.job_params.partition}\n"
-        if self.job_params.wckey:
-            batch += f"#SBATCH --wckey={self.job_params.wckey}\n"
-        for extra in self.job_params.extra_as_list:
-            batch += f"#SBATCH {extra}\n"
-        if self.job_params.extra_as_string:
-            batch += self.job_params.extra_as_string
-        if self.job_params.create_nodefile:
-            batch += """
-LIBBATCH_NODEFILE=`pwd`/batch_nodefile.txt
-srun hostname > $LIBBATCH_NODEFILE
-export LIBBATCH_NODEFILE
-"""
-        # batch += "echo Jobid: $SLURM_JOB_ID\n"
-        # if self.job_params.total_jobs > 1:
-        #     batch += "echo master Jobid: $SLURM_ARRAY_JOB_ID\n"
-        command = self.job_params.command
-        str_command = command[0]
-        for arg in command[1:]:
-            str_command += " " + escape_str(arg)
-        if self.job_params.total_jobs > 1:
-            str_command += " $SLURM_ARRAY_TASK_ID"
-        batch += "\n"
-        batch += str_command
-        return batch
+        return batch_file(self.job_params)
+
+    def __getstate__(self) -> dict[str, typing.Any]:
+        # The monitor is shared with other jobs and it is not serialized.
+        state = self.__dict__.copy()
+        state.pop("monitor", None)
+        return state
 
     # A réfléchir, mais il vaut peut-être mieux utiliser la sérialisation
     # pickle.
@@ -0,0 +1,148 @@
+# Copyright (C) 2025-2026  CEA, EDF
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307 USA
+#
+# See http://www.salome-platform.org/ or email : webmaster.salome@opencascade.com
+#
+from __future__ import annotations
+from collections.abc import Iterable
+import time
+
+from pybatch import GenericProtocol, PybatchException
+from .job import (
+    Job,
+    base_jobid,
+    parse_sacct,
+    sacct_command,
+    sacct_state,
+    squeue_state,
+)
+
+
+def parse_squeue(output: str) -> dict[str, list[str]]:
+    """Group the states listed by squeue by job id.
+
+    Each line of the output is "<jobid> <state>". The tasks of a job array are
+    gathered under the id of the main job.
+    """
+    result: dict[str, list[str]] = {}
+    for line in output.splitlines():
+        fields = line.split()
+        if len(fields) < 2:
+            continue
+        result.setdefault(base_jobid(fields[0]), []).append(fields[1])
+    return result
+
+
+class JobMonitor:
+    """Resolve the states of many slurm jobs with bulk queries.
+
+    The states of all the registered jobs are obtained with a single call to
+    squeue for the current user and, for the jobs which are no longer listed
+    by squeue, a single call to sacct. The states are kept for max_age seconds
+    and they are returned by the function state() of the registered jobs.
+    The jobs which are over are no longer queried.
+
+    :param jobs: jobs to register.
+    :param max_age: delay in seconds before querying the states again.
+    """
+
+    def __init__(self, jobs: Iterable[Job] = (), max_age: float = 1.0):
+        self.max_age = max_age
+        self._jobs: dict[int, Job] = {}
+        self._states: dict[int, str] = {}
+        self._timestamp = -float("inf")
+        for job in jobs:
+            self.add(job)
+
+    def add(self, job: Job) -> None:
+        "Register a job. Its state is then resolved by this monitor."
+        self._jobs[id(job)] = job
+        job.monitor = self
+
+    def remove(self, job: Job) -> None:
+        "Unregister a job."
+        if self._jobs.pop(id(job), None) is not None:
+            job.monitor = None
+        self._states.pop(id(job), None)
+
+    def refresh(self) -> None:
+        "Query the states of all the registered jobs."
+        groups: dict[int, tuple[GenericProtocol, list[Job]]] = {}
+        for job in self._jobs.values():
+            if job.jobid and not job._final_state:
+                protocol = job.protocol
+                groups.setdefault(id(protocol), (protocol, []))[1].append(job)
+        states: dict[int, str] = {}
+        try:
+            for protocol, jobs in groups.values():
+                states.update(self._query(protocol, jobs))
+        except Exception as e:
+            raise PybatchException(
+                "Failed to get the state of the jobs."
+            ) from e
+        self._states = states
+        self._timestamp = time.monotonic()
+
+    def state(self, job: Job) -> str:
+        """State of a registered job.
+
+        The states are queried again if they are older than max_age. When the
+        state of a job cannot be resolved by the bulk queries, the job is
+        queried alone.
+        """
+        if not job.jobid:
+            return "CREATED"
+        if job._final_state:
+            return job._final_state
+        if time.monotonic() - self._timestamp > self.max_age:
+            self.refresh()
+        st = self._states.get(id(job), "")
+        if not st:
+            st = job._query_state()
+        return st
+
+    def _query(
+        self, protocol: GenericProtocol, jobs: list[Job]
+    ) -> dict[int, str]:
+        result: dict[int, str] = {}
+        try:
+            output = protocol.run(["squeue", "--me", "-h", "-o", "%i %T"])
+        except PybatchException:
+            output = ""
+        squeue_states = parse_squeue(output)
+        missing = []
+        for job in jobs:
+            listed = "\n".join(squeue_states.get(job.jobid, []))
+            st = squeue_state(listed, job.number_of_jobs)
+            if st:
+                job._keep_final_state(st)
+                result[id(job)] = st
+            else:
+                missing.append(job)
+        if not missing:
+            return result
+
+        jobids = sorted({job.jobid for job in missing})
+        output = protocol.run(sacct_command(jobids))
+        sacct_states = parse_sacct(output)
+        for job in missing:
+            states, exit_codes = sacct_states.get(job.jobid, ([], []))
+            if states:
+                st = sacct_state("\n".join(states), job.number_of_jobs)
+                if st:
+                    job._keep_final_state(st, exit_codes)
+                    result[id(job)] = st
+        return result
@@ -20,7 +20,9 @@
 # type: ignore
 from __future__ import annotations
 from pybatch import GenericJob, LaunchParameters, GenericProtocol
+from pybatch import AsyncJob, AsyncGenericProtocol
 from .job import Job
+from . import async_job
 
 
 class Plugin:
@@ -32,3 +34,8 @@ class Plugin:
         self, param: LaunchParameters, connection_protocol: GenericProtocol
     ) -> GenericJob:
         return Job(param, connection_protocol)
+
+    def create_async_job(
+        self, param: LaunchParameters, connection_protocol: AsyncGenericProtocol
+    ) -> AsyncJob:
+        return async_job.Job(param, connection_protocol)
@@ -0,0 +1,143 @@
+# Copyright (C) 2025-2026  CEA, EDF
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307 USA
+#
+# See http://www.salome-platform.org/ or email : webmaster.salome@opencascade.com
+#
+"""Strategies used by Job.wait() to space out the queries of the job state."""
+
+from __future__ import annotations
+from datetime import datetime
+import time
+import typing
+
+from pybatch import PybatchException
+from pybatch.tools import slurm_time_to_seconds
+
+if typing.TYPE_CHECKING:
+    from .job import Job
+
+
+class WaitStrategy(typing.Protocol):
+    "Delay between two queries of the state of a job in Job.wait()."
+
+    def delay(self, job: Job, state: str, attempt: int) -> float:
+        """Number of seconds to sleep before the next query of the state.
+
+        :param job: job to wait for.
+        :param state: last known state of the job.
+        :param attempt: number of consecutive queries which returned this
+         state, starting from 1.
+        """
+        ...
+
+
+class FixedDelay:
+    "Query the state at regular intervals."
+
+    def __init__(self, seconds: float = 1.0):
+        self.seconds = seconds
+
+    def delay(self, job: Job, state: str, attempt: int) -> float:
+        return self.seconds
+
+
+class ExponentialBackoff:
+    """Delay growing by a constant factor while the state does not change.
+
+    The delay is capped by max_delay and by a fraction of the wall time of
+    the job, which bounds the latency of the detection of the end of the job.
+
+    :param initial: delay after the first query, in seconds.
+    :param factor: multiplication factor of the delay.
+    :param max_delay: maximum delay, in seconds.
+    :param wall_time_ratio: maximum delay as a fraction of the wall time.
+    """
+
+    def __init__(
+        self,
+        initial: float = 1.0,
+        factor: float = 1.5,
+        max_delay: float = 60.0,
+        wall_time_ratio: float = 0.1,
+    ):
+        self.initial = initial
+        self.factor = factor
+        self.max_delay = max_delay
+        self.wall_time_ratio = wall_time_ratio
+
+    def delay(self, job: Job, state: str, attempt: int) -> float:
+        cap = self.max_delay
+        wall_time = slurm_time_to_seconds(job.job_params.wall_time)
+        if wall_time:
+            cap = min(
+                cap, max(self.initial, int(wall_time) * self.wall_time_ratio)
+            )
+        # limit the exponent to avoid float overflow on very long waits.
+        exponent = min(attempt - 1, 100)
+        return min(self.initial * self.factor**exponent, cap)
+
+
+def estimated_start(job: Job) -> float | None:
+    """Start time of a queued job estimated by slurm, as a timestamp.
+
+    Return None if slurm has no estimation.
+    """
+    command = ["squeue", "--start", "-h", "-o", "%S", "-j", job.jobid]
+    try:
+        output = job.protocol.run(command)
+    except PybatchException:
+        return None
+    result = None
+    for line in output.splitlines():
+        try:
+            start = datetime.fromisoformat(line.strip()).timestamp()
+        except ValueError:
+            # "N/A" when there is no estimation
+            continue
+        if result is None or start < result:
+            result = start
+    return result
+
+
+class EstimatedStart:
+    """Sleep until the start time of a queued job, as estimated by slurm.
+
+    The estimation is given by "squeue --start". When the job is not queued
+    or when there is no estimation, the delay is given by the strategy then.
+
+    :param then: strategy used when the start time is not relevant.
+    :param max_delay: maximum delay while the job is queued, in seconds. The
+     estimation may change when other jobs end sooner than expected.
+    """
+
+    def __init__(
+        self, then: WaitStrategy | None = None, max_delay: float = 600.0
+    ):
+        self.then: WaitStrategy
+        if then is None:
+            self.then = ExponentialBackoff()
+        else:
+            self.then = then
+        self.max_delay = max_delay
+
+    def delay(self, job: Job, state: str, attempt: int) -> float:
+        if state == "QUEUED":
+            start = estimated_start(job)
+            if start is not None:
+                remaining = start - time.time()
+                if remaining > 0:
+                    return min(remaining, self.max_delay)
+        return self.then.delay(job, state, attempt)
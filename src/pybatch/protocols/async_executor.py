@@ -0,0 +1,78 @@
+# Copyright (C) 2025-2026  CEA, EDF
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307 USA
+#
+# See http://www.salome-platform.org/ or email : webmaster.salome@opencascade.com
+#
+from __future__ import annotations
+import asyncio
+import concurrent.futures
+import functools
+from collections.abc import Callable, Iterable
+from pathlib import Path
+import typing
+
+from ..generic_protocol import GenericProtocol
+
+T = typing.TypeVar("T")
+
+
+class ExecutorProtocol:
+    """Asyncio protocol which runs the operations of a blocking protocol in an
+    executor.
+
+    This is the way to use ParamikoProtocol, which is safe for concurrent use
+    from threads, in an asyncio application. The number of concurrent
+    operations is bounded by the number of workers of the executor.
+
+    :param protocol: blocking protocol.
+    :param executor: executor of the operations. None for the default
+     executor of the event loop.
+    """
+
+    def __init__(
+        self,
+        protocol: GenericProtocol,
+        executor: concurrent.futures.Executor | None = None,
+    ):
+        self.protocol = protocol
+        self._executor = executor
+
+    async def _call(self, function: Callable[..., T], *args: typing.Any) -> T:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, functools.partial(function, *args)
+        )
+
+    async def upload(
+        self, local_entries: Iterable[str | Path], remote_path: str
+    ) -> None:
+        await self._call(self.protocol.upload, list(local_entries), remote_path)
+
+    async def download(
+        self, remote_entries: Iterable[str], local_path: str | Path
+    ) -> None:
+        await self._call(
+            self.protocol.download, list(remote_entries), local_path
+        )
+
+    async def create(self, remote_path: str, content: str) -> None:
+        await self._call(self.protocol.create, remote_path, content)
+
+    async def read(self, remote_path: str) -> str:
+        return await self._call(self.protocol.read, remote_path)
+
+    async def run(self, command: list[str]) -> str:
+        return await self._call(self.protocol.run, command)
@@ -0,0 +1,64 @@
+# Copyright (C) 2025-2026  CEA, EDF
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307 USA
+#
+# See http://www.salome-platform.org/ or email : webmaster.salome@opencascade.com
+#
+from __future__ import annotations
+import asyncio
+import typing
+from collections.abc import Iterable
+from pathlib import Path
+
+from ..tools import async_run_check
+from .local import LocalProtocol
+
+
+class AsyncLocalProtocol:
+    """Protocol for localhost, for asyncio applications.
+
+    The commands run in asyncio subprocesses and the file operations run in
+    threads.
+    """
+
+    def __init__(self, params: typing.Any = None):
+        self._local = LocalProtocol()
+
+    async def upload(
+        self, local_entries: Iterable[str | Path], remote_path: str
+    ) -> None:
+        await asyncio.to_thread(
+            self._local.upload, list(local_entries), remote_path
+        )
+
+    async def download(
+        self, remote_entries: Iterable[str], local_path: str | Path
+    ) -> None:
+        await asyncio.to_thread(
+            self._local.download, list(remote_entries), local_path
+        )
+
+    async def create(self, remote_path: str, content: str) -> None:
+        await asyncio.to_thread(self._local.create, remote_path, content)
+
+    async def read(self, remote_path: str) -> str:
+        return await asyncio.to_thread(self._local.read, remote_path)
+
+    async def run(self, command: list[str]) -> str:
+        return await async_run_check(command)
+
+
+def open() -> AsyncLocalProtocol:
+    return AsyncLocalProtocol()
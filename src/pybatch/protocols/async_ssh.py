@@ -0,0 +1,86 @@
+# Copyright (C) 2025-2026  CEA, EDF
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307 USA
+#
+# See http://www.salome-platform.org/ or email : webmaster.salome@opencascade.com
+#
+from __future__ import annotations
+from collections.abc import Iterable
+from pathlib import Path
+import typing
+
+from ..parameter import ConnectionParameters
+from ..tools import async_run_check
+from .ssh import SshProtocol
+
+
+class AsyncSshProtocol:
+    """Communication protocol using the external commands ssh and scp, for
+    asyncio applications.
+
+    The commands are those of SshProtocol, run in asyncio subprocesses. With
+    control_master, the concurrent operations share a single ssh connection.
+
+    :param params: connection parameters.
+    :param control_master: share a single connection between operations.
+    :param control_persist: inactivity time before the shared connection is
+     closed (see ControlPersist in ssh_config).
+    """
+
+    def __init__(
+        self,
+        params: ConnectionParameters,
+        control_master: bool = False,
+        control_persist: str = "10m",
+    ):
+        self._ssh = SshProtocol(params, control_master, control_persist)
+
+    def __enter__(self) -> AsyncSshProtocol:
+        return self
+
+    def __exit__(self, *args: typing.Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        "Close the shared connection, if any."
+        self._ssh.close()
+
+    async def upload(
+        self, local_entries: Iterable[str | Path], remote_path: str
+    ) -> None:
+        await async_run_check(
+            self._ssh._upload_command(local_entries, remote_path)
+        )
+
+    async def download(
+        self, remote_entries: Iterable[str], local_path: str | Path
+    ) -> None:
+        for command in self._ssh._download_commands(remote_entries, local_path):
+            await async_run_check(command)
+
+    async def create(self, remote_path: str, content: str) -> None:
+        await async_run_check(
+            self._ssh._create_command(remote_path), input=content
+        )
+
+    async def read(self, remote_path: str) -> str:
+        return await async_run_check(self._ssh._read_command(remote_path))
+
+    async def run(self, command: list[str]) -> str:
+        return await async_run_check(self._ssh._remote_command(command))
+
+
+def open(params: ConnectionParameters) -> AsyncSshProtocol:
+    return AsyncSshProtocol(params)
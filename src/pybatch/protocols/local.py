@@ -18,13 +18,15 @@
 #
 from __future__ import annotations
 import typing
-from collections.abc import Iterable
+from collections.abc import Iterable, Iterator
 from pathlib import Path
 import shutil
+import subprocess
 import os
 
 from .. import PybatchException
-from ..tools import run_check
+from ..tools import run_check, popen_stream, tail_file, PipeProcess
+from ..generic_protocol import CommandResult
 
 
 def copy(src: str | Path, dest: str | Path) -> None:
@@ -59,16 +61,83 @@ class LocalProtocol:
         for entry in remote_entries:
             copy(entry, local_path)
 
+    def upload_archive(
+        self,
+        local_entries: Iterable[str | Path],
+        remote_path: str,
+        compression: str = "",
+    ) -> None:
+        # nothing to gain from an archive on the same file system
+        self.upload(local_entries, remote_path)
+
+    def download_archive(
+        self,
+        remote_entries: Iterable[str],
+        local_path: str | Path,
+        compression: str = "",
+        base: str = "",
+    ) -> None:
+        if not base:
+            self.download(remote_entries, local_path)
+            return
+        for entry in remote_entries:
+            destination = Path(local_path, entry).parent
+            destination.mkdir(parents=True, exist_ok=True)
+            copy(Path(base, entry), destination)
+
     def create(self, remote_path: str, content: str) -> None:
         Path(remote_path).write_text(content)
 
     def read(self, remote_path: str) -> str:
         return Path(remote_path).read_text()
 
+    def read_range(
+        self, remote_path: str, offset: int, length: int | None = None
+    ) -> bytes:
+        with Path(remote_path).open("rb") as f:
+            f.seek(offset)
+            return f.read() if length is None else f.read(length)
+
+    def tail(
+        self,
+        remote_path: str,
+        n_bytes: int | None = None,
+        n_lines: int | None = None,
+    ) -> str:
+        with Path(remote_path).open("rb") as f:
+            return tail_file(f, n_bytes, n_lines).decode(errors="replace")
+
     def run(self, command: list[str]) -> str:
         proc = run_check(command)
         return proc.stdout
 
+    def run_many(self, commands: list[list[str]]) -> list[CommandResult]:
+        result = []
+        for command in commands:
+            try:
+                proc = subprocess.run(
+                    command,
+                    capture_output=True,
+                    text=True,
+                    stdin=subprocess.DEVNULL,
+                )
+            except OSError as e:
+                # same return code as a shell for a command not found
+                result.append(CommandResult(127, "", str(e)))
+                continue
+            result.append(
+                CommandResult(proc.returncode, proc.stdout, proc.stderr)
+            )
+        return result
+
+    def start(self, command: list[str]) -> PipeProcess:
+        return PipeProcess(command)
+
+    def run_stream(
+        self, command: list[str], max_bytes: int | None = None
+    ) -> Iterator[str]:
+        return popen_stream(command, max_bytes)
+
 
 def open() -> LocalProtocol:
     return LocalProtocol()
@@ -0,0 +1,322 @@
+# Copyright (C) 2025-2026  CEA, EDF
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307 USA
+#
+# See http://www.salome-platform.org/ or email : webmaster.salome@opencascade.com
+#
+"""Parallel file transfers over several SFTP sessions of one ssh transport.
+
+The files to transfer are listed first, then they are spread over the
+sessions through a work queue. Big files are cut into chunks which are
+transferred concurrently, at their offset in the file.
+"""
+
+from __future__ import annotations
+from collections.abc import Callable
+import os
+import posixpath
+import queue
+import stat
+import threading
+import typing
+import paramiko
+
+from .. import PybatchException
+
+
+class Task(typing.NamedTuple):
+    """Transfer of a file, or of a part of a file when length >= 0.
+
+    The permission bits mode are given to the destination of a whole file,
+    like scp does.
+    """
+
+    source: str
+    destination: str
+    offset: int = 0
+    length: int = -1
+    mode: int = -1
+
+
+def is_remote_dir(sftp: paramiko.SFTPClient, remote_path: str) -> bool:
+    try:
+        mode = sftp.stat(remote_path).st_mode
+    except OSError:
+        return False
+    return mode is not None and stat.S_ISDIR(mode)
+
+
+def remote_mkdir(sftp: paramiko.SFTPClient, remote_path: str) -> None:
+    "Create a remote directory if it does not exist."
+    if not is_remote_dir(sftp, remote_path):
+        try:
+            sftp.mkdir(remote_path)
+        except OSError as e:
+            message = f"Failed to create remote directory {remote_path}."
+            raise PybatchException(message) from e
+
+
+class ParallelSftp:
+    """Transfer files over several SFTP sessions.
+
+    The additional sessions are taken from open_sftp at the beginning of a
+    transfer and given back to release_sftp at the end.
+    :param open_sftp: function which gives an SFTP session, or None if no
+     more session is available.
+    :param max_sessions: maximum number of sessions used by a transfer.
+    :param chunk_size: files bigger than this size, in bytes, are transferred
+     by chunks.
+    :param release_sftp: function called with the sessions which are not used
+     anymore. By default, they are closed.
+    """
+
+    def __init__(
+        self,
+        open_sftp: Callable[[], paramiko.SFTPClient | None],
+        max_sessions: int = 4,
+        chunk_size: int = 16 * 1024 * 1024,
+        release_sftp: Callable[[paramiko.SFTPClient], None] | None = None,
+    ):
+        if max_sessions < 1:
+            raise PybatchException("At least one session is needed.")
+        self.open_sftp = open_sftp
+        self.max_sessions = max_sessions
+        self.chunk_size = chunk_size
+        if release_sftp is None:
+            self.release_sftp: Callable[[paramiko.SFTPClient], None] = (
+                lambda sftp: sftp.close()
+            )
+        else:
+            self.release_sftp = release_sftp
+
+    def upload(
+        self, sftp: paramiko.SFTPClient, entries: list[tuple[str, str]]
+    ) -> None:
+        """Recursively copy local files and directories, like 'scp -r'.
+
+        :param sftp: session used to create the remote directories.
+        :param entries: list of (local path, remote path).
+        """
+        tasks: list[Task] = []
+        # permission bits of the files transferred by chunks
+        modes: list[tuple[str, int]] = []
+        for local_path, remote_path in entries:
+            self._plan_put(sftp, local_path, remote_path, tasks, modes)
+        self._run(sftp, tasks, put_task)
+        for remote_path, mode in modes:
+            try:
+                sftp.chmod(remote_path, mode)
+            except OSError as e:
+                message = f"Failed to set the mode of {remote_path}."
+                raise PybatchException(message) from e
+
+    def download(
+        self, sftp: paramiko.SFTPClient, entries: list[tuple[str, str]]
+    ) -> None:
+        """Recursively copy remote files and directories, like 'scp -r'.
+
+        :param sftp: session used to list the remote directories.
+        :param entries: list of (remote path, local path).
+        """
+        tasks: list[Task] = []
+        # permission bits of the files transferred by chunks
+        modes: list[tuple[str, int]] = []
+        for remote_path, local_path in entries:
+            try:
+                attributes = sftp.stat(remote_path)
+            except OSError as e:
+                message = f"Failed to download {remote_path}."
+                raise PybatchException(message) from e
+            self._plan_get(
+                sftp, remote_path, attributes, local_path, tasks, modes
+            )
+        self._run(sftp, tasks, get_task)
+        for local_path, mode in modes:
+            os.chmod(local_path, mode)
+
+    def _split(
+        self, source: str, destination: str, size: int, mode: int
+    ) -> list[Task]:
+        if size <= self.chunk_size or self.max_sessions == 1:
+            return [Task(source, destination, mode=mode)]
+        return [
+            Task(
+                source, destination, offset, min(self.chunk_size, size - offset)
+            )
+            for offset in range(0, size, self.chunk_size)
+        ]
+
+    def _plan_put(
+        self,
+        sftp: paramiko.SFTPClient,
+        local_path: str,
+        remote_path: str,
+        tasks: list[Task],
+        modes: list[tuple[str, int]],
+    ) -> None:
+        if os.path.isdir(local_path):
+            remote_mkdir(sftp, remote_path)
+            for name in os.listdir(local_path):
+                self._plan_put(
+                    sftp,
+                    os.path.join(local_path, name),
+                    posixpath.join(remote_path, name),
+                    tasks,
+                    modes,
+                )
+            return
+        local_stat = os.stat(local_path)
+        mode = stat.S_IMODE(local_stat.st_mode)
+        chunks = self._split(local_path, remote_path, local_stat.st_size, mode)
+        if len(chunks) > 1:
+            modes.append((remote_path, mode))
+            # create or truncate the file before writing the chunks
+            try:
+                sftp.open(remote_path, "wb").close()
+            except OSError as e:
+                message = f"Failed to upload {local_path} to {remote_path}."
+                raise PybatchException(message) from e
+        tasks += chunks
+
+    def _plan_get(
+        self,
+        sftp: paramiko.SFTPClient,
+        remote_path: str,
+        attributes: paramiko.SFTPAttributes,
+        local_path: str,
+        tasks: list[Task],
+        modes: list[tuple[str, int]],
+    ) -> None:
+        mode = attributes.st_mode
+        if mode is not None and stat.S_ISDIR(mode):
+            os.makedirs(local_path, exist_ok=True)
+            for child in sftp.listdir_attr(remote_path):
+                self._plan_get(
+                    sftp,
+                    posixpath.join(remote_path, child.filename),
+                    child,
+                    os.path.join(local_path, child.filename),
+                    tasks,
+                    modes,
+                )
+            return
+        size = attributes.st_size or 0
+        file_mode = -1 if mode is None else stat.S_IMODE(mode)
+        chunks = self._split(remote_path, local_path, size, file_mode)
+        if len(chunks) > 1:
+            with open(local_path, "wb") as local_file:
+                local_file.truncate(size)
+            if file_mode >= 0:
+                modes.append((local_path, file_mode))
+        tasks += chunks
+
+    def _run(
+        self,
+        sftp: paramiko.SFTPClient,
+        tasks: list[Task],
+        transfer: Callable[[paramiko.SFTPClient, Task], None],
+    ) -> None:
+        "Run the tasks on sftp and on the additional sessions."
+        n_sessions = min(self.max_sessions, len(tasks))
+        if n_sessions <= 1:
+            for task in tasks:
+                transfer(sftp, task)
+            return
+        sessions = [sftp]
+        try:
+            while len(sessions) < n_sessions:
+                session = self.open_sftp()
+                if session is None:
+                    break
+                sessions.append(session)
+            run_workers(sessions, tasks, transfer)
+        finally:
+            for session in sessions[1:]:
+                self.release_sftp(session)
+
+
+def run_workers(
+    sessions: list[paramiko.SFTPClient],
+    tasks: list[Task],
+    transfer: Callable[[paramiko.SFTPClient, Task], None],
+) -> None:
+    "Run the tasks with one thread per session."
+    work: queue.SimpleQueue[Task] = queue.SimpleQueue()
+    for task in tasks:
+        work.put(task)
+    errors: list[BaseException] = []
+
+    def worker(session: paramiko.SFTPClient) -> None:
+        while not errors:
+            try:
+                task = work.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                transfer(session, task)
+            except BaseException as e:
+                errors.append(e)
+
+    threads = [
+        threading.Thread(target=worker, args=(session,), daemon=True)
+        for session in sessions
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
+
+
+def put_task(sftp: paramiko.SFTPClient, task: Task) -> None:
+    "Upload a file, or a chunk of a file."
+    try:
+        if task.length < 0:
+            sftp.put(task.source, task.destination)
+            if task.mode >= 0:
+                sftp.chmod(task.destination, task.mode)
+            return
+        with open(task.source, "rb") as local_file:
+            with sftp.open(task.destination, "r+b") as remote_file:
+                remote_file.set_pipelined(True)
+                local_file.seek(task.offset)
+                remote_file.seek(task.offset)
+                remaining = task.length
+                while remaining > 0:
+                    data = local_file.read(min(remaining, 32768))
+                    if not data:
+                        break
+                    remote_file.write(data)
+                    remaining -= len(data)
+    except OSError as e:
+        if not os.path.exists(task.source):
+            raise
+        message = f"Failed to upload {task.source} to {task.destination}."
+        raise PybatchException(message) from e
+
+
+def get_task(sftp: paramiko.SFTPClient, task: Task) -> None:
+    "Download a file, or a chunk of a file."
+    if task.length < 0:
+        sftp.get(task.source, task.destination)
+        if task.mode >= 0:
+            os.chmod(task.destination, task.mode)
+        return
+    with sftp.open(task.source, "rb") as remote_file:
+        with open(task.destination, "r+b") as local_file:
+            local_file.seek(task.offset)
+            for data in remote_file.readv([(task.offset, task.length)]):
+                local_file.write(data)
@@ -17,34 +17,118 @@
 # See http://www.salome-platform.org/ or email : webmaster.salome@opencascade.com
 #
 from __future__ import annotations
-from collections.abc import Iterable
+from collections.abc import Callable, Iterable, Iterator
 from pathlib import Path
+import os
+import posixpath
+import tarfile
+import threading
 import paramiko
-import scp  # type: ignore
-from typing import Any
+from typing import IO, Any, TypeVar, cast
 from ..parameter import ConnectionParameters
 from .. import PybatchException
-from ..tools import escape_str
+from ..tools import escape_str, stream_output, tail_file
+from ..tools import tar_option, write_archive, extract_archive, archive_paths
+from ..tools import read_in_thread, run_many
+from ..generic_protocol import CommandResult
+from .parallel_sftp import ParallelSftp, is_remote_dir
+
+T = TypeVar("T")
 
 
 class ParamikoProtocol:
-    """Communication protocol based on python modules paramiko and scp.
+    """Communication protocol based on python module paramiko.
+
+    The ssh connection is opened by the first operation which needs it, not
+    when the object is created or unpickled. It is closed when the object is
+    garbage collected, or by close(). If the connection is lost, it is opened
+    again at the next operation.
+
+    The protocol can be used by several threads at the same time. Every
+    command runs on its own channel and every file operation uses its own
+    SFTP session. The SFTP sessions are kept open for the next operations.
+    The number of channels and sessions open at the same time is limited by
+    max_channels, which should not exceed the MaxSessions setting of the
+    server (10 by default). Uploads and downloads of several files, or of big
+    files, are spread over up to transfer_sessions SFTP sessions.
 
-    The ssh connection is opened when the object is created and it is closed
-    when the object is garbage collected.
+    When a protocol is unpickled, the connection is shared with the other
+    unpickled protocols with the same parameters, through the default
+    ProtocolPool (see pybatch.protocols.pool).
+
+    :param params: connection parameters.
+    :param transfer_sessions: maximum number of SFTP sessions used in
+     parallel by upload and download.
+    :param chunk_size: files bigger than this size, in bytes, are transferred
+     by chunks in parallel.
+    :param keepalive: interval in seconds between the keepalive packets sent
+     on an idle connection. 0 disables them.
+    :param max_channels: maximum number of channels open at the same time.
     """
 
-    def __init__(self, params: ConnectionParameters):
-        client = paramiko.client.SSHClient()
-        client.load_system_host_keys()
-        client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-        self.client = client
+    # default values for objects pickled by older versions
+    transfer_sessions = 4
+    chunk_size = 16 * 1024 * 1024
+    keepalive = 0
+    max_channels = 10
+
+    def __init__(
+        self,
+        params: ConnectionParameters,
+        transfer_sessions: int = 4,
+        chunk_size: int = 16 * 1024 * 1024,
+        keepalive: int = 0,
+        max_channels: int = 10,
+    ):
         self.params = params
-        self._open()
+        self.transfer_sessions = transfer_sessions
+        self.chunk_size = chunk_size
+        self.keepalive = keepalive
+        self.max_channels = max_channels
+        self._init_connection()
+        if max_channels < 1:
+            raise PybatchException("At least one channel is needed.")
+
+    def _init_connection(self) -> None:
+        "State which is not kept by pickle."
+        self.client = new_client()
+        self._lock = threading.RLock()
+        # number of channels in use, including the idle SFTP sessions
+        self._used_channels = 0
+        self._channel_released = threading.Condition(self._lock)
+        self._idle_sftp: list[paramiko.SFTPClient] = []
 
     def __del__(self) -> None:
+        self.close()
+
+    def close(self) -> None:
+        "Close the connection."
+        self._close_sftp()
         self.client.close()
 
+    def _close_sftp(self) -> None:
+        "Close the idle SFTP sessions."
+        with self._lock:
+            idle, self._idle_sftp = self._idle_sftp, []
+        for sftp in idle:
+            self._discard_sftp(sftp)
+
+    def options(self) -> dict[str, Any]:
+        "Transfer options given to the constructor."
+        return {
+            "transfer_sessions": self.transfer_sessions,
+            "chunk_size": self.chunk_size,
+            "max_channels": self.max_channels,
+        }
+
+    def _parallel(self) -> ParallelSftp:
+        return ParallelSftp(
+            lambda: self._checkout_sftp(blocking=False),
+            self.transfer_sessions,
+            self.chunk_size,
+            self._checkin_sftp,
+        )
+
     def _open(self) -> None:
         try:
             self.client.connect(
@@ -56,69 +140,383 @@ class ParamikoProtocol:
         except Exception as e:
             message = f"Failed to open ssh connection to {self.params.host}."
             raise PybatchException(message) from e
+        transport = self.client.get_transport()
+        if transport is not None and self.keepalive > 0:
+            transport.set_keepalive(self.keepalive)
+
+    def _transport(self) -> paramiko.Transport:
+        """Get the ssh transport, after a new connection if it is not opened
+        yet or if it was lost.
+        """
+        with self._lock:
+            transport = self.client.get_transport()
+            if transport is None or not transport.is_active():
+                self._close_sftp()
+                if transport is not None:
+                    self.client.close()
+                    self.client = new_client()
+                self._open()
+                transport = self.client.get_transport()
+                assert transport is not None
+            return transport
+
+    def _acquire_channel(self, blocking: bool = True) -> bool:
+        """Reserve one of the max_channels channels.
+
+        When all the channels are used, an idle SFTP session is closed, or
+        the function waits for a channel to be released.
+        :param blocking: return False instead of waiting.
+        """
+        with self._channel_released:
+            while self._used_channels >= self.max_channels:
+                if self._idle_sftp:
+                    # the channel of the idle session is reused
+                    self._idle_sftp.pop().close()
+                    return True
+                if not blocking:
+                    return False
+                self._channel_released.wait()
+            self._used_channels += 1
+            return True
+
+    def _release_channel(self) -> None:
+        with self._channel_released:
+            self._used_channels -= 1
+            self._channel_released.notify()
+
+    def _checkout_sftp(
+        self, blocking: bool = True
+    ) -> paramiko.SFTPClient | None:
+        """Take an idle SFTP session, or open a new one.
+
+        :param blocking: return None instead of waiting for a free channel.
+        """
+        while True:
+            with self._lock:
+                sftp = self._idle_sftp.pop() if self._idle_sftp else None
+            if sftp is None:
+                break
+            if not sftp.get_channel().closed:  # type: ignore
+                return sftp
+            self._discard_sftp(sftp)
+        if not self._acquire_channel(blocking):
+            return None
+        try:
+            self._transport()
+            return self.client.open_sftp()
+        except BaseException:
+            self._release_channel()
+            raise
+
+    def _checkin_sftp(self, sftp: paramiko.SFTPClient) -> None:
+        "Give back a session taken by _checkout_sftp."
+        if sftp.get_channel().closed:  # type: ignore
+            self._discard_sftp(sftp)
+        else:
+            with self._channel_released:
+                self._idle_sftp.append(sftp)
+                # a thread waiting for a channel can close this session
+                self._channel_released.notify()
+
+    def _discard_sftp(self, sftp: paramiko.SFTPClient) -> None:
+        "Close a session taken by _checkout_sftp."
+        sftp.close()
+        self._release_channel()
+
+    def _with_sftp(self, operation: Callable[[paramiko.SFTPClient], T]) -> T:
+        """Run an operation using an SFTP session.
+
+        If the session is lost, it is opened again and the operation is run a
+        second time.
+        """
+        sftp = self._checkout_sftp()
+        assert sftp is not None
+        try:
+            try:
+                return operation(sftp)
+            except (EOFError, paramiko.SSHException):
+                self._discard_sftp(sftp)
+                sftp = None
+                sftp = self._checkout_sftp()
+                assert sftp is not None
+                return operation(sftp)
+        finally:
+            if sftp is not None:
+                self._checkin_sftp(sftp)
 
     def upload(
         self, local_entries: Iterable[str | Path], remote_path: str
     ) -> None:
-        with scp.SCPClient(self.client.get_transport()) as client:
-            for entry in local_entries:
-                client.put(entry, remote_path, recursive=True)
+        entries = [str(entry) for entry in local_entries]
+
+        def operation(sftp: paramiko.SFTPClient) -> None:
+            to_dir = is_remote_dir(sftp, remote_path)
+            pairs = []
+            for entry in entries:
+                os.stat(entry)  # FileNotFoundError if entry does not exist
+                if to_dir:
+                    name = os.path.basename(os.path.normpath(entry))
+                    pairs.append((entry, posixpath.join(remote_path, name)))
+                else:
+                    pairs.append((entry, remote_path))
+            self._parallel().upload(sftp, pairs)
+
+        self._with_sftp(operation)
 
     def download(
         self, remote_entries: Iterable[str], local_path: str | Path
     ) -> None:
-        with scp.SCPClient(self.client.get_transport()) as client:
-            for entry in remote_entries:
-                client.get(entry, local_path, recursive=True)
+        entries = list(remote_entries)
+
+        def operation(sftp: paramiko.SFTPClient) -> None:
+            to_dir = os.path.isdir(local_path)
+            pairs = []
+            for entry in entries:
+                if to_dir:
+                    name = posixpath.basename(posixpath.normpath(entry))
+                    pairs.append((entry, os.path.join(local_path, name)))
+                else:
+                    pairs.append((entry, str(local_path)))
+            self._parallel().download(sftp, pairs)
+
+        self._with_sftp(operation)
 
     def create(self, remote_path: str, content: str) -> None:
-        with self.client.open_sftp() as sftp:
+        def operation(sftp: paramiko.SFTPClient) -> None:
             with sftp.open(remote_path, "w") as remote_file:
                 remote_file.write(content)
 
+        self._with_sftp(operation)
+
     def read(self, remote_path: str) -> str:
-        with self.client.open_sftp() as sftp:
+        def operation(sftp: paramiko.SFTPClient) -> str:
             with sftp.open(remote_path, "r") as remote_file:
-                return remote_file.read().decode()
+                result: str = remote_file.read().decode()
+                return result
+
+        return self._with_sftp(operation)
+
+    def read_range(
+        self, remote_path: str, offset: int, length: int | None = None
+    ) -> bytes:
+        def operation(sftp: paramiko.SFTPClient) -> bytes:
+            with sftp.open(remote_path, "rb") as remote_file:
+                remote_file.seek(offset)
+                return remote_file.read(length)
+
+        return self._with_sftp(operation)
+
+    def tail(
+        self,
+        remote_path: str,
+        n_bytes: int | None = None,
+        n_lines: int | None = None,
+    ) -> str:
+        def operation(sftp: paramiko.SFTPClient) -> bytes:
+            with sftp.open(remote_path, "rb") as remote_file:
+                return tail_file(cast(IO[bytes], remote_file), n_bytes, n_lines)
+
+        return self._with_sftp(operation).decode(errors="replace")
 
     def run(self, command: list[str]) -> str:
-        # in case of issues with big stdout|stderr see
-        # https://github.com/paramiko/paramiko/issues/563
+        # stdout and stderr are read at the same time, which avoids the dead
+        # lock of https://github.com/paramiko/paramiko/issues/563
+        return "".join(self.run_stream(command))
+
+    def _exec(self, str_command: str) -> paramiko.Channel:
+        """Start a command on a new channel.
+
+        The channel has to be closed by _close_channel.
+        """
+        self._acquire_channel()
+        try:
+            channel = self._transport().open_session()
+        except BaseException:
+            self._release_channel()
+            raise
+        try:
+            channel.exec_command(str_command)
+        except BaseException:
+            self._close_channel(channel)
+            raise
+        return channel
+
+    def _close_channel(self, channel: paramiko.Channel) -> None:
+        channel.close()
+        self._release_channel()
+
+    def _check_exit(
+        self, channel: paramiko.Channel, str_command: str, stderr: bytes
+    ) -> None:
+        ret_code = channel.recv_exit_status()
+        if ret_code != 0:
+            message = f"""Error {ret_code}.
+  command: {str_command}
+  server: {self.params.host}
+  stderr: {stderr.decode(errors="replace")}
+"""
+            raise PybatchException(message)
+
+    def upload_archive(
+        self,
+        local_entries: Iterable[str | Path],
+        remote_path: str,
+        compression: str = "",
+    ) -> None:
+        script = (
+            f"tar -x{tar_option(compression)}f - -C {escape_str(remote_path)}"
+        )
+        str_command = "sh -c " + escape_str(script)
+        channel = self._exec(str_command)
+        try:
+            errors = read_in_thread(
+                cast(IO[bytes], channel.makefile_stderr("rb"))
+            )
+            stdin = cast(IO[bytes], channel.makefile("wb"))
+            try:
+                with stdin:
+                    write_archive(local_entries, stdin, compression)
+            except OSError:
+                pass  # tar stopped, the error is reported below
+            channel.shutdown_write()
+            self._check_exit(channel, str_command, errors())
+        finally:
+            self._close_channel(channel)
+
+    def download_archive(
+        self,
+        remote_entries: Iterable[str],
+        local_path: str | Path,
+        compression: str = "",
+        base: str = "",
+    ) -> None:
+        script = f"tar -c{tar_option(compression)}f - "
+        script += archive_paths(remote_entries, base)
+        str_command = "sh -c " + escape_str(script)
+        channel = self._exec(str_command)
+        try:
+            channel.shutdown_write()
+            errors = read_in_thread(
+                cast(IO[bytes], channel.makefile_stderr("rb"))
+            )
+            stdout = cast(IO[bytes], channel.makefile("rb"))
+            try:
+                extract_archive(stdout, local_path, compression)
+            except tarfile.TarError:
+                if channel.recv_exit_status() == 0:
+                    raise
+            self._check_exit(channel, str_command, errors())
+        finally:
+            self._close_channel(channel)
+
+    def run_many(self, commands: list[list[str]]) -> list[CommandResult]:
+        return run_many(self, commands)
+
+    def start(self, command: list[str]) -> ChannelProcess:
+        channel = self._exec(self._command_line(command))
+        try:
+            return ChannelProcess(channel, self._close_channel)
+        except BaseException:
+            self._close_channel(channel)
+            raise
+
+    def _command_line(self, command: list[str]) -> str:
         if len(command) == 0:
             raise PybatchException("Empty command.")
         str_command = command[0]
         for arg in command[1:]:
             str_command += " " + escape_str(arg)
-        stdin, stdout, stderr = self.client.exec_command(str_command)
-        stdin.close()
-        str_std = stdout.read().decode()
-        str_err = stderr.read().decode()
-        stdout.close()
-        stderr.close()
-        ret_code = stdout.channel.recv_exit_status()
-        if ret_code != 0:
-            message = f"""Error {ret_code}.
-  command: {str_command}
+        return str_command
+
+    def run_stream(
+        self, command: list[str], max_bytes: int | None = None
+    ) -> Iterator[str]:
+        str_command = self._command_line(command)
+        channel = self._exec(str_command)
+        try:
+            channel.shutdown_write()
+            stdout = cast(IO[bytes], channel.makefile("rb"))
+            stderr = cast(IO[bytes], channel.makefile_stderr("rb"))
+            context = f"""  command: {str_command}
   server: {self.params.host}
-  stderr: {str_err}
 """
-            raise PybatchException(message)
-        return str_std
+            yield from stream_output(
+                stdout,
+                stderr,
+                channel.recv_exit_status,
+                channel.close,
+                context,
+                max_bytes,
+            )
+        finally:
+            self._close_channel(channel)
 
-    def __getstate__(self) -> dict[str, Any]:
-        # deal with paramiko.client which is not suppported by pickle
-        state = self.__dict__.copy()
-        # Remove the unpicklable entries.
-        del state["client"]
-        return state
+    def __reduce__(self) -> tuple[Any, ...]:
+        # paramiko.client is not supported by pickle. The unpickled protocol
+        # is taken from the default pool, which manages the keepalive.
+        from .pool import pooled_protocol
+
+        return (pooled_protocol, (self.params, self.options()))
 
     def __setstate__(self, state: Any) -> None:
+        # objects pickled by older versions
+        state.pop("client", None)
+        state.pop("_sftp", None)
         self.__dict__.update(state)
-        client = paramiko.client.SSHClient()
-        client.load_system_host_keys()
-        client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-        self.client = client
-        self._open()
+        self._init_connection()
+
+
+class ChannelProcess:
+    """Command running on a channel of a ParamikoProtocol.
+
+    :param channel: channel of the command.
+    :param release: function which closes the channel.
+    """
+
+    def __init__(
+        self,
+        channel: paramiko.Channel,
+        release: Callable[[paramiko.Channel], None],
+    ):
+        self._channel = channel
+        self._release = release
+        self._closed = False
+        self._stdout = cast(IO[bytes], channel.makefile("rb"))
+        self._errors = read_in_thread(
+            cast(IO[bytes], channel.makefile_stderr("rb"))
+        )
+
+    def write(self, data: bytes) -> None:
+        self._channel.sendall(data)
+
+    def readline(self) -> bytes:
+        return self._stdout.readline()
+
+    def close_input(self) -> None:
+        try:
+            self._channel.shutdown_write()
+        except Exception:
+            pass  # connection lost
+
+    def close(self) -> str:
+        if self._closed:
+            return ""
+        self._closed = True
+        try:
+            self._channel.shutdown_write()
+            self._channel.status_event.wait(10)
+        except Exception:
+            pass  # connection lost
+        finally:
+            self._release(self._channel)
+        return self._errors().decode(errors="replace")
+
+
+def new_client() -> paramiko.SSHClient:
+    client = paramiko.client.SSHClient()
+    client.load_system_host_keys()
+    client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+    return client
 
 
 def open(params: ConnectionParameters) -> ParamikoProtocol:
@@ -0,0 +1,110 @@
+# Copyright (C) 2025-2026  CEA, EDF
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307 USA
+#
+# See http://www.salome-platform.org/ or email : webmaster.salome@opencascade.com
+#
+"""Pool of shared ssh connections.
+
+Jobs which use the same server can share a single authenticated connection
+instead of opening one connection each.
+"""
+
+from __future__ import annotations
+import dataclasses
+import threading
+from typing import Any
+
+from ..parameter import ConnectionParameters
+from .paramiko import ParamikoProtocol
+
+
+def pool_key(params: ConnectionParameters, options: dict[str, Any]) -> Any:
+    "Hashable key of the connection parameters and protocol options."
+    return (dataclasses.astuple(params), tuple(sorted(options.items())))
+
+
+class ProtocolPool:
+    """Shared ParamikoProtocol objects, by connection parameters.
+
+    The pool is thread-safe. Every protocol sends keepalive packets and
+    opens its connection again if it is lost.
+
+    :param connections_per_host: maximum number of connections for the same
+     parameters. The connections are given in turn.
+    :param keepalive: interval in seconds between the keepalive packets.
+    """
+
+    def __init__(self, connections_per_host: int = 1, keepalive: int = 30):
+        self.connections_per_host = connections_per_host
+        self.keepalive = keepalive
+        self._lock = threading.Lock()
+        self._protocols: dict[Any, list[ParamikoProtocol]] = {}
+        self._next: dict[Any, int] = {}
+
+    def get(
+        self, params: ConnectionParameters, **options: Any
+    ) -> ParamikoProtocol:
+        """Get a protocol connected to a server.
+
+        :param params: connection parameters.
+        :param options: other arguments of ParamikoProtocol.
+        """
+        options = {
+            "transfer_sessions": ParamikoProtocol.transfer_sessions,
+            "chunk_size": ParamikoProtocol.chunk_size,
+            "max_channels": ParamikoProtocol.max_channels,
+            "keepalive": self.keepalive,
+            **options,
+        }
+        key = pool_key(params, options)
+        with self._lock:
+            protocols = self._protocols.setdefault(key, [])
+            if len(protocols) < self.connections_per_host:
+                params = dataclasses.replace(params)  # private copy
+                protocols.append(ParamikoProtocol(params, **options))
+                return protocols[-1]
+            index = self._next.get(key, 0) % len(protocols)
+            self._next[key] = index + 1
+            return protocols[index]
+
+    def close(self) -> None:
+        "Close all the connections of the pool."
+        with self._lock:
+            protocols = [p for plist in self._protocols.values() for p in plist]
+            self._protocols.clear()
+            self._next.clear()
+        for protocol in protocols:
+            protocol.close()
+
+
+_default_pool: ProtocolPool | None = None
+_default_lock = threading.Lock()
+
+
+def default_pool() -> ProtocolPool:
+    "Pool used by create_job and by the unpickled protocols."
+    global _default_pool
+    with _default_lock:
+        if _default_pool is None:
+            _default_pool = ProtocolPool()
+        return _default_pool
+
+
+def pooled_protocol(
+    params: ConnectionParameters, options: dict[str, Any]
+) -> ParamikoProtocol:
+    "Get a protocol from the default pool."
+    return default_pool().get(params, **options)
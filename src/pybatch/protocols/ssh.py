@@ -17,82 +17,304 @@
 # See http://www.salome-platform.org/ or email : webmaster.salome@opencascade.com
 #
 from __future__ import annotations
-from collections.abc import Iterable
+from collections.abc import Callable, Iterable, Iterator
 from pathlib import Path
+import os
+import shutil
+import subprocess
+import tarfile
+import tempfile
+import typing
 from ..parameter import ConnectionParameters
-from ..tools import run_check, escape_str
+from ..tools import run_check, escape_str, popen_stream
+from ..tools import tar_option, write_archive, extract_archive, archive_paths
+from ..tools import read_in_thread, run_many, PipeProcess
+from ..generic_protocol import CommandResult
 from .. import PybatchException
 
 
 class SshProtocol:
-    """Communication protocol using the external commands ssh and scp."""
+    """Communication protocol using the external commands ssh and scp.
 
-    def __init__(self, params: ConnectionParameters):
+    By default, every operation opens a new ssh connection with a new
+    authentication. When control_master is True, all the ssh and scp commands
+    share a single connection managed by an OpenSSH ControlMaster. This
+    connection is opened by the first operation and it is closed by close(),
+    or after control_persist of inactivity.
+
+    :param params: connection parameters.
+    :param control_master: share a single connection between operations.
+    :param control_persist: inactivity time before the shared connection is
+     closed (see ControlPersist in ssh_config).
+    """
+
+    def __init__(
+        self,
+        params: ConnectionParameters,
+        control_master: bool = False,
+        control_persist: str = "10m",
+    ):
         self._host = params.host
         self._user = params.user
         self._password = params.password  # TODO not supported yet
         self._gss_auth = params.gss_auth
+        self._control_master = control_master
+        self._control_persist = control_persist
+        self._control_dir = ""
+
+    def __del__(self) -> None:
+        try:
+            self.close()
+        except Exception:
+            pass  # interpreter shutdown
+
+    def __getstate__(self) -> dict[str, typing.Any]:
+        # The shared connection belongs to this object, the copies open their
+        # own connection. Otherwise, a copy would close it.
+        state = self.__dict__.copy()
+        state["_control_dir"] = ""
+        return state
+
+    def __setstate__(self, state: dict[str, typing.Any]) -> None:
+        # also for the objects pickled with the directory of their connection.
+        self.__dict__.update(state)
+        self._control_dir = ""
+
+    def __enter__(self) -> SshProtocol:
+        return self
+
+    def __exit__(self, *args: typing.Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        "Close the shared connection, if any."
+        control_dir = getattr(self, "_control_dir", "")
+        if control_dir and os.path.isdir(control_dir):
+            command = ["ssh"] + self._options() + ["-O", "exit", self._host]
+            if self._user:
+                command += ["-l", self._user]
+            # no error when there is no master connection.
+            subprocess.run(command, capture_output=True)
+            shutil.rmtree(control_dir, ignore_errors=True)
+        self._control_dir = ""
+
+    def _options(self) -> list[str]:
+        "Options common to ssh and scp."
+        if not self._control_master:
+            return []
+        if not self._control_dir or not os.path.isdir(self._control_dir):
+            # The directory is private to the user. The name of the socket is
+            # a hash of the local host, remote host, port and user (%C).
+            self._control_dir = tempfile.mkdtemp(prefix="pybatch_ssh_")
+        control_path = os.path.join(self._control_dir, "%C")
+        return [
+            "-o",
+            "ControlMaster=auto",
+            "-o",
+            f"ControlPath={control_path}",
+            "-o",
+            f"ControlPersist={self._control_persist}",
+        ]
+
+    def _ssh_command(self, *options: str) -> list[str]:
+        "Beginning of a ssh command, before the remote command."
+        full_command = ["ssh"] + self._options() + list(options) + [self._host]
+        if self._user:
+            full_command += ["-l", self._user]
+        if self._gss_auth:
+            full_command.append("-K")
+        return full_command
+
+    def _remote_id(self) -> str:
+        remote_id = ""
+        if self._user:
+            remote_id += self._user + "@"
+        remote_id += self._host + ":"
+        return remote_id
 
     def upload(
         self, local_entries: Iterable[str | Path], remote_path: str
     ) -> None:
+        run_check(self._upload_command(local_entries, remote_path))
+
+    def _upload_command(
+        self, local_entries: Iterable[str | Path], remote_path: str
+    ) -> list[str]:
         # conversion Path to str for mypy
-        full_command = ["scp", "-r"] + list(str(x) for x in local_entries)
-        destination = ""
-        if self._user:
-            destination += self._user + "@"
-        destination += self._host + ":" + remote_path
+        full_command = ["scp"] + self._options() + ["-r"]
+        full_command += list(str(x) for x in local_entries)
+        destination = self._remote_id() + remote_path
         full_command.append(escape_str(destination))
-        run_check(full_command)
+        return full_command
 
     def download(
         self, remote_entries: Iterable[str], local_path: str | Path
     ) -> None:
-        command = ["scp", "-r"]
-        remote_id = ""
-        if self._user:
-            remote_id += self._user + "@"
-        remote_id += self._host + ":"
-        for entry in remote_entries:
-            full_command = command + [
-                escape_str(remote_id + entry),
-                str(local_path),
-            ]
+        for full_command in self._download_commands(remote_entries, local_path):
             run_check(full_command)
 
+    def _download_commands(
+        self, remote_entries: Iterable[str], local_path: str | Path
+    ) -> list[list[str]]:
+        command = ["scp"] + self._options() + ["-r"]
+        remote_id = self._remote_id()
+        return [
+            command + [escape_str(remote_id + entry), str(local_path)]
+            for entry in remote_entries
+        ]
+
+    def upload_archive(
+        self,
+        local_entries: Iterable[str | Path],
+        remote_path: str,
+        compression: str = "",
+    ) -> None:
+        script = (
+            f"tar -x{tar_option(compression)}f - -C {escape_str(remote_path)}"
+        )
+        full_command = self._remote_command(["sh", "-c", script])
+        proc = subprocess.Popen(
+            full_command,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+        )
+        assert proc.stdin is not None and proc.stderr is not None
+        errors = read_in_thread(proc.stderr)
+        try:
+            with proc.stdin:
+                write_archive(local_entries, proc.stdin, compression)
+        except BrokenPipeError:
+            pass  # tar stopped, the error is reported below
+        except BaseException:
+            proc.kill()
+            proc.wait()
+            raise
+        self._check_archive(proc, errors, full_command)
+
+    def download_archive(
+        self,
+        remote_entries: Iterable[str],
+        local_path: str | Path,
+        compression: str = "",
+        base: str = "",
+    ) -> None:
+        script = f"tar -c{tar_option(compression)}f - "
+        script += archive_paths(remote_entries, base)
+        full_command = self._remote_command(["sh", "-c", script])
+        proc = subprocess.Popen(
+            full_command, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+        )
+        assert proc.stdout is not None and proc.stderr is not None
+        errors = read_in_thread(proc.stderr)
+        try:
+            with proc.stdout:
+                extract_archive(proc.stdout, local_path, compression)
+        except tarfile.TarError:
+            proc.wait()
+            if proc.returncode == 0:
+                raise
+        except BaseException:
+            proc.kill()
+            proc.wait()
+            raise
+        self._check_archive(proc, errors, full_command)
+
+    def _check_archive(
+        self,
+        proc: subprocess.Popen[bytes],
+        errors: Callable[[], bytes],
+        command: list[str],
+    ) -> None:
+        ret_code = proc.wait()
+        if ret_code != 0:
+            message = f"""Error {ret_code}.
+  command: {command}.
+  stderr: {errors().decode(errors="replace")}
+"""
+            raise PybatchException(message)
+
     def create(self, remote_path: str, content: str) -> None:
-        full_command = ["ssh", "-T", self._host]
-        if self._user:
-            full_command += ["-l", self._user]
-        if self._gss_auth:
-            full_command.append("-K")
+        run_check(self._create_command(remote_path), input=content)
+
+    def _create_command(self, remote_path: str) -> list[str]:
+        full_command = self._ssh_command("-T")
         full_command.append(f"cat > '{remote_path}'")
-        run_check(full_command, input=content)
+        return full_command
 
     def read(self, remote_path: str) -> str:
-        full_command = ["ssh", self._host]
-        if self._user:
-            full_command += ["-l", self._user]
-        if self._gss_auth:
-            full_command.append("-K")
-        full_command.append(f"cat '{remote_path}'")
-        proc = run_check(full_command)
+        proc = run_check(self._read_command(remote_path))
         return proc.stdout
 
-    def run(self, command: list[str]) -> str:
+    def _read_command(self, remote_path: str) -> list[str]:
+        full_command = self._ssh_command()
+        full_command.append(f"cat '{remote_path}'")
+        return full_command
+
+    def _remote_command(self, command: list[str]) -> list[str]:
         if len(command) == 0:
             raise PybatchException("Empty command.")
-        full_command = ["ssh", self._host]
-        if self._user:
-            full_command += ["-l", self._user]
-        if self._gss_auth:
-            full_command.append("-K")
+        full_command = self._ssh_command()
         full_command.append(command[0])
         for arg in command[1:]:
             full_command.append(escape_str(arg))
-        proc = run_check(full_command)
+        return full_command
+
+    def _run_bytes(self, script: str) -> bytes:
+        "Run a sh script on the server and get its binary output."
+        full_command = self._remote_command(["sh", "-c", script])
+        proc = subprocess.run(full_command, capture_output=True)
+        if proc.returncode != 0:
+            message = f"""Error {proc.returncode}.
+  command: {full_command}.
+  stderr: {proc.stderr.decode(errors="replace")}
+"""
+            raise PybatchException(message)
         return proc.stdout
 
+    def read_range(
+        self, remote_path: str, offset: int, length: int | None = None
+    ) -> bytes:
+        # The redirection of exec fails if the file cannot be read, whereas
+        # the status of a pipe is the status of its last command.
+        script = f"exec < {escape_str(remote_path)} && tail -c +{offset + 1}"
+        if length is not None:
+            script += f" | head -c {length}"
+        return self._run_bytes(script)
+
+    def tail(
+        self,
+        remote_path: str,
+        n_bytes: int | None = None,
+        n_lines: int | None = None,
+    ) -> str:
+        # tail seeks to the end of its input, which is the file.
+        script = f"exec < {escape_str(remote_path)} && "
+        if n_bytes is None and n_lines is None:
+            script += "cat"
+        elif n_bytes is None:
+            script += f"tail -n {n_lines}"
+        else:
+            script += f"tail -c {n_bytes}"
+            if n_lines is not None:
+                script += f" | tail -n {n_lines}"
+        return self._run_bytes(script).decode(errors="replace")
+
+    def run(self, command: list[str]) -> str:
+        proc = run_check(self._remote_command(command))
+        return proc.stdout
+
+    def run_many(self, commands: list[list[str]]) -> list[CommandResult]:
+        return run_many(self, commands)
+
+    def start(self, command: list[str]) -> PipeProcess:
+        return PipeProcess(self._remote_command(command))
+
+    def run_stream(
+        self, command: list[str], max_bytes: int | None = None
+    ) -> Iterator[str]:
+        return popen_stream(self._remote_command(command), max_bytes)
+
 
 def open(params: ConnectionParameters) -> SshProtocol:
     return SshProtocol(params)
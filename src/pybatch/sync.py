@@ -0,0 +1,167 @@
+# Copyright (C) 2025-2026  CEA, EDF
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307 USA
+#
+# See http://www.salome-platform.org/ or email : webmaster.salome@opencascade.com
+#
+"""Incremental download of files and directories.
+
+A manifest of the remote entries, with the size, the modification time and
+optionally the hash of every file, is fetched by a single remote command. Only
+the files which differ from the local copy are downloaded.
+"""
+
+from __future__ import annotations
+from collections.abc import Callable, Iterable
+import json
+import os
+import pathlib
+
+from . import PybatchException
+from .generic_protocol import GenericProtocol
+from .tools import path_join, file_sha256
+
+# Remote script which prints the manifest of its arguments in json.
+# Directories have no size.
+MANIFEST_SCRIPT = """
+import hashlib, json, os, sys
+checksum = sys.argv[1] == "1"
+manifest = []
+def add_file(path, name):
+    st = os.stat(path)
+    digest = None
+    if checksum:
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+        digest = h.hexdigest()
+    manifest.append([name, st.st_size, st.st_mtime, digest])
+for entry in sys.argv[2:]:
+    entry = os.path.normpath(entry)
+    name = os.path.basename(entry)
+    if os.path.isdir(entry):
+        manifest.append([name, None, 0, None])
+        for root, dirs, files in os.walk(entry):
+            relative = os.path.relpath(root, entry).replace(os.sep, "/")
+            prefix = name if relative == "." else name + "/" + relative
+            for d in sorted(dirs):
+                manifest.append([prefix + "/" + d, None, 0, None])
+            for f in sorted(files):
+                add_file(os.path.join(root, f), prefix + "/" + f)
+    elif os.path.exists(entry):
+        add_file(entry, name)
+    else:
+        sys.stderr.write("No such file or directory: " + entry + "\\n")
+        sys.exit(1)
+print(json.dumps(manifest))
+"""
+
+
+def up_to_date(
+    local_file: pathlib.Path, size: int, mtime: float, digest: str | None
+) -> bool:
+    """Check if a local file is a copy of a remote file.
+
+    The hash is compared when it is known, the modification time otherwise.
+    """
+    try:
+        stat = local_file.stat()
+    except OSError:
+        return False
+    if stat.st_size != size:
+        return False
+    if digest is not None:
+        return file_sha256(local_file) == digest
+    return int(stat.st_mtime) == int(mtime)
+
+
+def download_incremental(
+    protocol: GenericProtocol,
+    remote_entries: Iterable[str],
+    local_path: str | pathlib.Path,
+    python_exe: str,
+    is_posix: bool = True,
+    checksum: bool = False,
+    download: Callable[[list[str], str], None] | None = None,
+    compression: str = "",
+) -> list[str]:
+    """Download the remote files which are missing or different locally.
+
+    Every entry is copied under its base name in local_path, as it would be
+    by 'scp -r'. The modification time of the downloaded files is set to the
+    remote one, which allows the comparison at the next call. From a Unix
+    like server, the changed files are transferred in a single tar stream for
+    every remote parent directory of the entries.
+    :param protocol: connection to the remote server.
+    :param remote_entries: remote files and directories.
+    :param local_path: local destination directory.
+    :param python_exe: python executable on the remote server.
+    :param is_posix: Unix like server (True) or Windows server (False).
+    :param checksum: compare the sha256 of the files instead of their
+     modification time.
+    :param download: function which downloads remote files in a local
+     directory, used for Windows servers. Default to protocol.download.
+    :param compression: compression of the tar stream, "" (no compression),
+     "gz" or "xz".
+    :return: downloaded files, relative to local_path.
+    """
+    if download is None:
+        download = protocol.download
+    remote_entries = list(remote_entries)
+    if not remote_entries:
+        return []
+    command = [python_exe, "-c", MANIFEST_SCRIPT, "1" if checksum else "0"]
+    output = protocol.run(command + remote_entries)
+    try:
+        manifest = json.loads(output)
+    except ValueError as e:
+        raise PybatchException(f"Invalid manifest: {output}") from e
+    # remote directory of every entry, by base name
+    parents = {}
+    path: pathlib.PurePath
+    for entry in remote_entries:
+        if is_posix:
+            path = pathlib.PurePosixPath(entry)
+        else:
+            path = pathlib.PureWindowsPath(entry)
+        parents[path.name] = str(path.parent)
+    # changed files, grouped by remote parent directory
+    to_download: dict[str, list[str]] = {}
+    mtimes = {}
+    for name, size, mtime, digest in manifest:
+        local_file = pathlib.Path(local_path, *name.split("/"))
+        if size is None:
+            local_file.mkdir(parents=True, exist_ok=True)
+        elif not up_to_date(local_file, size, mtime, digest):
+            parent = parents[name.split("/")[0]]
+            to_download.setdefault(parent, []).append(name)
+            mtimes[name] = mtime
+    for parent, names in to_download.items():
+        if is_posix:
+            protocol.download_archive(names, local_path, compression, parent)
+            continue
+        # one download for every local directory
+        by_directory: dict[str, list[str]] = {}
+        for name in names:
+            local_dir = str(pathlib.Path(local_path, *name.split("/")).parent)
+            remote_file = path_join(parent, name, is_posix=is_posix)
+            by_directory.setdefault(local_dir, []).append(remote_file)
+        for local_dir, remote_files in by_directory.items():
+            download(remote_files, local_dir)
+    for name, mtime in mtimes.items():
+        local_file = pathlib.Path(local_path, *name.split("/"))
+        os.utime(local_file, (mtime, mtime))
+    return list(mtimes)
@@ -17,11 +17,27 @@
 # See http://www.salome-platform.org/ or email : webmaster.salome@opencascade.com
 #
 from __future__ import annotations
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator
+import asyncio
+import base64
+import codecs
+import hashlib
+import io
+import math
+import os
 import pathlib
+import posixpath
+import re
 import subprocess
+import tarfile
+import threading
+import time
 import typing
+import uuid
 from . import PybatchException
-from .generic_protocol import GenericProtocol
+from .generic_protocol import GenericProtocol, CommandResult
+from .parameter import LaunchParameters
 
 
 def path_join(base: str, *paths: str, is_posix: bool) -> str:
@@ -94,6 +110,26 @@ def slurm_time_to_seconds(val: str) -> str:
     return str(result)
 
 
+def slurm_memory_to_megabytes(val: str) -> int:
+    """Convert a slurm memory size to megabytes.
+
+    See https://slurm.schedmd.com/sbatch.html#OPT_mem
+    The default unit is the megabyte. The suffixes K, M, G and T are accepted.
+    Return 0 for an empty string.
+    """
+    val = val.strip()
+    if not val:
+        return 0
+    factors = {"K": 1 / 1024, "M": 1, "G": 1024, "T": 1024 * 1024}
+    factor = factors.get(val[-1].upper())
+    number = val[:-1] if factor is not None else val
+    try:
+        result = float(number) * (factor or 1)
+    except ValueError as e:
+        raise PybatchException(f"Invalid memory format: {val}.") from e
+    return math.ceil(result)
+
+
 def run_check(
     command: list[str], **extra: typing.Any
 ) -> subprocess.CompletedProcess[str]:
@@ -108,13 +144,247 @@ def run_check(
     return proc
 
 
+async def async_run_check(command: list[str], input: str | None = None) -> str:
+    """Run a command in an asyncio subprocess and get its output.
+
+    The subprocess is killed if the coroutine is cancelled.
+    :param command: command to run.
+    :param input: text sent to the standard input of the command.
+    """
+    proc = await asyncio.create_subprocess_exec(
+        *command,
+        stdin=None if input is None else asyncio.subprocess.PIPE,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    try:
+        stdout, stderr = await proc.communicate(
+            None if input is None else input.encode()
+        )
+    except BaseException:
+        if proc.returncode is None:
+            proc.kill()
+        raise
+    if proc.returncode != 0:
+        message = f"""Error {proc.returncode}.
+  command: {command}.
+  stderr: {stderr.decode(errors="replace")}
+"""
+        raise PybatchException(message)
+    return stdout.decode()
+
+
+def stream_output(
+    stdout: typing.IO[bytes],
+    stderr: typing.IO[bytes],
+    wait: Callable[[], int],
+    kill: Callable[[], None],
+    context: str,
+    max_bytes: int | None = None,
+) -> Iterator[str]:
+    """Iterate over the lines of the standard output of a running command.
+
+    The standard error is read at the same time by a thread, which avoids dead
+    locks when the command writes a lot on it. Only the end of the standard
+    error is kept, for the error message.
+    :param stdout: standard output of the command.
+    :param stderr: standard error of the command.
+    :param wait: function which waits for the end of the command and returns
+     its exit code.
+    :param kill: function which stops the command.
+    :param context: description of the command for error messages.
+    :param max_bytes: maximum size of the standard output. The command is
+     stopped and PybatchException is raised when this limit is exceeded.
+    """
+    err_chunks: deque[bytes] = deque(maxlen=16)
+
+    def read_stderr() -> None:
+        for chunk in iter(lambda: stderr.read(4096), b""):
+            err_chunks.append(chunk)
+
+    err_thread = threading.Thread(target=read_stderr, daemon=True)
+    err_thread.start()
+    total = 0
+    try:
+        while True:
+            if max_bytes is None:
+                line = stdout.readline()
+            else:
+                # A line longer than the limit is not read beyond it. The
+                # byte after the limit reveals the excess.
+                line = stdout.readline(max_bytes - total + 1)
+            if not line:
+                break
+            total += len(line)
+            if max_bytes is not None and total > max_bytes:
+                message = f"Output limit of {max_bytes} bytes exceeded.\n"
+                raise PybatchException(message + context)
+            yield line.decode(errors="replace")
+    except BaseException:
+        # also when the iteration is stopped by the caller (GeneratorExit)
+        kill()
+        raise
+    err_thread.join()
+    ret_code = wait()
+    if ret_code != 0:
+        str_err = b"".join(err_chunks).decode(errors="replace")
+        message = f"""Error {ret_code}.
+{context}  stderr: {str_err}
+"""
+        raise PybatchException(message)
+
+
+def popen_stream(
+    command: list[str], max_bytes: int | None = None
+) -> Iterator[str]:
+    """Run a local command and iterate over the lines of its output.
+
+    See stream_output.
+    """
+    proc = subprocess.Popen(
+        command, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+    )
+    assert proc.stdout is not None and proc.stderr is not None
+
+    def kill() -> None:
+        proc.kill()
+        proc.wait()
+
+    context = f"  command: {command}.\n"
+    with proc.stdout, proc.stderr:
+        yield from stream_output(
+            proc.stdout, proc.stderr, proc.wait, kill, context, max_bytes
+        )
+
+
+def tail_file(
+    file: typing.IO[bytes],
+    n_bytes: int | None = None,
+    n_lines: int | None = None,
+    chunk_size: int = 65536,
+) -> bytes:
+    """Read the end of a seekable file.
+
+    The file is read backwards by chunks, until enough lines are found.
+    :param file: file opened in binary mode.
+    :param n_bytes: maximum number of bytes to read.
+    :param n_lines: maximum number of lines to read. A newline at the end of
+     the file does not count as the beginning of a new line.
+    :param chunk_size: size of the chunks read backwards.
+    """
+    size = file.seek(0, os.SEEK_END)
+    start = 0 if n_bytes is None else max(0, size - n_bytes)
+    if n_lines is None:
+        file.seek(start)
+        return file.read()
+    if n_lines <= 0:
+        return b""
+    # chunks from the end of the file, joined once.
+    chunks: list[bytes] = []
+    remaining = n_lines
+    position = size
+    while position > start:
+        step = min(chunk_size, position - start)
+        position -= step
+        file.seek(position)
+        chunk = file.read(step)
+        index = len(chunk)
+        if position + step == size and chunk.endswith(b"\n"):
+            index -= 1
+        while remaining:
+            index = chunk.rfind(b"\n", 0, index)
+            if index < 0:
+                break
+            remaining -= 1
+        if not remaining:
+            chunks.append(chunk[index + 1 :])
+            break
+        chunks.append(chunk)
+    return b"".join(reversed(chunks))
+
+
+def follow_file(
+    read_range: Callable[[int], bytes],
+    state: Callable[[], str],
+    interval: float = 1.0,
+    max_interval: float = 30.0,
+) -> Iterator[str]:
+    """Iterate over the lines of a growing file, like tail -f.
+
+    Only the bytes after the last read position are fetched at every tick.
+    The delay between two reads starts at interval and it is doubled, up to
+    max_interval, as long as the file does not change. The iteration stops
+    after a last read, once the job is over.
+    :param read_range: function which returns the content of the file from a
+     given offset.
+    :param state: function which returns the state of the job.
+    :param interval: minimal delay between two reads, in seconds.
+    :param max_interval: maximal delay between two reads, in seconds.
+    """
+    offset = 0
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    pending = ""
+    delay = interval
+    while True:
+        # The state is checked before reading in order to get the whole file
+        # at the end.
+        over = state() in ("CREATED", "FINISHED", "FAILED")
+        try:
+            data = read_range(offset)
+        except (OSError, PybatchException):
+            data = b""  # the file is not created yet
+        if data:
+            offset += len(data)
+            pending += decoder.decode(data)
+            *lines, pending = pending.split("\n")
+            for line in lines:
+                yield line + "\n"
+            delay = interval
+        else:
+            delay = min(delay * 2, max_interval)
+        if over:
+            pending += decoder.decode(b"", final=True)
+            if pending:
+                yield pending
+            return
+        time.sleep(delay)
+
+
+def follow_job_log(
+    protocol: GenericProtocol,
+    job_params: LaunchParameters,
+    name: str,
+    state: Callable[[], str],
+    interval: float = 1.0,
+    max_interval: float = 30.0,
+) -> Iterator[str]:
+    """Iterate over the lines of a log of a remote job, like tail -f.
+
+    See follow_file.
+    :param protocol: connection protocol to the server of the job.
+    :param job_params: parameters of the job.
+    :param name: name of the log in the directory logs of the job.
+    :param state: function which returns the state of the job.
+    """
+    log_file = path_join(
+        job_params.work_directory, "logs", name, is_posix=job_params.is_posix
+    )
+    return follow_file(
+        lambda offset: protocol.read_range(log_file, offset),
+        state,
+        interval,
+        max_interval,
+    )
+
+
 def escape_str(val: str) -> str:
     """Escape characters with special meaning in bash.
     a'b -> 'a'\''b'
     a b -> 'a b'
+    "" -> ''
     """
     special_chars = " ()[]{}*?$#'\\"
-    special_found = False
+    special_found = not val
     for c in special_chars:
         if c in val:
             special_found = True
@@ -126,6 +396,303 @@ def escape_str(val: str) -> str:
     return result
 
 
+def shell_command(command: list[str]) -> str:
+    "Command line for a posix shell."
+    if len(command) == 0:
+        raise PybatchException("Empty command.")
+    str_command = command[0]
+    for arg in command[1:]:
+        str_command += " " + escape_str(arg)
+    return str_command
+
+
+def heredoc(command: str, content: str, pipe_to: str = "") -> str:
+    """Shell code which gives content to the standard input of command.
+
+    cat > f.txt, hello -> cat > f.txt <<'PYBATCH_EOF_x'
+                          hello
+                          PYBATCH_EOF_x
+    :param command: command which reads the content.
+    :param content: text given to the command, without the end of line.
+    :param pipe_to: if not empty, command which reads the output of command.
+    """
+    delimiter = "PYBATCH_EOF_" + uuid.uuid4().hex
+    result = f"{command} <<'{delimiter}'"
+    if pipe_to:
+        result += " | " + pipe_to
+    return result + f"\n{content}\n{delimiter}\n"
+
+
+def entries_size(entries: Iterable[str | pathlib.Path]) -> int:
+    "Total size of files and directories."
+    result = 0
+    for entry in entries:
+        if os.path.isdir(entry):
+            for root, _, files in os.walk(entry):
+                for name in files:
+                    result += os.path.getsize(os.path.join(root, name))
+        else:
+            result += os.path.getsize(entry)
+    return result
+
+
+def file_sha256(path: str | pathlib.Path) -> str:
+    "sha256 of the content of a local file."
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def tar_option(compression: str) -> str:
+    "Option of the command tar for a compression of tarfile."
+    options = {"": "", "gz": "z", "xz": "J"}
+    if compression not in options:
+        raise PybatchException(f"Unknown compression: {compression}.")
+    return options[compression]
+
+
+def write_archive(
+    entries: Iterable[str | pathlib.Path],
+    fileobj: typing.IO[bytes],
+    compression: str = "",
+) -> None:
+    """Write a tar archive of files and directories in a stream.
+
+    Every entry is stored under its base name, as it would be copied by
+    'scp -r'.
+    :param entries: local files and directories.
+    :param fileobj: destination stream, which does not need to be seekable.
+    :param compression: "" (no compression), "gz" or "xz".
+    """
+    tar_option(compression)  # check
+    mode = "w|" + compression
+    with tarfile.open(fileobj=fileobj, mode=mode) as archive:  # type: ignore
+        for entry in entries:
+            if not os.path.exists(entry):
+                raise PybatchException(f"Path {entry} not found.")
+            name = os.path.basename(os.path.normpath(entry))
+            archive.add(entry, arcname=name)
+
+
+def extract_archive(
+    fileobj: typing.IO[bytes], path: str | pathlib.Path, compression: str = ""
+) -> None:
+    """Extract a tar archive read from a stream.
+
+    When the python version supports it, the members which would be written
+    outside of path are rejected.
+    :param fileobj: source stream, which does not need to be seekable.
+    :param path: destination directory.
+    :param compression: "" (no compression), "gz" or "xz".
+    """
+    tar_option(compression)  # check
+    mode = "r|" + compression
+    with tarfile.open(fileobj=fileobj, mode=mode) as archive:  # type: ignore
+        if hasattr(tarfile, "data_filter"):
+            archive.extractall(path, filter="data")
+        else:
+            archive.extractall(path)
+
+
+def make_archive(
+    entries: Iterable[str | pathlib.Path], compression: str = ""
+) -> bytes:
+    """Tar archive of files and directories.
+
+    See write_archive.
+    :param entries: local files and directories.
+    :param compression: "" (no compression), "gz" or "xz".
+    """
+    buffer = io.BytesIO()
+    write_archive(entries, buffer, compression)
+    return buffer.getvalue()
+
+
+def read_in_thread(stream: typing.IO[bytes]) -> Callable[[], bytes]:
+    """Read a stream until its end, in a thread.
+
+    Return a function which waits for the end of the reading and returns the
+    content of the stream.
+    """
+    content: list[bytes] = []
+    thread = threading.Thread(
+        target=lambda: content.append(stream.read()), daemon=True
+    )
+    thread.start()
+
+    def result() -> bytes:
+        thread.join()
+        return b"".join(content)
+
+    return result
+
+
+class PipeProcess:
+    """Local process with pipes to its standard streams.
+
+    :param command: command to start.
+    """
+
+    def __init__(self, command: list[str]):
+        self._command = command
+        self._closed = False
+        self._proc = subprocess.Popen(
+            command,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+        assert self._proc.stderr is not None
+        self._errors = read_in_thread(self._proc.stderr)
+
+    def write(self, data: bytes) -> None:
+        assert self._proc.stdin is not None
+        self._proc.stdin.write(data)
+        self._proc.stdin.flush()
+
+    def readline(self) -> bytes:
+        assert self._proc.stdout is not None
+        return self._proc.stdout.readline()
+
+    def close_input(self) -> None:
+        assert self._proc.stdin is not None
+        try:
+            self._proc.stdin.close()
+        except OSError:
+            pass  # the process is already finished
+
+    def close(self) -> str:
+        assert self._proc.stdout is not None
+        if self._closed:
+            return ""
+        self._closed = True
+        self.close_input()
+        try:
+            self._proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self._proc.kill()
+            self._proc.wait()
+        self._proc.stdout.close()
+        return self._errors().decode(errors="replace")
+
+
+def archive_paths(entries: Iterable[str], base: str = "") -> str:
+    """Arguments of the command tar which put every entry in an archive under
+    its base name, as it would be copied by 'scp -r'.
+
+    The arguments are meant to be interpreted by sh. Relative paths are
+    relative to the current directory of the shell.
+    :param entries: files and directories to archive.
+    :param base: when given, the entries are relative to this directory and
+     they keep their relative path in the archive.
+    """
+    if base:
+        names = [escape_str(posixpath.normpath(entry)) for entry in entries]
+        return " ".join([f"-C {escape_str(base)}"] + names)
+    arguments = []
+    for entry in entries:
+        path = posixpath.normpath(entry)
+        directory = escape_str(posixpath.dirname(path) or ".")
+        if not posixpath.isabs(path):
+            # every option -C is relative to the previous one
+            directory = '"$PWD"/' + directory
+        name = escape_str(posixpath.basename(path))
+        arguments.append(f"-C {directory} {name}")
+    return " ".join(arguments)
+
+
+def embedded_archive(
+    entries: Iterable[str | pathlib.Path], remote_path: str, max_size: int
+) -> str | None:
+    """Shell code which extracts files and directories in remote_path.
+
+    The files are embedded in the code as a compressed archive encoded in
+    base64. Return None if the encoded archive is bigger than max_size.
+    :param entries: local files and directories.
+    :param remote_path: destination directory on the remote server.
+    :param max_size: maximum size of the encoded archive in bytes.
+    """
+    entries = list(entries)
+    if entries_size(entries) > 4 * max_size:
+        # do not build big archives in memory.
+        return None
+    data = base64.encodebytes(make_archive(entries, "gz")).decode()
+    if len(data) > max_size:
+        return None
+    extract = shell_command(["tar", "-xzf", "-", "-C", remote_path])
+    return heredoc("base64 -d", data.rstrip("\n"), pipe_to=extract)
+
+
+def run_script(protocol: GenericProtocol, script: str) -> str:
+    """Run a posix shell script on a remote server in a single command.
+
+    The script is sent as a single line encoded in base64, which does not
+    depend on the login shell of the user on the server.
+    :param protocol: Connection protocol to the remote server.
+    :param script: content of the script.
+    :return: standard output of the script.
+    """
+    return protocol.run(script_command(script))
+
+
+def run_many_script(commands: list[list[str]], marker: str) -> str:
+    """Posix shell script which runs several commands and frames their
+    outputs.
+
+    The standard output of every command is followed by a line with the
+    marker, its standard error and a line with the marker and the return code.
+    :param commands: commands to run.
+    :param marker: line which cannot be found in the outputs.
+    """
+    script = "pybatch_err=$(mktemp) || exit 1\n"
+    for command in commands:
+        script += shell_command(command) + ' 2>"$pybatch_err" </dev/null\n'
+        script += "pybatch_rc=$?\n"
+        script += f"printf '\\n%s\\n' {marker}\n"
+        script += 'cat "$pybatch_err"\n'
+        script += f"printf '\\n%s %s\\n' {marker} \"$pybatch_rc\"\n"
+    script += 'rm -f "$pybatch_err"\n'
+    return script
+
+
+def parse_run_many(output: str, marker: str) -> list[CommandResult]:
+    "Results of the commands from the output of run_many_script."
+    parts = re.split(f"\n{marker}(?: (-?[0-9]+))?\n", output)
+    result = []
+    # parts: stdout, None, stderr, returncode, stdout, ..., ""
+    for i in range(0, len(parts) - 1, 4):
+        result.append(CommandResult(int(parts[i + 3]), parts[i], parts[i + 2]))
+    return result
+
+
+def run_many(
+    protocol: GenericProtocol, commands: list[list[str]]
+) -> list[CommandResult]:
+    """Run several commands on a remote server in a single remote call.
+
+    :param protocol: Connection protocol to the remote server.
+    :param commands: commands to run.
+    """
+    if not commands:
+        return []
+    marker = "PYBATCH_CMD_" + uuid.uuid4().hex
+    output = run_script(protocol, run_many_script(commands, marker))
+    result = parse_run_many(output, marker)
+    if len(result) != len(commands):
+        raise PybatchException(f"Unexpected output of run_many: {output}")
+    return result
+
+
+def script_command(script: str) -> list[str]:
+    """Command which runs a posix shell script, sent as a single line encoded
+    in base64.
+    """
+    data = base64.b64encode(script.encode()).decode()
+    return ["sh", "-c", f"echo {data} | base64 -d | sh"]
+
+
 def remote_mkdir(protocol: GenericProtocol, dir: str, python_exe: str) -> None:
     """Create a directory on a remote server.
 
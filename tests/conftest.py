@@ -16,6 +16,68 @@
 #
 # See http://www.salome-platform.org/ or email : webmaster.salome@opencascade.com
 #
+import os
+
+import pytest
+
+from pybatch.protocols.local import LocalProtocol
+
+
+@pytest.fixture(autouse=True)
+def isolated_home(request, tmp_path_factory, monkeypatch):
+    """Home directory of the tests, where the local nobatch jobs install
+    their manager instead of the real ~/.cache of the user.
+
+    The tests on remote servers keep the real home, which holds their ssh
+    configuration.
+    """
+    if "remote_args" in request.fixturenames:
+        return None
+    home = tmp_path_factory.getbasetemp() / "home"
+    home.mkdir(exist_ok=True)
+    monkeypatch.setenv("HOME", str(home))
+    return home
+
+
+class RecordingProtocol(LocalProtocol):
+    """Local protocol which records its remote operations.
+
+    operations are the names of the operations, commands the commands which
+    are run, uploaded the names of the files uploaded in directories and
+    downloaded the base names of the entries downloaded in archives.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.operations: list[str] = []
+        self.commands: list[list[str]] = []
+        self.uploaded: list[str] = []
+        self.downloaded: list[str] = []
+
+    def run(self, command: list[str]) -> str:
+        self.operations.append("run")
+        self.commands.append(command)
+        return super().run(command)
+
+    def upload(self, local_entries, remote_path):  # type: ignore
+        local_entries = list(local_entries)
+        self.operations.append("upload")
+        for entry in local_entries:
+            for root, dirs, files in os.walk(entry):
+                self.uploaded += files
+        return super().upload(local_entries, remote_path)
+
+    def download_archive(  # type: ignore
+        self, remote_entries, local_path, compression="", base=""
+    ):
+        remote_entries = list(remote_entries)
+        self.operations.append("download_archive")
+        self.downloaded += [os.path.basename(x) for x in remote_entries]
+        return super().download_archive(
+            remote_entries, local_path, compression, base
+        )
+
+
 def pytest_generate_tests(metafunc):
     if "job_plugin" in metafunc.fixturenames:
         metafunc.parametrize("job_plugin", ["local", "nobatch"])
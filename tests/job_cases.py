@@ -31,12 +31,15 @@ def test_hello(
     job_params.command = [job_params.python_exe, "hello.py", "world"]
     job = pybatch.create_job(plugin, job_params, protocol)
     job.submit()
+    lines = list(job.follow_stdout(interval=0.1, max_interval=1))
+    assert lines == ["Hello world !\n"]
     job.wait()
     state = job.state()
     assert state == "FINISHED"
     resultdir = tempfile.mkdtemp(suffix="_pybatchtest")
     job.get(["logs"], resultdir)
     assert "Hello world !" in job.stdout()
+    assert job.stdout(tail=1) == "Hello world !\n"
     shutil.rmtree(resultdir)
 
 
@@ -168,6 +171,12 @@ def test_array(
         r_file = Path(resultdir) / r_name
         assert r_file.read_text() == str(i)
     shutil.rmtree(resultdir)
+    # the outputs of all the tasks
+    output = job.stdout()
+    for i in range(job_params.total_jobs):
+        assert f"task {i}\n" in output
+    assert job.stdout(tail=1) in output
+    assert len(job.stdout(tail=3).splitlines()) == 3
 
 
 def test_array_ko(
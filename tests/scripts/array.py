@@ -2,7 +2,10 @@ import sys
 from pathlib import Path
 import time
 
-job_id = sys.argv[1]
-
-time.sleep(2)
-Path("result_" + job_id + ".txt").write_text(job_id)
+# This script is named as the module array of the standard library, which may
+# be imported from the work directory by the manager.
+if __name__ == "__main__":
+    job_id = sys.argv[1]
+    print("task", job_id)
+    time.sleep(2)
+    Path("result_" + job_id + ".txt").write_text(job_id)
@@ -0,0 +1,163 @@
+# Copyright (C) 2025-2026  CEA, EDF
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307 USA
+#
+# See http://www.salome-platform.org/ or email : webmaster.salome@opencascade.com
+#
+import asyncio
+import os
+import tempfile
+from pathlib import Path
+
+import pybatch
+from pybatch.protocols.async_executor import ExecutorProtocol
+from pybatch.protocols.async_local import AsyncLocalProtocol
+from pybatch.protocols.local import LocalProtocol
+from pybatch.plugins.slurm.async_job import Job
+
+from tests.test_slurm_submit import fake_sbatch
+
+
+class AsyncFakeSlurm:
+    """Asyncio protocol which answers squeue and sacct with fixed outputs.
+
+    The sacct output is given without the job id, which is the last argument
+    of the command.
+    """
+
+    def __init__(self, squeue: str, sacct: str):
+        self.squeue = squeue
+        self.sacct = sacct
+        self.commands: list[list[str]] = []
+
+    async def run(self, command: list[str]) -> str:
+        self.commands.append(command)
+        await asyncio.sleep(0)
+        if command[0] == "squeue":
+            return self.squeue
+        if command[0] == "sacct" and self.sacct:
+            return f"{command[-1]}|{self.sacct}"
+        raise pybatch.PybatchException(f"Unexpected command {command}")
+
+
+async def check_protocol(protocol: pybatch.AsyncGenericProtocol) -> None:
+    test_dir = Path(tempfile.mkdtemp(suffix="_pybatchtest"))
+    file = str(test_dir / "file.txt")
+    await protocol.create(file, "hello\n")
+    assert await protocol.read(file) == "hello\n"
+    os.mkdir(test_dir / "up")
+    await protocol.upload([file], str(test_dir / "up"))
+    assert (test_dir / "up" / "file.txt").read_text() == "hello\n"
+    output = await protocol.run(["cat", file])
+    assert output == "hello\n"
+    try:
+        await protocol.run(["cat", str(test_dir / "missing")])
+    except pybatch.PybatchException as e:
+        assert "missing" in str(e)
+    else:
+        assert 0  # Exception expected
+    # concurrent commands
+    outputs = await asyncio.gather(
+        *(protocol.run(["echo", str(i)]) for i in range(10))
+    )
+    assert outputs == [f"{i}\n" for i in range(10)]
+
+
+def test_async_local_protocol() -> None:
+    asyncio.run(check_protocol(AsyncLocalProtocol()))
+
+
+def test_executor_protocol() -> None:
+    asyncio.run(check_protocol(ExecutorProtocol(LocalProtocol())))
+
+
+def test_async_slurm_submit(monkeypatch) -> None:  # type: ignore
+    test_dir = tempfile.mkdtemp(suffix="_pybatchtest")
+    bin_dir = os.path.join(test_dir, "bin")
+    os.mkdir(bin_dir)
+    fake_sbatch(bin_dir)
+    monkeypatch.setenv("PATH", bin_dir + os.pathsep + os.environ["PATH"])
+    script = Path(__file__).parent / "scripts" / "hello.py"
+    work_dir = os.path.join(test_dir, "work")
+    params = pybatch.LaunchParameters(
+        ["python3", "hello.py"], work_dir, input_files=[script]
+    )
+    job = pybatch.create_async_job("slurm", params)
+    asyncio.run(job.submit())
+    assert job.jobid == "4242"  # type: ignore
+    work_path = Path(work_dir)
+    assert (work_path / "batch.cmd").read_text() == job.batch_file() + "\n"  # type: ignore
+    assert (work_path / "hello.py").read_text() == script.read_text()
+
+
+def test_async_slurm_wait() -> None:
+    protocol = AsyncFakeSlurm("RUNNING\n", "")
+    params = pybatch.LaunchParameters(["hello"], "/tmp")
+    jobs = [Job(params, protocol) for i in range(1000)]  # type: ignore
+    for i, job in enumerate(jobs):
+        job.jobid = str(i + 1)
+
+    async def monitor() -> list[str]:
+        assert await jobs[0].state() == "RUNNING"
+        try:
+            await jobs[0].wait(timeout=0.1, interval=0.02)
+        except pybatch.PybatchException as e:
+            assert "Timeout" in str(e)
+        else:
+            assert 0  # Exception expected
+        waits = asyncio.gather(*(job.wait(interval=0.05) for job in jobs))
+        await asyncio.sleep(0.1)
+        protocol.squeue = ""
+        protocol.sacct = "FAILED|3:0\n"
+        await waits
+        return [await job.state() for job in jobs]
+
+    assert asyncio.run(monitor()) == ["FAILED"] * 1000
+    assert asyncio.run(jobs[0].exit_code()) == 3
+    # the final state is kept
+    count = len(protocol.commands)
+    assert asyncio.run(jobs[1].state()) == "FAILED"
+    assert len(protocol.commands) == count
+
+
+def test_async_slurm_state() -> None:
+    "The states are resolved as for the blocking jobs."
+    protocol = AsyncFakeSlurm("RUNNING\n", "")
+    job = Job(pybatch.LaunchParameters(["hello"], "/tmp"), protocol)  # type: ignore
+    job.jobid = "101"
+    assert asyncio.run(job.state()) == "RUNNING"
+    assert [c[0] for c in protocol.commands] == ["squeue"]
+    protocol.squeue = "TIMEOUT\n"
+    protocol.sacct = "TIMEOUT|0:15\n"
+    assert asyncio.run(job.state()) == "FAILED"
+    assert asyncio.run(job.exit_code()) == 15
+    assert [c[0] for c in protocol.commands] == ["squeue", "squeue", "sacct"]
+
+
+def test_async_slurm_unsupported() -> None:
+    script = Path(__file__).parent / "scripts" / "hello.py"
+    params = pybatch.LaunchParameters(
+        ["python3", "hello.py"],
+        "/tmp",
+        input_files=[script],
+        archive_transfer=True,
+    )
+    job = Job(params, AsyncFakeSlurm("", ""))  # type: ignore
+    try:
+        asyncio.run(job.submit())
+    except pybatch.PybatchException as e:
+        assert "archive_transfer" in str(e.__cause__)
+    else:
+        assert 0  # Exception expected
@@ -0,0 +1,88 @@
+# Copyright (C) 2025-2026  CEA, EDF
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307 USA
+#
+# See http://www.salome-platform.org/ or email : webmaster.salome@opencascade.com
+#
+import os
+from pathlib import Path
+
+import pybatch
+import pybatch.plugins.slurm.job
+from pybatch.input_cache import copy_cached
+from tests.conftest import RecordingProtocol
+from tests.test_slurm_submit import fake_sbatch
+
+
+def test_input_cache(tmp_path, monkeypatch) -> None:  # type: ignore
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "local_cache"))
+    source = tmp_path / "source"
+    (source / "mesh").mkdir(parents=True)
+    (source / "mesh" / "a.med").write_text("mesh a")
+    (source / "mesh" / "b.med").write_text("mesh b")
+    (source / "case.txt").write_text("mesh a")  # same content as a.med
+    entries = [source / "mesh", str(source / "case.txt")]
+    cache_dir = str(tmp_path / "remote_cache")
+    protocol = RecordingProtocol()
+
+    work_dir = tmp_path / "work1"
+    copy_cached(protocol, entries, str(work_dir), cache_dir, "python3")
+    # 2 distinct contents and the manifest
+    assert len(protocol.uploaded) == 3
+    assert "manifest.json" in protocol.uploaded
+    assert (work_dir / "mesh" / "a.med").read_text() == "mesh a"
+    assert (work_dir / "mesh" / "b.med").read_text() == "mesh b"
+    assert (work_dir / "case.txt").read_text() == "mesh a"
+    a_stat = os.stat(work_dir / "mesh" / "a.med")
+    assert os.stat(work_dir / "case.txt").st_ino == a_stat.st_ino
+    assert len(os.listdir(cache_dir)) == 2
+    assert (tmp_path / "local_cache" / "pybatch").is_dir()
+
+    # Nothing but the manifest is uploaded again.
+    protocol.uploaded = []
+    work_dir = tmp_path / "work2"
+    copy_cached(protocol, entries, str(work_dir), cache_dir, "python3")
+    assert protocol.uploaded == ["manifest.json"]
+    assert os.stat(work_dir / "mesh" / "a.med").st_ino == a_stat.st_ino
+
+    # Only the modified file is uploaded.
+    protocol.uploaded = []
+    (source / "mesh" / "b.med").write_text("mesh b, version 2")
+    copy_cached(protocol, entries, str(work_dir), cache_dir, "python3")
+    assert len(protocol.uploaded) == 2
+    assert (work_dir / "mesh" / "b.med").read_text() == "mesh b, version 2"
+    assert len(os.listdir(cache_dir)) == 3
+
+
+def test_slurm_input_cache(tmp_path, monkeypatch) -> None:  # type: ignore
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "local_cache"))
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    fake_sbatch(str(bin_dir))
+    monkeypatch.setenv("PATH", str(bin_dir) + os.pathsep + os.environ["PATH"])
+    script = Path(os.path.dirname(__file__)) / "scripts" / "hello.py"
+    work_dir = tmp_path / "work dir"
+    params = pybatch.LaunchParameters(
+        ["python3", "hello.py", "world"],
+        str(work_dir),
+        input_files=[script],
+        input_cache=str(tmp_path / "remote_cache"),
+    )
+    protocol = RecordingProtocol()
+    job = pybatch.plugins.slurm.job.Job(params, protocol)
+    job.submit()
+    assert job.jobid == "4242"
+    assert protocol.operations == ["run", "upload", "run"]
+    assert (work_dir / "hello.py").read_text() == script.read_text()
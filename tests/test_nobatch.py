@@ -26,6 +26,7 @@ import inspect
 import subprocess
 import time
 import sys
+import pytest
 
 
 def test_hello():
@@ -409,3 +410,518 @@ def test_array_cancel():
 
     # clean
     shutil.rmtree(workdir)
+
+
+def test_serve():
+    import json
+
+    py_exe = sys.executable
+    workdir = tempfile.mkdtemp(suffix="_pybatchtest")
+    current_file_dir = os.path.dirname(__file__)
+    script = Path(current_file_dir) / "scripts" / "sleep.py"
+    shutil.copy(script, workdir)
+    manager_script = shutil.copy(inspect.getfile(manager), workdir)
+    proc = subprocess.Popen(
+        [py_exe, manager_script, "serve"],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+
+    def request(request_id, method, **params):
+        message = {"id": request_id, "method": method, "params": params}
+        proc.stdin.write(json.dumps(message) + "\n")
+        proc.stdin.flush()
+
+    def answer():
+        return json.loads(proc.stdout.readline())
+
+    request(1, "submit", work_dir=workdir, command=[py_exe, "sleep.py", "1"])
+    pid = answer()["result"]
+    assert pid > 0
+    request(2, "state", proc=pid, work_dir=workdir)
+    assert answer() == {"id": 2, "result": "RUNNING"}
+    # the answer to wait comes after the answers to the next requests
+    request(3, "wait", proc=pid)
+    request(4, "state", proc=pid, work_dir=workdir)
+    assert answer() == {"id": 4, "result": "RUNNING"}
+    assert answer() == {"id": 3, "result": True}
+    request(5, "state", proc=pid, work_dir=workdir)
+    assert answer() == {"id": 5, "result": "FINISHED"}
+    request(6, "unknown")
+    assert "Unknown method" in answer()["error"]
+    proc.stdin.close()
+    assert proc.wait() == 0
+    proc.stdout.close()
+    assert (Path(workdir) / "wakeup.txt").exists()
+
+    # clean
+    shutil.rmtree(workdir)
+
+
+def test_agent():
+    import threading
+    import pybatch
+    from pybatch.protocols.local import LocalProtocol
+    from pybatch.plugins.nobatch.agent import manager_agent
+
+    py_exe = sys.executable
+    workdir = tempfile.mkdtemp(suffix="_pybatchtest")
+    current_file_dir = os.path.dirname(__file__)
+    script = Path(current_file_dir) / "scripts" / "sleep.py"
+    shutil.copy(script, workdir)
+    manager_script = shutil.copy(inspect.getfile(manager), workdir)
+    protocol = LocalProtocol()
+    agent = manager_agent(protocol, py_exe, manager_script)
+    assert manager_agent(protocol, py_exe, "other path") is agent
+    command = [py_exe, "sleep.py", "1"]
+    pid = agent.call("submit", work_dir=workdir, command=command)
+    if os.path.exists(f"/proc/{pid}/cmdline"):
+        # the job is a new process, not a fork of the threaded manager
+        arguments = Path(f"/proc/{pid}/cmdline").read_bytes().split(b"\0")
+        assert arguments[2] == b"run"
+    states = []
+    waiting = threading.Thread(
+        target=agent.call, args=("wait",), kwargs={"proc": pid}
+    )
+    waiting.start()
+    for i in range(5):
+        states.append(agent.call("state", proc=pid, work_dir=workdir))
+    assert states == ["RUNNING"] * 5
+    waiting.join()
+    assert agent.call("state", proc=pid, work_dir=workdir) == "FINISHED"
+    try:
+        agent.call("cancel")  # missing parameter
+    except pybatch.PybatchException as e:
+        assert "proc" in str(e)
+    else:
+        assert 0  # Exception expected
+
+    # the manager is started again after its end
+    agent._session.process.close()
+    assert agent.call("state", proc=pid, work_dir=workdir) == "FINISHED"
+    agent.close()
+
+    # clean
+    shutil.rmtree(workdir)
+
+
+def test_agent_exit(tmp_path):
+    # the managers are stopped cleanly at the end of the interpreter
+    code = f"""import sys
+import pybatch
+from pybatch.protocols.local import LocalProtocol
+params = pybatch.LaunchParameters(
+    [sys.executable, "-c", "print(1)"],
+    {str(tmp_path / "work")!r},
+    python_exe=sys.executable,
+)
+job = pybatch.create_job("nobatch", params, LocalProtocol())
+job.submit()
+job.wait()
+print(job.state())
+"""
+    proc = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True
+    )
+    assert proc.returncode == 0, proc.stderr
+    assert proc.stdout == "FINISHED\n"
+
+
+def test_follow_array(tmp_path):
+    "The logs of the tasks of an array are followed in order."
+    import pybatch
+    from pybatch.protocols.local import LocalProtocol
+
+    work_dir = tmp_path / "work"
+    work_dir.mkdir()
+    shutil.copy(Path(__file__).parent / "scripts" / "array.py", work_dir)
+    params = pybatch.LaunchParameters(
+        [sys.executable, "array.py"],
+        str(work_dir),
+        python_exe=sys.executable,
+        total_jobs=3,
+        max_simul_jobs=2,
+    )
+    job = pybatch.create_job("nobatch", params, LocalProtocol())
+    job.submit()
+    lines = list(job.follow_stdout(interval=0.1, max_interval=1))
+    assert lines == ["task 0\n", "task 1\n", "task 2\n"]
+    assert job.state() == "FINISHED"
+
+
+def test_old_manager(monkeypatch, tmp_path):
+    import pickle
+    import pybatch
+    import pybatch.plugins.nobatch.job as nobatch_job
+    from pybatch.protocols.local import LocalProtocol
+    from pybatch.plugins.nobatch.monitor import JobMonitor
+
+    params = pybatch.LaunchParameters(
+        [sys.executable, "-c", "import time; time.sleep(1)"],
+        str(tmp_path / "work"),
+        python_exe=sys.executable,
+    )
+    job = pybatch.create_job("nobatch", params, LocalProtocol())
+    job.submit()
+    # job of an older version, with its manager in its work directory
+    shutil.copy(inspect.getfile(manager), tmp_path / "work")
+    job.remote_manager_path = str(tmp_path / "work" / "pybatch_manager.py")
+    job = pickle.loads(pickle.dumps(job))
+
+    def no_agent(*args):
+        raise AssertionError("no serve mode in the old managers")
+
+    monkeypatch.setattr(nobatch_job, "manager_agent", no_agent)
+    monitor = JobMonitor([job])
+    assert job.state() == "RUNNING"
+    job.wait()
+    monitor.refresh()
+    assert job.state() == "FINISHED"
+
+
+def test_manager_install(monkeypatch, tmp_path):
+    import pybatch
+    from pybatch.protocols.local import LocalProtocol
+    from pybatch.plugins.nobatch.job import prepare_command, manager_payload
+
+    monkeypatch.setenv("HOME", str(tmp_path / "home"))
+    protocol = LocalProtocol()
+    log_dir = tmp_path / "work" / "logs"
+    command = prepare_command(sys.executable, str(log_dir))
+    manager_path = Path(protocol.run(command).strip())
+    assert log_dir.is_dir()
+    digest, _ = manager_payload()
+    assert manager_path.parent.name == "manager-" + digest
+    assert (
+        manager_path.read_text() == Path(inspect.getfile(manager)).read_text()
+    )
+    # installed once
+    mtime = manager_path.stat().st_mtime_ns
+    command = prepare_command(sys.executable, str(tmp_path / "other"))
+    assert Path(protocol.run(command).strip()) == manager_path
+    assert manager_path.stat().st_mtime_ns == mtime
+
+    # the jobs use the installed manager
+    work_dir = tmp_path / "job"
+    params = pybatch.LaunchParameters(
+        [sys.executable, "-c", "print('hello')"],
+        str(work_dir),
+        python_exe=sys.executable,
+    )
+    job = pybatch.create_job("nobatch", params, protocol)
+    job.submit()
+    job.wait()
+    assert job.state() == "FINISHED"
+    assert job.remote_manager_path == str(manager_path)
+    assert not (work_dir / "pybatch_manager.py").exists()
+
+    # the details are logged in the work directories, not with the manager
+    assert "Launch command" in (work_dir / "pybatch.log").read_text()
+    other_dir = tmp_path / "job_cli"
+    params.work_directory = str(other_dir)
+    job = pybatch.create_job("nobatch", params, protocol)
+    job.use_agent = False
+    job.submit()
+    job.wait()
+    assert job.state() == "FINISHED"
+    assert "state jobid" in (other_dir / "pybatch.log").read_text()
+    assert not (manager_path.parent / "pybatch.log").exists()
+
+
+def test_manager_sent_once(tmp_path):
+    from pybatch.plugins.nobatch.job import prepare_job, manager_payload
+    from tests.conftest import RecordingProtocol
+
+    _, data = manager_payload()
+    protocol = RecordingProtocol()
+    manager_path = Path(prepare_job(protocol, sys.executable, str(tmp_path)))
+    for i in range(3):
+        path = prepare_job(protocol, sys.executable, str(tmp_path / str(i)))
+        assert path == str(manager_path)
+        assert (tmp_path / str(i)).is_dir()
+    sent = [command for command in protocol.commands if data in command]
+    assert len(sent) == 1
+    # the manager is sent again when it is no longer installed
+    manager_path.unlink()
+    assert prepare_job(protocol, sys.executable, str(tmp_path)) == str(
+        manager_path
+    )
+    assert manager_path.is_file()
+    assert data in protocol.commands[-1]
+
+
+def test_array_simul():
+    "Tasks of a job array running at the same time."
+    py_exe = sys.executable
+    workdir = tempfile.mkdtemp(suffix="_pybatchtest")
+    current_file_dir = os.path.dirname(__file__)
+    script = Path(current_file_dir) / "scripts" / "array.py"
+    shutil.copy(script, workdir)
+    manager_script = shutil.copy(inspect.getfile(manager), workdir)
+    args = [
+        py_exe,
+        manager_script,
+        "submit",
+        workdir,
+        "--total_jobs",
+        "6",
+        "--max_simul_jobs",
+        "3",
+        py_exe,
+        "array.py",
+    ]
+    proc = subprocess.run(args, capture_output=True, text=True)
+    assert proc.returncode == 0
+    pid = proc.stdout.strip()
+    args = [py_exe, manager_script, "wait", pid]
+    proc = subprocess.run(args, capture_output=True, text=True)
+    assert proc.returncode == 0
+    args = [py_exe, manager_script, "state", pid, workdir]
+    proc = subprocess.run(args, capture_output=True, text=True)
+    assert proc.stdout.strip() == "FINISHED"
+    mtimes = []
+    for idx in range(6):
+        result_file = Path(workdir) / f"result_{idx}.txt"
+        assert result_file.read_text() == str(idx)
+        mtimes.append(result_file.stat().st_mtime)
+    # 2 rounds of 3 tasks of 2 seconds, instead of 6 rounds
+    assert max(mtimes) - min(mtimes) < 4
+
+    # clean
+    shutil.rmtree(workdir)
+
+
+def test_array_simul_terminate():
+    "SIGTERM stops all the running tasks, the wall time applies to every task."
+    import signal
+
+    py_exe = sys.executable
+    workdir = tempfile.mkdtemp(suffix="_pybatchtest")
+    current_file_dir = os.path.dirname(__file__)
+    script = Path(current_file_dir) / "scripts" / "sleep.py"
+    shutil.copy(script, workdir)
+    manager_script = shutil.copy(inspect.getfile(manager), workdir)
+    # the tasks sleep 0, 1, 2 and 3 seconds (the index of the task).
+    args = [
+        py_exe,
+        manager_script,
+        "submit",
+        workdir,
+        "--wall_time",
+        "1",
+        "--total_jobs",
+        "4",
+        "--max_simul_jobs",
+        "4",
+        py_exe,
+        "sleep.py",
+    ]
+    proc = subprocess.run(args, capture_output=True, text=True)
+    pid = proc.stdout.strip()
+    args = [py_exe, manager_script, "wait", pid]
+    proc = subprocess.run(args, capture_output=True, text=True)
+    assert proc.returncode == 0
+    exit_code = (Path(workdir) / "logs" / "exit_code.log").read_text()
+    assert int(exit_code) != 0
+
+    # SIGTERM
+    (Path(workdir) / "wakeup.txt").unlink()
+    args = [
+        py_exe,
+        manager_script,
+        "submit",
+        workdir,
+        "--total_jobs",
+        "3",
+        "--max_simul_jobs",
+        "3",
+        py_exe,
+        "sleep.py",
+        "3",
+    ]
+    proc = subprocess.run(args, capture_output=True, text=True)
+    pid = proc.stdout.strip()
+    time.sleep(1)
+    os.kill(int(pid), signal.SIGTERM)
+    args = [py_exe, manager_script, "wait", pid]
+    proc = subprocess.run(args, capture_output=True, text=True)
+    args = [py_exe, manager_script, "state", pid, workdir]
+    proc = subprocess.run(args, capture_output=True, text=True)
+    assert proc.stdout.strip() == "FAILED"
+    time.sleep(3)
+    assert not (Path(workdir) / "wakeup.txt").exists()
+
+    # clean
+    shutil.rmtree(workdir)
+
+
+def test_array_task_logs(tmp_path):
+    import pybatch
+    from pybatch.protocols.local import LocalProtocol
+
+    code = """import sys
+print("out", sys.argv[1])
+print("err", sys.argv[1], file=sys.stderr)
+sys.exit(int(sys.argv[1]) % 2 * 3)
+"""
+    params = pybatch.LaunchParameters(
+        [sys.executable, "-c", code],
+        str(tmp_path / "work"),
+        python_exe=sys.executable,
+        total_jobs=4,
+        max_simul_jobs=2,
+    )
+    job = pybatch.create_job("nobatch", params, LocalProtocol())
+    job.submit()
+    job.wait()
+    assert job.state() == "FAILED"
+    assert [job.task_exit_code(i) for i in range(4)] == [0, 3, 0, 3]
+    assert job.task_exit_code(4) is None
+    assert job.task_stdout(2) == "out 2\n"
+    assert job.task_stderr(3, tail=1) == "err 3\n"
+    # logs of all the tasks
+    assert job.stdout() == "out 0\nout 1\nout 2\nout 3\n"
+    assert job.stderr(tail=2) == "err 2\nerr 3\n"
+    # records of the exit codes of the tasks which are not finished
+    logs = tmp_path / "work" / "logs"
+    with open(logs / "exit_codes.log", "r+b") as exit_codes_file:
+        manager.write_task_exit_code(exit_codes_file, 2, -15)
+        exit_codes_file.seek(3 * manager.EXIT_CODE_WIDTH)
+        exit_codes_file.write(b" " * manager.EXIT_CODE_WIDTH)
+    assert [job.task_exit_code(i) for i in range(4)] == [0, 3, -15, None]
+
+
+def test_wait_timeout(tmp_path):
+    import pybatch
+    from pybatch.protocols.local import LocalProtocol
+
+    py_exe = sys.executable
+    manager_script = shutil.copy(inspect.getfile(manager), tmp_path)
+    sleeper = subprocess.Popen([py_exe, "-c", "import time; time.sleep(2)"])
+    assert not manager.wait(sleeper.pid, 0.1)
+    args = [py_exe, manager_script, "wait", str(sleeper.pid)]
+    proc = subprocess.run(
+        args + ["--timeout", "0.1"], capture_output=True, text=True
+    )
+    assert proc.returncode == 0
+    assert proc.stdout.strip() == "TIMEOUT"
+    sleeper.wait()
+    proc = subprocess.run(
+        args + ["--timeout", "1"], capture_output=True, text=True
+    )
+    assert proc.returncode == 0
+    assert proc.stdout.strip() == ""
+
+    for use_agent in (True, False):
+        params = pybatch.LaunchParameters(
+            [py_exe, "-c", "import time; time.sleep(2)"],
+            str(tmp_path / f"work_{use_agent}"),
+            python_exe=py_exe,
+        )
+        job = pybatch.create_job("nobatch", params, LocalProtocol())
+        job.use_agent = use_agent
+        job.submit()
+        with pytest.raises(pybatch.PybatchException):
+            job.wait(timeout=0.2)
+        job.wait(timeout=30)
+        assert job.state() == "FINISHED"
+
+
+def test_queue_admit(tmp_path):
+    queue = str(tmp_path / "queue.sqlite")
+    connection = manager.queue_open(queue)
+    sleeper = subprocess.Popen(
+        [sys.executable, "-c", "import time; time.sleep(30)"]
+    )
+    dead = subprocess.Popen([sys.executable, "-c", "pass"])
+    dead.wait()
+    me = os.getpid()
+    try:
+        rows = [
+            (sleeper.pid, 3, 1000, 1, 1.0),  # running
+            (dead.pid, 4, 0, 1, 2.0),  # over
+            (me, 1, 500, 0, 3.0),
+        ]
+        connection.executemany("INSERT INTO jobs VALUES (?, ?, ?, ?, ?)", rows)
+        # 1 cpu free
+        assert not manager.queue_admit(connection, me, 1, 500, 4, 1200)
+        assert manager.queue_admit(connection, me, 1, 200, 4, 1200)
+        pids = connection.execute("SELECT pid FROM jobs").fetchall()
+        assert sorted(pids) == sorted([(sleeper.pid,), (me,)])
+        # a job bigger than the host waits until it is alone
+        connection.execute("UPDATE jobs SET running = 0 WHERE pid = ?", (me,))
+        assert not manager.queue_admit(connection, me, 8, 0, 4, 0)
+        sleeper.kill()
+        sleeper.wait()
+        assert manager.queue_admit(connection, me, 8, 0, 4, 0)
+    finally:
+        sleeper.kill()
+        sleeper.wait()
+        connection.close()
+
+
+def test_queue(tmp_path):
+    import pybatch
+    from pybatch.protocols.local import LocalProtocol
+
+    code = """import time
+with open("start.txt", "w") as f:
+    f.write(repr(time.time()))
+time.sleep(1)
+"""
+    host_cpus, _ = manager.host_resources()
+    jobs = []
+    for i in range(4):
+        params = pybatch.LaunchParameters(
+            [sys.executable, "-c", code],
+            str(tmp_path / f"work_{i}"),
+            python_exe=sys.executable,
+            ntasks=host_cpus,  # every job needs the whole host
+            queue=str(tmp_path / "queue.sqlite"),
+        )
+        job = pybatch.create_job("nobatch", params, LocalProtocol())
+        job.use_agent = i % 2 == 0
+        job.submit()
+        jobs.append(job)
+    assert [job.state() for job in jobs[1:]] == ["QUEUED"] * 3
+    jobs[3].cancel()
+    for job in jobs[:3]:
+        job.wait()
+    assert [job.state() for job in jobs] == ["FINISHED"] * 3 + ["FAILED"]
+    starts = [
+        float((tmp_path / f"work_{i}" / "start.txt").read_text())
+        for i in range(3)
+    ]
+    # one job at a time, in the order of submission
+    assert starts[1] - starts[0] >= 0.9
+    assert starts[2] - starts[1] >= 0.9
+    assert not (tmp_path / "work_3" / "start.txt").exists()
+    connection = manager.queue_open(str(tmp_path / "queue.sqlite"))
+    assert connection.execute("SELECT pid FROM jobs").fetchall() == []
+    connection.close()
+
+
+def test_queue_params():
+    import pybatch
+    from pybatch.protocols.local import LocalProtocol
+
+    params = pybatch.LaunchParameters(
+        [sys.executable, "array.py"],
+        "work",
+        ntasks=2,
+        total_jobs=10,
+        max_simul_jobs=3,
+        mem_per_node="1G",
+        queue="queue.sqlite",
+    )
+    job = pybatch.create_job("nobatch", params, LocalProtocol())
+    # the resources of the tasks running at the same time
+    assert job._queue_params() == {
+        "queue": "queue.sqlite",
+        "cpus": 6,
+        "mem": 3 * 1024,
+    }
+    params.mem_per_node = ""
+    params.mem_per_cpu = "100M"
+    assert job._queue_params()["mem"] == 600
@@ -0,0 +1,115 @@
+# Copyright (C) 2025-2026  CEA, EDF
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307 USA
+#
+# See http://www.salome-platform.org/ or email : webmaster.salome@opencascade.com
+#
+import inspect
+import json
+import pickle
+import shutil
+import subprocess
+import sys
+
+import pybatch
+import pybatch.plugins.nobatch.pybatch_manager as manager
+from pybatch.plugins.nobatch.monitor import JobMonitor
+from tests.conftest import RecordingProtocol
+
+
+def ended_process() -> int:
+    "Process id of a process which is over."
+    proc = subprocess.Popen([sys.executable, "-c", "pass"])
+    proc.wait()
+    return proc.pid
+
+
+def test_state_many(tmp_path):
+    sleeper = subprocess.Popen(
+        [sys.executable, "-c", "import time; time.sleep(30)"]
+    )
+    finished = tmp_path / "finished"
+    failed = tmp_path / "failed"
+    for workdir, code in ((finished, "0"), (failed, "3")):
+        (workdir / "logs").mkdir(parents=True)
+        (workdir / "logs" / "exit_code.log").write_text(code)
+    finished_pid = ended_process()
+    failed_pid = ended_process()
+    jobs = [
+        (sleeper.pid, str(finished)),
+        (finished_pid, str(finished)),
+        (failed_pid, str(failed)),
+    ]
+    expected = {
+        str(sleeper.pid): {"state": "RUNNING", "exit_code": None},
+        str(finished_pid): {"state": "FINISHED", "exit_code": 0},
+        str(failed_pid): {"state": "FAILED", "exit_code": 3},
+    }
+    try:
+        assert manager.state_many(jobs) == expected
+        manager_script = shutil.copy(inspect.getfile(manager), tmp_path)
+        args = [sys.executable, manager_script, "state-many"]
+        pairs = [str(field) for job in jobs for field in job]
+        proc = subprocess.run(args + pairs, capture_output=True, text=True)
+        assert proc.returncode == 0
+        assert json.loads(proc.stdout) == expected
+        # the same pairs read on stdin
+        lines = "".join(f"{pid} {workdir}\n" for pid, workdir in jobs)
+        proc = subprocess.run(args, input=lines, capture_output=True, text=True)
+        assert proc.returncode == 0
+        assert json.loads(proc.stdout) == expected
+    finally:
+        sleeper.kill()
+        sleeper.wait()
+
+
+def test_monitor(tmp_path):
+    code = "import sys, time; time.sleep(float(sys.argv[1])); sys.exit(2)"
+    protocol = RecordingProtocol()
+    for use_agent in (True, False):
+        jobs = []
+        for delay in ("0", "0", "30"):
+            params = pybatch.LaunchParameters(
+                [sys.executable, "-c", code, delay],
+                str(tmp_path / f"work_{use_agent}_{len(jobs)}"),
+                python_exe=sys.executable,
+            )
+            job = pybatch.create_job("nobatch", params, protocol)
+            job.use_agent = use_agent
+            job.submit()
+            jobs.append(job)
+        jobs[0].wait()
+        jobs[1].wait()
+        not_submitted = pybatch.create_job("nobatch", params, protocol)
+        monitor = JobMonitor(jobs + [not_submitted], max_age=60)
+        protocol.commands.clear()
+        assert [job.state() for job in jobs] == ["FAILED", "FAILED", "RUNNING"]
+        assert not_submitted.state() == "CREATED"
+        # exit codes kept from the bulk query
+        assert jobs[0].exit_code() == 2
+        assert jobs[1].exit_code() == 2
+        if use_agent:
+            assert protocol.commands == []
+        else:
+            assert len(protocol.commands) == 1
+            assert protocol.commands[0][2] == "state-many"
+
+        # the monitor is not serialized with the job
+        new_job = pickle.loads(pickle.dumps(jobs[2]))
+        assert new_job.monitor is None
+        assert jobs[2].monitor is monitor
+        monitor.remove(jobs[2])
+        assert jobs[2].monitor is None
+        jobs[2].cancel()
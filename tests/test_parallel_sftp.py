@@ -0,0 +1,152 @@
+# Copyright (C) 2025-2026  CEA, EDF
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307 USA
+#
+# See http://www.salome-platform.org/ or email : webmaster.salome@opencascade.com
+#
+import io
+import os
+import shutil
+import stat
+import threading
+
+import pytest
+
+from pybatch import PybatchException
+
+paramiko = pytest.importorskip("paramiko")
+ParallelSftp = pytest.importorskip(
+    "pybatch.protocols.parallel_sftp"
+).ParallelSftp
+
+
+class LocalFile(io.FileIO):
+    "Local file with the extra methods of paramiko.SFTPFile."
+
+    def set_pipelined(self, pipelined: bool = True) -> None:
+        pass
+
+    def readv(self, chunks):  # type: ignore
+        for offset, length in chunks:
+            self.seek(offset)
+            yield self.read(length)
+
+
+class LocalSftp:
+    "Stand-in for paramiko.SFTPClient working on the local file system."
+
+    def __init__(self, threads: set[str]) -> None:
+        self.threads = threads
+
+    def stat(self, path):  # type: ignore
+        return paramiko.SFTPAttributes.from_stat(os.stat(path))
+
+    def mkdir(self, path):  # type: ignore
+        os.mkdir(path)
+
+    def listdir_attr(self, path):  # type: ignore
+        return [
+            paramiko.SFTPAttributes.from_stat(
+                os.stat(os.path.join(path, name)), name
+            )
+            for name in os.listdir(path)
+        ]
+
+    def put(self, local_path, remote_path):  # type: ignore
+        self.threads.add(threading.current_thread().name)
+        shutil.copyfile(local_path, remote_path)
+
+    def get(self, remote_path, local_path):  # type: ignore
+        self.threads.add(threading.current_thread().name)
+        shutil.copyfile(remote_path, local_path)
+
+    def chmod(self, path, mode):  # type: ignore
+        os.chmod(path, mode)
+
+    def open(self, path, mode):  # type: ignore
+        self.threads.add(threading.current_thread().name)
+        return LocalFile(path, mode)
+
+    def close(self) -> None:
+        pass
+
+
+def test_parallel_sftp(tmp_path) -> None:  # type: ignore
+    threads: set[str] = set()
+    sessions = []
+
+    def open_sftp():  # type: ignore
+        sessions.append(LocalSftp(threads))
+        return sessions[-1]
+
+    source = tmp_path / "source"
+    (source / "sub").mkdir(parents=True)
+    for i in range(20):
+        (source / "sub" / f"f{i}").write_text(str(i) * 100)
+    big = os.urandom(1000)
+    (source / "big").write_bytes(big)
+    (source / "tiny").write_text("tiny")
+    transfer = ParallelSftp(open_sftp, max_sessions=3, chunk_size=64)
+    sftp = LocalSftp(threads)
+    remote = tmp_path / "remote"
+    remote.mkdir()
+    transfer.upload(sftp, [(str(source), str(remote / "source"))])
+    assert (remote / "source" / "big").read_bytes() == big
+    assert (remote / "source" / "sub" / "f19").read_text() == "19" * 100
+    assert len(sessions) == 2
+
+    local = tmp_path / "local"
+    local.mkdir()
+    transfer.download(sftp, [(str(remote / "source"), str(local / "copy"))])
+    assert (local / "copy" / "big").read_bytes() == big
+    assert len(os.listdir(local / "copy" / "sub")) == 20
+    assert len(sessions) == 4
+
+    # no additional session available
+    transfer = ParallelSftp(lambda: None, max_sessions=3, chunk_size=64)
+    transfer.download(sftp, [(str(remote / "source"), str(local / "copy2"))])
+    assert (local / "copy2" / "big").read_bytes() == big
+
+    # a single file is transferred in the current thread
+    threads.clear()
+    transfer.download(
+        sftp, [(str(remote / "source" / "tiny"), str(local / "tiny"))]
+    )
+    assert threads == {threading.current_thread().name}
+    assert (local / "tiny").read_text() == "tiny"
+
+    with pytest.raises(PybatchException, match="nofile"):
+        transfer.download(sftp, [(str(remote / "nofile"), str(local))])
+
+
+def test_parallel_sftp_mode(tmp_path) -> None:  # type: ignore
+    threads: set[str] = set()
+    transfer = ParallelSftp(
+        lambda: LocalSftp(threads), max_sessions=3, chunk_size=64
+    )
+    sftp = LocalSftp(threads)
+    source = tmp_path / "source"
+    source.mkdir()
+    (source / "script.sh").write_text("#!/bin/sh\necho hello\n")
+    (source / "big.sh").write_text("#" * 1000)
+    for name in ("script.sh", "big.sh"):
+        (source / name).chmod(0o750)
+    remote = tmp_path / "remote"
+    transfer.upload(sftp, [(str(source), str(remote))])
+    local = tmp_path / "local"
+    transfer.download(sftp, [(str(remote), str(local))])
+    for name in ("script.sh", "big.sh"):
+        assert stat.S_IMODE(os.stat(remote / name).st_mode) == 0o750
+        assert stat.S_IMODE(os.stat(local / name).st_mode) == 0o750
@@ -0,0 +1,130 @@
+# Copyright (C) 2025-2026  CEA, EDF
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307 USA
+#
+# See http://www.salome-platform.org/ or email : webmaster.salome@opencascade.com
+#
+import io
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import pybatch
+
+paramiko_protocol = pytest.importorskip("pybatch.protocols.paramiko")
+
+
+class FakeTransport:
+    "Transport which counts the channels open at the same time."
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.open_channels = 0
+        self.max_open_channels = 0
+
+    def is_active(self) -> bool:
+        return True
+
+    def open_session(self) -> "FakeChannel":
+        return FakeChannel(self)
+
+
+class FakeChannel:
+    def __init__(self, transport: FakeTransport) -> None:
+        self.transport = transport
+        self.closed = False
+        self.command = ""
+        with transport.lock:
+            transport.open_channels += 1
+            transport.max_open_channels = max(
+                transport.max_open_channels, transport.open_channels
+            )
+
+    def close(self) -> None:
+        if not self.closed:
+            self.closed = True
+            with self.transport.lock:
+                self.transport.open_channels -= 1
+
+    def exec_command(self, command: str) -> None:
+        self.command = command
+
+    def shutdown_write(self) -> None:
+        pass
+
+    def makefile(self, mode: str) -> io.BytesIO:
+        time.sleep(0.01)
+        return io.BytesIO(self.command.encode() + b"\n")
+
+    def makefile_stderr(self, mode: str) -> io.BytesIO:
+        return io.BytesIO()
+
+    def recv_exit_status(self) -> int:
+        return 0
+
+
+class FakeSftp:
+    def __init__(self, channel: FakeChannel) -> None:
+        self.channel = channel
+
+    def get_channel(self) -> FakeChannel:
+        return self.channel
+
+    def close(self) -> None:
+        self.channel.close()
+
+    def open(self, path: str, mode: str) -> io.BytesIO:
+        time.sleep(0.01)
+        return io.BytesIO(path.encode())
+
+
+class FakeClient:
+    def __init__(self, transport: FakeTransport) -> None:
+        self.transport = transport
+
+    def get_transport(self) -> FakeTransport:
+        return self.transport
+
+    def open_sftp(self) -> FakeSftp:
+        return FakeSftp(self.transport.open_session())
+
+    def close(self) -> None:
+        pass
+
+
+def test_concurrent_channels(monkeypatch) -> None:  # type: ignore
+    transport = FakeTransport()
+    monkeypatch.setattr(
+        paramiko_protocol, "new_client", lambda: FakeClient(transport)
+    )
+    params = pybatch.ConnectionParameters(host="cluster")
+    protocol = paramiko_protocol.ParamikoProtocol(params, max_channels=3)
+
+    def operation(i: int) -> str:
+        if i % 2:
+            return protocol.run(["echo", str(i)])
+        return protocol.read(f"file{i}")
+
+    with ThreadPoolExecutor(10) as executor:
+        results = list(executor.map(operation, range(40)))
+    for i, result in enumerate(results):
+        assert result == (f"echo {i}\n" if i % 2 else f"file{i}")
+    assert transport.max_open_channels <= 3
+    # idle SFTP sessions are kept open, the command channels are closed
+    assert transport.open_channels == len(protocol._idle_sftp)
+    protocol.close()
+    assert transport.open_channels == 0
@@ -110,3 +110,53 @@ def test_protocol_local() -> None:
         assert 0
 
     shutil.rmtree(test_dir)
+
+
+def test_protocol_local_run_stream() -> None:
+    py_exe = sys.executable
+    p = pybatch.protocols.local.LocalProtocol()
+    # A lot of stderr must not block the command.
+    script = """
+import sys
+sys.stderr.write("e" * 1000000)
+for i in range(3):
+    print("line", i)
+"""
+    lines = list(p.run_stream([py_exe, "-c", script]))
+    assert lines == ["line 0\n", "line 1\n", "line 2\n"]
+
+    # Output limit
+    script = "for i in range(100000): print('x' * 80)"
+    try:
+        for line in p.run_stream([py_exe, "-c", script], max_bytes=10000):
+            pass
+    except pybatch.PybatchException as e:
+        assert "10000 bytes" in str(e)
+    else:
+        assert 0
+
+    # The error is raised at the end of the output.
+    script = "import sys; print('partial'); sys.exit('failure')"
+    lines = []
+    try:
+        for line in p.run_stream([py_exe, "-c", script]):
+            lines.append(line)
+    except pybatch.PybatchException as e:
+        assert "Error 1" in str(e)
+        assert "failure" in str(e)
+    else:
+        assert 0
+    assert lines == ["partial\n"]
+
+
+def test_protocol_local_read_range() -> None:
+    test_dir = tempfile.mkdtemp(suffix="_pybatchtest")
+    file_path = os.path.join(test_dir, "log.txt")
+    p = pybatch.protocols.local.LocalProtocol()
+    p.create(file_path, "".join(f"line {i}\n" for i in range(100)))
+    assert p.read_range(file_path, 0, 4) == b"line"
+    assert p.read_range(file_path, 5, 3) == b"0\nl"
+    assert p.read_range(file_path, 70 + 89 * 8) == b"line 99\n"
+    assert p.tail(file_path, n_lines=2) == "line 98\nline 99\n"
+    assert p.tail(file_path, n_bytes=3) == "99\n"
+    shutil.rmtree(test_dir)
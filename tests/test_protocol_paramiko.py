@@ -27,12 +27,13 @@ def test_protocol_paramiko(remote_args: dict[str, typing.Any]) -> None:
     import pybatch
     import pybatch.protocols.paramiko
     from pybatch.tools import path_join
-    import scp
 
-    # Test connection to a host that does not exist
+    # Test connection to a host that does not exist. The connection is opened
+    # by the first operation.
     connect_param = pybatch.ConnectionParameters(host="noname_zozo")
+    p = pybatch.protocols.paramiko.ParamikoProtocol(connect_param)
     try:
-        p = pybatch.protocols.paramiko.ParamikoProtocol(connect_param)
+        p.run(["hostname"])
     except pybatch.PybatchException as e:
         assert str(e) == "Failed to open ssh connection to noname_zozo."
     else:
@@ -65,7 +66,7 @@ def test_protocol_paramiko(remote_args: dict[str, typing.Any]) -> None:
     # Test download a remote path that does not exist.
     try:
         p.download([remote_test_file], local_test_file)
-    except scp.SCPException as e:
+    except pybatch.PybatchException as e:
         # The remote path should be included in the error message
         # but the full message may depend on the language.
         assert remote_test_file in str(e)
@@ -110,7 +111,7 @@ def test_protocol_paramiko(remote_args: dict[str, typing.Any]) -> None:
     # upload file to an inaccessible place
     try:
         p.upload([local_test_file], "/no/directory/")
-    except scp.SCPException as e:
+    except pybatch.PybatchException as e:
         assert "/no/directory/" in str(e)
     else:
         assert 0
@@ -0,0 +1,81 @@
+# Copyright (C) 2025-2026  CEA, EDF
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307 USA
+#
+# See http://www.salome-platform.org/ or email : webmaster.salome@opencascade.com
+#
+import pickle
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import pybatch
+
+paramiko_protocol = pytest.importorskip("pybatch.protocols.paramiko")
+from pybatch.protocols.pool import ProtocolPool, default_pool  # noqa: E402
+
+
+@pytest.fixture
+def no_connection(monkeypatch):  # type: ignore
+    "Count the connections instead of opening them."
+    connections = []
+
+    def fake_open(self):  # type: ignore
+        connections.append(self.params.host)
+
+    monkeypatch.setattr(paramiko_protocol.ParamikoProtocol, "_open", fake_open)
+    yield connections
+    default_pool().close()
+
+
+def test_protocol_pool(no_connection) -> None:  # type: ignore
+    pool = ProtocolPool()
+    params = pybatch.ConnectionParameters(host="cluster1", user="me")
+    with ThreadPoolExecutor(8) as executor:
+        protocols = list(executor.map(lambda i: pool.get(params), range(50)))
+    assert all(p is protocols[0] for p in protocols)
+    assert protocols[0].keepalive == 30
+    assert no_connection == []  # connections are opened at the first use
+    same_params = pybatch.ConnectionParameters(host="cluster1", user="me")
+    assert pool.get(same_params) is protocols[0]
+    other = pybatch.ConnectionParameters(host="cluster1", user="you")
+    assert pool.get(other) is not protocols[0]
+    assert pool.get(params, transfer_sessions=2) is not protocols[0]
+
+    pool = ProtocolPool(connections_per_host=2)
+    first, second, third = [pool.get(params) for i in range(3)]
+    assert first is not second
+    assert third is first
+
+
+def test_protocol_pool_unpickle(no_connection) -> None:  # type: ignore
+    params = pybatch.ConnectionParameters(host="cluster2")
+    job_params = pybatch.LaunchParameters(["hostname"], "/tmp/work")
+    jobs = [pybatch.create_job("slurm", job_params, params) for i in range(3)]
+    assert jobs[0].protocol is jobs[1].protocol
+    own_protocol = paramiko_protocol.ParamikoProtocol(params)
+    jobs.append(pybatch.create_job("slurm", job_params, own_protocol))
+    reloaded = pickle.loads(pickle.dumps(jobs))
+    assert all(job.protocol is jobs[0].protocol for job in reloaded)
+    assert no_connection == []
+
+
+def test_lazy_connection() -> None:
+    params = pybatch.ConnectionParameters(host="noname_zozo")
+    protocol = paramiko_protocol.ParamikoProtocol(params)
+    reloaded = pickle.loads(pickle.dumps(protocol))
+    with pytest.raises(pybatch.PybatchException, match="noname_zozo"):
+        reloaded.run(["hostname"])
+    default_pool().close()
@@ -149,3 +149,88 @@ def test_protocol_ssh(remote_args: dict[str, typing.Any]) -> None:
     p.run([python_exe, "-c", pycommand])
 
     shutil.rmtree(local_work_dir)
+
+
+def test_protocol_ssh_control_master(
+    remote_args: dict[str, typing.Any],
+) -> None:
+    python_exe = remote_args.get("python_exe", "python3")
+    is_posix = remote_args.get("is_posix", True)
+    work_dir = remote_args["work_dir"]
+    connect_param = pybatch.ConnectionParameters(
+        host=remote_args["host"],
+        user=remote_args.get("user"),
+        gss_auth=remote_args.get("gss_auth", False),
+    )
+    p = pybatch.protocols.ssh.SshProtocol(connect_param, control_master=True)
+    res = p.run([python_exe, "-c", 'print("Cool!")'])
+    assert res.strip() == "Cool!"
+    control_dir = p._control_dir
+    # the master connection is listening on a socket
+    assert len(os.listdir(control_dir)) == 1
+
+    local_work_dir = tempfile.mkdtemp(suffix="_pybatchtest")
+    remote_test_file = path_join(work_dir, "ssh_cm_test.txt", is_posix=is_posix)
+    local_test_file = os.path.join(local_work_dir, "ssh_cm_test.txt")
+    p.create(remote_test_file, "Servus!")
+    assert p.read(remote_test_file) == "Servus!"
+    p.download([remote_test_file], local_test_file)
+    assert Path(local_test_file).read_text() == "Servus!"
+    p.upload([local_test_file], work_dir)
+    pycommand = f'import os; os.remove("{remote_test_file}")'
+    p.run([python_exe, "-c", pycommand])
+
+    p.close()
+    assert not os.path.exists(control_dir)
+    # a new connection is opened after close
+    res = p.run([python_exe, "-c", 'print("Cool!")'])
+    assert res.strip() == "Cool!"
+    p.close()
+    shutil.rmtree(local_work_dir)
+
+
+def test_control_master_copy() -> None:
+    import copy
+    import gc
+    import pickle
+
+    connect_param = pybatch.ConnectionParameters(host="noname_zozo")
+    p = pybatch.protocols.ssh.SshProtocol(connect_param, control_master=True)
+    options = p._options()
+    control_dir = p._control_dir
+    assert os.path.isdir(control_dir)
+    # the copies do not share the connection of the original
+    for duplicate in (pickle.loads(pickle.dumps(p)), copy.copy(p)):
+        assert duplicate._control_dir == ""
+        assert control_dir not in " ".join(duplicate._options())
+        duplicate.close()
+        del duplicate
+    gc.collect()
+    assert os.path.isdir(control_dir)
+    assert p._options() == options
+    p.close()
+    assert not os.path.isdir(control_dir)
+
+
+def test_tail_script(tmp_path: Path) -> None:
+    import subprocess
+
+    # the scripts of tail run with the local sh instead of a remote one
+    class LocalSh(pybatch.protocols.ssh.SshProtocol):
+        scripts: list[str] = []
+
+        def _run_bytes(self, script: str) -> bytes:
+            self.scripts.append(script)
+            return subprocess.run(
+                ["sh", "-c", script], capture_output=True, check=True
+            ).stdout
+
+    log = tmp_path / "log.txt"
+    log.write_text("".join(f"line {i}\n" for i in range(1000)))
+    p = LocalSh(pybatch.ConnectionParameters(host="noname_zozo"))
+    assert p.tail(str(log), n_lines=2) == "line 998\nline 999\n"
+    # the whole file is not read to get the last lines
+    assert "cat" not in p.scripts[-1]
+    assert p.tail(str(log), n_bytes=9) == "line 999\n"
+    assert p.tail(str(log), n_bytes=18, n_lines=1) == "line 999\n"
+    assert p.tail(str(log)) == log.read_text()
@@ -0,0 +1,153 @@
+# Copyright (C) 2025-2026  CEA, EDF
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307 USA
+#
+# See http://www.salome-platform.org/ or email : webmaster.salome@opencascade.com
+#
+import pickle
+
+import pybatch
+from pybatch.plugins.slurm.job import Job
+from pybatch.plugins.slurm.monitor import JobMonitor
+
+
+class FakeSlurm:
+    "Protocol which answers squeue and sacct commands with fixed outputs."
+
+    def __init__(self, squeue: str, sacct: str):
+        self.squeue = squeue
+        self.sacct = sacct
+        self.commands: list[list[str]] = []
+
+    def run(self, command: list[str]) -> str:
+        self.commands.append(command)
+        if command[0] == "squeue":
+            return self.squeue
+        if command[0] == "sacct":
+            return self.sacct
+        raise pybatch.PybatchException(f"Unexpected command {command}")
+
+    def run_many(
+        self, commands: list[list[str]]
+    ) -> list[pybatch.CommandResult]:
+        result = []
+        for command in commands:
+            try:
+                output = self.run(command)
+            except pybatch.PybatchException as e:
+                result.append(pybatch.CommandResult(1, "", str(e)))
+            else:
+                result.append(pybatch.CommandResult(0, output, ""))
+        return result
+
+
+def create_job(protocol: FakeSlurm, jobid: str, total_jobs: int = 1) -> Job:
+    params = pybatch.LaunchParameters(["hello"], "/tmp", total_jobs=total_jobs)
+    job = Job(params, protocol)  # type: ignore
+    job.jobid = jobid
+    return job
+
+
+def test_monitor_states() -> None:
+    squeue = """101 RUNNING
+102 PENDING
+103_[2-3] PENDING
+103_1 RUNNING
+"""
+    sacct = """104|COMPLETED|0:0
+104.batch|COMPLETED|0:0
+105|CANCELLED by 42|0:15
+106_0|COMPLETED|0:0
+106_1|FAILED|3:0
+106_1.batch|FAILED|3:0
+"""
+    protocol = FakeSlurm(squeue, sacct)
+    jobs = [
+        create_job(protocol, "101"),
+        create_job(protocol, "102"),
+        create_job(protocol, "103", total_jobs=4),
+        create_job(protocol, "104"),
+        create_job(protocol, "105"),
+        create_job(protocol, "106", total_jobs=2),
+    ]
+    not_submitted = create_job(protocol, "")
+    monitor = JobMonitor(jobs + [not_submitted], max_age=60)
+    states = [job.state() for job in jobs]
+    assert states == [
+        "RUNNING",
+        "QUEUED",
+        "RUNNING",
+        "FINISHED",
+        "FAILED",
+        "FAILED",
+    ]
+    assert not_submitted.state() == "CREATED"
+    # one squeue and one sacct for all the jobs
+    assert len(protocol.commands) == 2
+    assert protocol.commands[0][:2] == ["squeue", "--me"]
+    assert protocol.commands[1][-1] == "104,105,106"
+
+    # states are queried again when they are too old
+    monitor.max_age = 0
+    protocol.squeue = ""
+    protocol.sacct = "101|COMPLETED|0:0\n"
+    assert jobs[0].state() == "FINISHED"
+    assert len(protocol.commands) == 4
+    # jobs which are over are not queried any more
+    assert jobs[0].exit_code() == 0
+    assert jobs[4].exit_code() == 15
+    assert jobs[5].exit_code() == 3
+    assert len(protocol.commands) == 4
+    monitor.remove(jobs[0])
+    assert jobs[0].monitor is None
+
+    # the monitor is not serialized with the job
+    new_job = pickle.loads(pickle.dumps(jobs[1]))
+    assert new_job.monitor is None
+    assert jobs[1].monitor is monitor
+
+
+def test_final_state_cache() -> None:
+    protocol = FakeSlurm("", "101|FAILED|0:0\n101.batch|FAILED|2:0\n")
+    job = create_job(protocol, "101")
+    assert job.state() == "FAILED"
+    assert job.exit_code() == 2
+    assert job.state() == "FAILED"
+    # one squeue and one sacct for the state and the exit code
+    assert [c[0] for c in protocol.commands] == ["squeue", "sacct"]
+    # the cache is kept by serialization
+    new_job = pickle.loads(pickle.dumps(job))
+    assert new_job.exit_code() == 2
+    assert len(protocol.commands) == 2
+
+    # state found by squeue, exit code by sacct
+    protocol = FakeSlurm("TIMEOUT\n", "102|TIMEOUT|0:0\n")
+    job = create_job(protocol, "102")
+    assert job.state() == "FAILED"
+    assert job.exit_code() == 0
+    assert job.exit_code() == 0
+    assert [c[0] for c in protocol.commands] == ["squeue", "sacct"]
+
+    # sacct is not queried while the job is running
+    protocol = FakeSlurm("RUNNING\n", "")
+    job = create_job(protocol, "103")
+    assert job.state() == "RUNNING"
+    assert job.state() == "RUNNING"
+    assert [c[0] for c in protocol.commands] == ["squeue", "squeue"]
+    protocol.squeue = "COMPLETED\n"
+    protocol.sacct = "103|COMPLETED|0:0\n"
+    assert job.state() == "FINISHED"
+    assert job.exit_code() == 0
+    assert [c[0] for c in protocol.commands] == ["squeue"] * 3 + ["sacct"]
@@ -0,0 +1,72 @@
+# Copyright (C) 2025-2026  CEA, EDF
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307 USA
+#
+# See http://www.salome-platform.org/ or email : webmaster.salome@opencascade.com
+#
+import os
+import shutil
+import stat
+import tempfile
+from pathlib import Path
+
+import pybatch
+import pybatch.plugins.slurm.job
+from tests.conftest import RecordingProtocol
+
+
+def fake_sbatch(bin_dir: str) -> None:
+    "Create a sbatch command which checks the batch file and prints a job id."
+    sbatch = Path(bin_dir) / "sbatch"
+    sbatch.write_text('#!/bin/sh\ntest -f "$4"\necho "4242;cluster"\n')
+    sbatch.chmod(sbatch.stat().st_mode | stat.S_IEXEC)
+
+
+def test_fused_submit(monkeypatch) -> None:  # type: ignore
+    test_dir = tempfile.mkdtemp(suffix="_pybatchtest")
+    bin_dir = os.path.join(test_dir, "bin")
+    os.mkdir(bin_dir)
+    fake_sbatch(bin_dir)
+    monkeypatch.setenv("PATH", bin_dir + os.pathsep + os.environ["PATH"])
+    current_file_dir = os.path.dirname(__file__)
+    script = Path(current_file_dir) / "scripts" / "hello.py"
+    data_dir = Path(current_file_dir) / "data" / "data"
+    work_dir = os.path.join(test_dir, "work dir")
+    params = pybatch.LaunchParameters(
+        ["python3", "hello.py", "it's me"],
+        work_dir,
+        input_files=[script, data_dir],
+    )
+    protocol = RecordingProtocol()
+    job = pybatch.plugins.slurm.job.Job(params, protocol)
+    job.submit()
+    assert job.jobid == "4242"
+    assert protocol.operations == ["run"]
+    work_path = Path(work_dir)
+    assert (work_path / "logs").is_dir()
+    assert (work_path / "batch.cmd").read_text() == job.batch_file() + "\n"
+    assert (work_path / "hello.py").read_text() == script.read_text()
+    assert (work_path / "data" / "input.txt").exists()
+
+    # input files too big to be embedded are uploaded.
+    monkeypatch.setattr(pybatch.plugins.slurm.job, "MAX_EMBEDDED_SIZE", 10)
+    shutil.rmtree(work_dir)
+    protocol.operations = []
+    job.submit()
+    assert job.jobid == "4242"
+    assert protocol.operations == ["run", "upload", "run"]
+    assert (work_path / "hello.py").read_text() == script.read_text()
+    assert (work_path / "data" / "input.txt").exists()
+    shutil.rmtree(test_dir)
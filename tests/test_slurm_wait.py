@@ -0,0 +1,70 @@
+# Copyright (C) 2025-2026  CEA, EDF
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307 USA
+#
+# See http://www.salome-platform.org/ or email : webmaster.salome@opencascade.com
+#
+from datetime import datetime
+import time
+
+import pybatch
+from pybatch.plugins.slurm.wait import (
+    EstimatedStart,
+    ExponentialBackoff,
+    FixedDelay,
+)
+
+from tests.test_slurm_monitor import FakeSlurm, create_job
+
+
+def test_exponential_backoff() -> None:
+    protocol = FakeSlurm("", "")
+    job = create_job(protocol, "101")
+    strategy = ExponentialBackoff(initial=1, factor=2, max_delay=60)
+    delays = [strategy.delay(job, "RUNNING", i) for i in range(1, 9)]
+    assert delays == [1, 2, 4, 8, 16, 32, 60, 60]
+    assert strategy.delay(job, "RUNNING", 100000) == 60
+    # delay capped by 10% of the wall time
+    job.job_params.wall_time = "5"  # 5 minutes
+    assert strategy.delay(job, "RUNNING", 8) == 30
+
+
+def test_estimated_start() -> None:
+    start = datetime.fromtimestamp(time.time() + 100).isoformat(
+        timespec="seconds"
+    )
+    protocol = FakeSlurm(f"N/A\n{start}\n", "")
+    job = create_job(protocol, "101")
+    strategy = EstimatedStart(then=FixedDelay(2), max_delay=600)
+    delay = strategy.delay(job, "QUEUED", 1)
+    assert 90 < delay <= 100
+    assert protocol.commands[-1][:2] == ["squeue", "--start"]
+    assert strategy.delay(job, "RUNNING", 1) == 2
+    protocol.squeue = "N/A\n"
+    assert strategy.delay(job, "QUEUED", 1) == 2
+
+
+def test_wait_timeout() -> None:
+    protocol = FakeSlurm("RUNNING\n", "")
+    job = create_job(protocol, "101")
+    try:
+        job.wait(timeout=0.3, strategy=FixedDelay(0.1))
+    except pybatch.PybatchException as e:
+        assert "Timeout" in str(e)
+    else:
+        assert 0  # Exception expected
+    protocol.squeue = "COMPLETED\n"
+    job.wait(timeout=1)
+    assert job.state() == "FINISHED"
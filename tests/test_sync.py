@@ -0,0 +1,63 @@
+# Copyright (C) 2025-2026  CEA, EDF
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307 USA
+#
+# See http://www.salome-platform.org/ or email : webmaster.salome@opencascade.com
+#
+import os
+import sys
+
+from pybatch.sync import download_incremental
+from tests.conftest import RecordingProtocol
+
+
+def test_download_incremental(tmp_path) -> None:  # type: ignore
+    remote = tmp_path / "remote"
+    (remote / "results" / "step1").mkdir(parents=True)
+    (remote / "results" / "empty").mkdir()
+    (remote / "results" / "step1" / "a.csv").write_text("1,2,3")
+    (remote / "results" / "b.csv").write_text("4,5,6")
+    (remote / "log.txt").write_text("log")
+    local = tmp_path / "local"
+    local.mkdir()
+    protocol = RecordingProtocol()
+    entries = [str(remote / "results"), str(remote / "log.txt")]
+
+    def get(checksum: bool = False) -> list[str]:
+        protocol.downloaded = []
+        download_incremental(
+            protocol, entries, local, sys.executable, checksum=checksum
+        )
+        return sorted(protocol.downloaded)
+
+    assert get() == ["a.csv", "b.csv", "log.txt"]
+    # a single transfer for all the files
+    assert protocol.operations.count("download_archive") == 1
+    assert (local / "results" / "step1" / "a.csv").read_text() == "1,2,3"
+    assert (local / "results" / "empty").is_dir()
+    assert get() == []
+
+    (remote / "log.txt").write_text("log, longer")
+    assert get() == ["log.txt"]
+    assert (local / "log.txt").read_text() == "log, longer"
+
+    # same size and same modification time
+    b_file = remote / "results" / "b.csv"
+    b_stat = b_file.stat()
+    b_file.write_text("7,8,9")
+    os.utime(b_file, ns=(b_stat.st_atime_ns, b_stat.st_mtime_ns))
+    assert get() == []
+    assert get(checksum=True) == ["b.csv"]
+    assert (local / "results" / "b.csv").read_text() == "7,8,9"
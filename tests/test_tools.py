@@ -47,3 +47,184 @@ def test_slurm_time_to_seconds():
         pass
     else:
         assert 0  # Exception expected
+
+
+def test_slurm_memory_to_megabytes():
+    from pybatch.tools import slurm_memory_to_megabytes as converter
+    from pybatch import PybatchException
+
+    assert converter("") == 0
+    assert converter("100") == 100
+    assert converter("32G") == 32768
+    assert converter("1.5g") == 1536
+    assert converter("512K") == 1
+    assert converter("2T") == 2 * 1024 * 1024
+    try:
+        converter("xvi")
+    except PybatchException:
+        pass
+    else:
+        assert 0  # Exception expected
+
+
+def test_tail_file():
+    import io
+    from pybatch.tools import tail_file
+
+    content = b"".join(b"line %d\n" % i for i in range(1000))
+    f = io.BytesIO(content)
+    assert tail_file(f) == content
+    assert tail_file(f, n_bytes=7) == b"ne 999\n"
+    assert tail_file(f, n_lines=2) == b"line 998\nline 999\n"
+    assert tail_file(f, n_lines=0) == b""
+    assert tail_file(f, n_lines=2000) == content
+    # lines spread over many chunks
+    assert tail_file(f, n_lines=500, chunk_size=10) == content[-4500:]
+    assert tail_file(f, n_bytes=12, n_lines=2) == b"98\nline 999\n"
+    f = io.BytesIO(b"no newline\nat the end")
+    assert tail_file(f, n_lines=1) == b"at the end"
+    assert tail_file(io.BytesIO(b""), n_lines=3) == b""
+
+
+def test_follow_file():
+    from pybatch.tools import follow_file
+
+    # content of the file and state of the job at every tick
+    ticks = [
+        (None, "QUEUED"),
+        (b"", "RUNNING"),
+        (b"first li", "RUNNING"),
+        (b"first line\nsecond line\n\xc3", "RUNNING"),
+        (b"first line\nsecond line\n\xc3\xa9t\xc3\xa9", "FINISHED"),
+    ]
+    reads = []
+
+    def state():
+        return ticks[len(reads)][1]
+
+    def read_range(offset):
+        content = ticks[len(reads)][0]
+        reads.append(offset)
+        if content is None:
+            raise FileNotFoundError("logs/output.log")
+        return content[offset:]
+
+    lines = list(follow_file(read_range, state, interval=0, max_interval=0))
+    assert lines == ["first line\n", "second line\n", "été"]
+    assert reads == [0, 0, 0, 8, 24]
+
+
+def test_archive_stream(tmp_path):
+    import os
+    import subprocess
+    from pybatch.tools import write_archive, extract_archive, archive_paths
+    from pybatch.tools import tar_option
+
+    source = tmp_path / "source"
+    (source / "mesh" / "part").mkdir(parents=True)
+    for i in range(50):
+        (source / "mesh" / "part" / f"f{i}.txt").write_text(str(i))
+    (source / "case.txt").write_text("case")
+    for compression in ["", "gz", "xz"]:
+        # local entries -> tar -x
+        option = tar_option(compression)
+        dest = tmp_path / ("up" + compression)
+        dest.mkdir()
+        proc = subprocess.Popen(
+            ["tar", f"-x{option}f", "-", "-C", str(dest)],
+            stdin=subprocess.PIPE,
+        )
+        entries = [source / "mesh", str(source / "case.txt")]
+        with proc.stdin:
+            write_archive(entries, proc.stdin, compression)
+        assert proc.wait() == 0
+        assert (dest / "mesh" / "part" / "f49.txt").read_text() == "49"
+        assert (dest / "case.txt").read_text() == "case"
+        # tar -c -> local directory
+        dest = tmp_path / ("down" + compression)
+        dest.mkdir()
+        script = f"tar -c{option}f - " + archive_paths(
+            ["mesh/part", "case.txt"]
+        )
+        proc = subprocess.Popen(
+            ["sh", "-c", script], cwd=source, stdout=subprocess.PIPE
+        )
+        with proc.stdout:
+            extract_archive(proc.stdout, dest, compression)
+        assert proc.wait() == 0
+        assert sorted(os.listdir(dest)) == ["case.txt", "part"]
+        assert len(os.listdir(dest / "part")) == 50
+        # relative paths kept from a base directory
+        script = f"tar -c{option}f - " + archive_paths(
+            ["mesh/part/f3.txt", "case.txt"], str(source)
+        )
+        proc = subprocess.Popen(["sh", "-c", script], stdout=subprocess.PIPE)
+        with proc.stdout:
+            extract_archive(proc.stdout, dest, compression)
+        assert proc.wait() == 0
+        assert (dest / "mesh" / "part" / "f3.txt").read_text() == "3"
+        assert os.listdir(dest / "mesh" / "part") == ["f3.txt"]
+
+
+def test_run_many():
+    from pybatch import CommandResult
+    from pybatch.tools import run_many
+    from tests.conftest import RecordingProtocol
+
+    commands = [
+        ["echo", "one"],
+        ["printf", "no newline"],
+        ["sh", "-c", "echo out; echo err >&2; exit 3"],
+        ["printf", ""],
+        ["pybatch_missing_command"],
+    ]
+
+    protocol = RecordingProtocol()
+    sent = protocol.commands
+    # one shell for all the commands
+    results = run_many(protocol, commands)
+    # the script is sent on a single line, whatever the login shell
+    assert len(sent) == 1
+    assert "\n" not in " ".join(sent[0])
+    assert results[:4] == [
+        CommandResult(0, "one\n", ""),
+        CommandResult(0, "no newline", ""),
+        CommandResult(3, "out\n", "err\n"),
+        CommandResult(0, "", ""),
+    ]
+    assert results[4].returncode == 127
+    assert run_many(protocol, []) == []
+    # one process per command
+    results = protocol.run_many(commands)
+    assert results[:4] == [
+        CommandResult(0, "one\n", ""),
+        CommandResult(0, "no newline", ""),
+        CommandResult(3, "out\n", "err\n"),
+        CommandResult(0, "", ""),
+    ]
+    assert results[4].returncode == 127
+
+
+def test_stream_output_long_line():
+    import io
+    from pybatch import PybatchException
+    from pybatch.tools import stream_output
+
+    # a single line without newline is not buffered beyond the limit
+    stdout = io.BytesIO(b"x" * 1000000)
+    lines = stream_output(
+        stdout, io.BytesIO(), lambda: 0, lambda: None, "", max_bytes=100
+    )
+    try:
+        list(lines)
+    except PybatchException as e:
+        assert "100 bytes" in str(e)
+    else:
+        assert 0  # Exception expected
+    assert stdout.tell() == 101
+    # the lines are complete below the limit
+    stdout = io.BytesIO(b"one\ntwo\nthree")
+    lines = stream_output(
+        stdout, io.BytesIO(), lambda: 0, lambda: None, "", max_bytes=13
+    )
+    assert list(lines) == ["one\n", "two\n", "three"]